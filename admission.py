@@ -0,0 +1,166 @@
+"""Process-wide admission control for SQL statements, per warehouse and fair across sessions"""
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from config import env_int
+from telemetry import span
+
+# Statements one warehouse runs for this process at the same time
+DEFAULT_MAX_CONCURRENT_STATEMENTS = 4
+
+# Seconds between checks of should_cancel while waiting for a slot
+ADMISSION_POLL_INTERVAL = 0.25
+
+# Owner (e.g. browser session) and queue-position callback of the code running in this context
+_scope = contextvars.ContextVar("admission_scope", default=(None, None))
+
+
+def get_max_concurrent_statements():
+    """Return the per-warehouse statement cap from PARSE_MAX_CONCURRENT_STATEMENTS (default 4)"""
+    return env_int("PARSE_MAX_CONCURRENT_STATEMENTS", DEFAULT_MAX_CONCURRENT_STATEMENTS)
+
+
+class AdmissionCancelled(Exception):
+    """Raised when a caller gives up while still waiting for a warehouse slot"""
+
+
+class _Ticket:
+    __slots__ = ("owner", "granted", "enqueued_at")
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+class WarehouseAdmission:
+    """Caps the statements running on one warehouse and admits waiting callers round-robin by owner.
+
+    Each owner has its own FIFO queue. When a slot frees up, the owner at
+    the head of the rotation gets it and moves to the back, so one session
+    submitting a hundred files cannot starve another submitting one.
+    """
+
+    def __init__(self, warehouse_id, max_concurrent=None):
+        self.warehouse_id = warehouse_id
+        self.max_concurrent = max_concurrent or get_max_concurrent_statements()
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queues = OrderedDict()
+
+    def _grant(self):
+        # Caller holds the lock
+        while self._active < self.max_concurrent and self._queues:
+            owner, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            del self._queues[owner]
+            if queue:
+                self._queues[owner] = queue
+            ticket.granted = True
+            self._active += 1
+        self._cond.notify_all()
+
+    def _position(self, ticket):
+        # Caller holds the lock. Tickets are admitted in rounds of one per owner in
+        # rotation order, so count earlier rounds plus owners ahead in this one.
+        index = self._queues[ticket.owner].index(ticket)
+        position = 1
+        ahead = True
+        for owner, queue in self._queues.items():
+            position += min(len(queue), index)
+            if owner == ticket.owner:
+                ahead = False
+            elif ahead and len(queue) > index:
+                position += 1
+        return position
+
+    def acquire(self, owner=None, should_cancel=None, on_wait=None):
+        """Block until a slot is free for owner; returns the seconds spent queued.
+
+        on_wait(position) is called whenever the caller's queue position
+        changes, and on_wait(None) once it is admitted. Raises
+        AdmissionCancelled if should_cancel() turns true while queued.
+        """
+        ticket = _Ticket(owner)
+        with self._cond:
+            self._queues.setdefault(owner, deque()).append(ticket)
+            self._grant()
+            reported = None
+            while not ticket.granted:
+                if should_cancel is not None and should_cancel():
+                    self._queues[owner].remove(ticket)
+                    if not self._queues[owner]:
+                        del self._queues[owner]
+                    self._cond.notify_all()
+                    raise AdmissionCancelled(f"Cancelled while waiting for a slot on warehouse {self.warehouse_id}")
+                position = self._position(ticket)
+                if on_wait is not None and position != reported:
+                    on_wait(position)
+                    reported = position
+                self._cond.wait(ADMISSION_POLL_INTERVAL)
+        if on_wait is not None and reported is not None:
+            on_wait(None)
+        return time.monotonic() - ticket.enqueued_at
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._grant()
+
+    def stats(self):
+        """Running and queued statement counts, for the UI and telemetry"""
+        with self._cond:
+            return {
+                "active": self._active,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "owners_waiting": len(self._queues),
+                "max_concurrent": self.max_concurrent,
+            }
+
+
+_admissions = {}
+_admissions_lock = threading.Lock()
+
+
+def get_admission(warehouse_id):
+    """Return the process-wide admission controller of a warehouse"""
+    admission = _admissions.get(warehouse_id)
+    if admission is None:
+        with _admissions_lock:
+            admission = _admissions.get(warehouse_id)
+            if admission is None:
+                admission = _admissions[warehouse_id] = WarehouseAdmission(warehouse_id)
+    return admission
+
+
+@contextmanager
+def admission_scope(owner, on_wait=None):
+    """Attribute statements started in this context (and contexts copied from it) to owner"""
+    token = _scope.set((owner, on_wait))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+@contextmanager
+def admit(warehouse_id, should_cancel=None):
+    """Hold one of the warehouse's statement slots for the duration of the block.
+
+    Waits (fairly across owners, see WarehouseAdmission) when the warehouse
+    already runs its cap of statements for this process. The wait is timed
+    as an sql.admission span.
+    """
+    owner, on_wait = _scope.get()
+    admission = get_admission(warehouse_id)
+    with span("sql.admission", warehouse_id=warehouse_id) as admission_span:
+        admission_span.set(**{f"{key}_before": value for key, value in admission.stats().items()})
+        queued_s = admission.acquire(owner, should_cancel=should_cancel, on_wait=on_wait)
+        admission_span.set(queued_ms=round(queued_s * 1000, 3))
+    try:
+        yield
+    finally:
+        admission.release()
@@ -1,21 +1,31 @@
 import streamlit as st
-import io
 import os
-import pandas as pd
-import json
-import base64
-
-# Try to import Databricks SDK
-try:
-    from databricks.sdk import WorkspaceClient
-    from databricks.sdk.core import DatabricksError
-    DATABRICKS_SDK_AVAILABLE = True
-except ImportError as e:
-    DATABRICKS_SDK_AVAILABLE = False
-    IMPORT_ERROR = str(e)
+import time
+import uuid
+import logging
+
+from workspace import get_workspace_client, sdk_available
+from parse_cache import get_parse_cache
+from uploads import get_upload_concurrency
+from jobs import get_job_registry
+from telemetry import phase_totals
+from exports import EXPORT_FORMATS, export_result, get_export_cache, result_hash
+from engine import get_volume_directory, ingest_batch, ingest_file
+from admission import get_max_concurrent_statements
+from routing import get_router, get_warehouse_ids
+from search_index import get_search_index
+from imageprep import PIL_AVAILABLE, get_target_dpi, image_normalize_enabled
+from delta_sink import get_results_table, table_identifier
+
+# Pandas and the Databricks SDK are imported on first use (rendering a result, creating
+# the client) rather than here, so the first page load does not wait for them
+DATABRICKS_SDK_AVAILABLE = sdk_available()
 
 # No longer need PySpark - using Databricks SDK SQL execution instead
 
+# Surface app decisions (e.g. local vs. warehouse parsing) in the app logs
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+
 # Page configuration
 st.set_page_config(
     page_title="Unity Catalog File Upload",
@@ -23,311 +33,430 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load and inject custom CSS matching CLA Connect style guide
+# Custom CSS matching the CLA Connect style guide, kept in app.css
+APP_CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.css")
+
+@st.cache_resource(show_spinner=False)
+def css_markup():
+    """Read app.css once per process and wrap it in a <style> tag"""
+    with open(APP_CSS_PATH, encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
 def load_css():
     """Load custom CSS matching CLA Connect design"""
-    cla_css = """
-    <style>
-        /* Import Roboto font */
-        @import url('https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;700&display=swap');
-        
-        /* Global styles matching CLA Connect */
-        .stApp {
-            background-color: #ffffff;
-            font-family: 'Roboto', 'Helvetica', 'Arial', sans-serif;
-        }
-        
-        /* Main content area */
-        .main .block-container {
-            padding: 2rem 3rem;
-            max-width: 1200px;
-        }
-        
-        /* Headers - CLA teal color */
-        h1, h2, h3 {
-            color: #004d40 !important;
-            font-family: 'Roboto', sans-serif !important;
-            font-weight: 700 !important;
-        }
-        
-        h1 {
-            font-size: 2.5rem !important;
-            margin-bottom: 1rem !important;
-            padding-bottom: 0.5rem !important;
-            border-bottom: 3px solid #004d40 !important;
-        }
-        
-        h2 {
-            font-size: 2rem !important;
-            margin-top: 2rem !important;
-            margin-bottom: 1rem !important;
-        }
-        
-        h3 {
-            font-size: 1.5rem !important;
-            margin-bottom: 0.75rem !important;
-        }
-        
-        /* Paragraph text */
-        p, .stMarkdown {
-            color: #333333;
-            font-size: 1rem;
-            line-height: 1.6;
-        }
-        
-        /* Buttons - CLA orange action button (matching insights page) */
-        .stButton > button {
-            background-color: #FF6B35 !important;
-            color: #ffffff !important;
-            border: none !important;
-            padding: 0.75rem 2rem !important;
-            font-size: 1rem !important;
-            font-weight: 500 !important;
-            border-radius: 4px !important;
-            transition: all 0.3s ease !important;
-            font-family: 'Roboto', sans-serif !important;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }
-        
-        .stButton > button:hover {
-            background-color: #E55A28 !important;
-            border: none !important;
-            transform: translateY(-2px);
-            box-shadow: 0 4px 8px rgba(255, 107, 53, 0.3) !important;
-        }
-        
-        .stButton > button:focus {
-            background-color: #E55A28 !important;
-            box-shadow: 0 0 0 0.2rem rgba(255, 107, 53, 0.3) !important;
-        }
-        
-        .stButton > button:active {
-            transform: translateY(0);
-            box-shadow: 0 2px 4px rgba(255, 107, 53, 0.3) !important;
-        }
-        
-        /* File uploader */
-        .stFileUploader {
-            background-color: #f5f5f5;
-            border: 2px dashed #004d40;
-            border-radius: 8px;
-            padding: 1.5rem;
-        }
-        
-        .stFileUploader label {
-            color: #004d40 !important;
-            font-weight: 500 !important;
-        }
-        
-        /* Text inputs */
-        .stTextInput > div > div > input {
-            border: 2px solid #e0e0e0 !important;
-            border-radius: 4px !important;
-            padding: 0.75rem !important;
-            font-family: 'Roboto', sans-serif !important;
-            transition: border-color 0.3s ease !important;
-        }
-        
-        .stTextInput > div > div > input:focus {
-            border-color: #004d40 !important;
-            box-shadow: 0 0 0 0.2rem rgba(0, 77, 64, 0.1) !important;
-        }
-        
-        .stTextInput > label {
-            color: #004d40 !important;
-            font-weight: 500 !important;
-        }
-        
-        /* Metrics */
-        .stMetric {
-            background-color: #f5f5f5;
-            padding: 1rem;
-            border-radius: 8px;
-            border-left: 4px solid #004d40;
-        }
-        
-        .stMetric label {
-            color: #757575 !important;
-            font-size: 0.875rem !important;
-            font-weight: 500 !important;
-        }
-        
-        .stMetric [data-testid="stMetricValue"] {
-            color: #004d40 !important;
-            font-size: 1.5rem !important;
-            font-weight: 700 !important;
-        }
-        
-        /* Info, Warning, Success, Error boxes */
-        .stAlert {
-            border-radius: 8px !important;
-            border-left: 4px solid;
-        }
-        
-        /* Info boxes */
-        div[data-baseweb="notification"] {
-            border-radius: 8px !important;
-        }
-        
-        .stInfo {
-            background-color: #e8f4f8 !important;
-            border-left-color: #004d40 !important;
-        }
-        
-        .stSuccess {
-            background-color: #e8f5e9 !important;
-            border-left-color: #2e7d32 !important;
-        }
-        
-        .stWarning {
-            background-color: #fff3e0 !important;
-            border-left-color: #f57c00 !important;
-        }
-        
-        .stError {
-            background-color: #ffebee !important;
-            border-left-color: #c62828 !important;
-        }
-        
-        /* Divider */
-        hr {
-            border: none;
-            border-top: 2px solid #e0e0e0;
-            margin: 2rem 0;
-        }
-        
-        /* Expander */
-        .streamlit-expanderHeader {
-            background-color: #f5f5f5 !important;
-            border-radius: 4px !important;
-            color: #004d40 !important;
-            font-weight: 500 !important;
-        }
-        
-        .streamlit-expanderHeader:hover {
-            background-color: #eeeeee !important;
-        }
-        
-        /* Columns */
-        [data-testid="column"] {
-            padding: 0.5rem;
-        }
-        
-        /* Spinner */
-        .stSpinner > div {
-            border-top-color: #004d40 !important;
-        }
-        
-        /* Hide Streamlit branding */
-        #MainMenu {visibility: hidden;}
-        footer {visibility: hidden;}
-        
-        /* Responsive design */
-        @media (max-width: 768px) {
-            .main .block-container {
-                padding: 1rem;
-            }
-            
-            h1 {
-                font-size: 2rem !important;
-            }
-            
-            h2 {
-                font-size: 1.5rem !important;
-            }
-            
-            .stButton > button {
-                padding: 0.5rem 1rem !important;
-                font-size: 0.875rem !important;
-            }
-        }
-    </style>
-    """
-    st.markdown(cla_css, unsafe_allow_html=True)
+    st.markdown(css_markup(), unsafe_allow_html=True)
 
 # Load custom styles
 load_css()
 
-def parse_document_with_ai(file_path, workspace_client):
-    """Parse document using Databricks AI parse_document function via SQL Execution API"""
-    try:
-        if not DATABRICKS_SDK_AVAILABLE:
-            return None, "Databricks SDK not available"
-        
-        # Get warehouse ID from environment or use default
-        warehouse_id = os.environ.get("DATABRICKS_WAREHOUSE_ID")
-        
-        if not warehouse_id:
-            return None, "SQL Warehouse ID not configured. Please set DATABRICKS_WAREHOUSE_ID environment variable."
-        
-        # Use Databricks AI parse_document function via SQL execution
-        # Use read_files to read the binary content directly from Unity Catalog volume
-        query = f"""
-        SELECT ai_parse_document(content) as parsed_content
-        FROM read_files('{file_path}')
-        """
-        
-        # Execute SQL query using the workspace client
-        from databricks.sdk.service.sql import StatementState
-        
-        statement = workspace_client.statement_execution.execute_statement(
-            warehouse_id=warehouse_id,
-            statement=query,
-            wait_timeout="50s"
+# Rows per page offered in the parsed result preview
+PREVIEW_PAGE_SIZES = [50, 100, 500, 1000]
+
+# Seconds between reruns that refresh the status of running background jobs
+JOB_POLL_INTERVAL = 1.0
+
+# Background jobs are shared by the process and owned per browser session
+job_registry = get_job_registry()
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
+def render_parse_setup_help():
+    """Show how to configure the warehouse and AI functions for parsing"""
+    with st.expander("ℹ️ Setup Instructions"):
+        st.markdown("""
+        <div style="font-family: 'Roboto', sans-serif; color: #333333;">
+            <p>This app uses Databricks' built-in <code class="uc-code">ai_parse_document</code> function to extract text and structure from documents.</p>
+            <p style="margin-top: 1rem;"><strong style="color: #004d40;">Requirements:</strong></p>
+            <ul>
+                <li>A Databricks SQL Warehouse for query execution</li>
+                <li>Databricks Runtime with AI functions enabled</li>
+                <li>Access to Databricks AI/Foundation Model APIs</li>
+                <li>Environment variable <code class="uc-code">DATABRICKS_WAREHOUSE_ID</code> must be set</li>
+            </ul>
+            <p style="margin-top: 1rem;"><strong style="color: #004d40;">How to set the Warehouse ID:</strong></p>
+            <ol>
+                <li>Go to your Databricks SQL Warehouses</li>
+                <li>Copy the Warehouse ID from your SQL Warehouse</li>
+                <li>Set it as an environment variable in your app configuration</li>
+            </ol>
+        </div>
+        """, unsafe_allow_html=True)
+
+def render_paginated_dataframe(df, key, height=400):
+    """Show a window of rows with server-side paging, so only that page is sent to the browser"""
+    total = len(df)
+    if total <= PREVIEW_PAGE_SIZES[0]:
+        st.dataframe(df, use_container_width=True, height=height)
+        return
+
+    col_size, col_page, col_rows = st.columns([1, 1, 2])
+    with col_size:
+        page_size = st.selectbox("Rows per page", PREVIEW_PAGE_SIZES, index=1, key=f"page_size_{key}")
+    page_count = -(-total // page_size)
+    with col_page:
+        page = st.number_input(f"Page (of {page_count:,})", min_value=1, value=1, step=1, key=f"page_{key}")
+    page = min(int(page), page_count)
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    with col_rows:
+        st.caption(f"Rows {start + 1:,}–{end:,} of {total:,}")
+
+    st.dataframe(df.iloc[start:end], use_container_width=True, height=height)
+
+def render_result_downloads(parsed_result, file_name, key):
+    """Offer CSV / Parquet / JSONL downloads, building the file only after it is requested"""
+    col_format, col_download = st.columns([1, 3])
+    with col_format:
+        export_format = st.selectbox(
+            "Download format",
+            list(EXPORT_FORMATS),
+            key=f"export_format_{key}",
+            label_visibility="collapsed"
+        )
+    extension, mime = EXPORT_FORMATS[export_format]
+
+    with col_download:
+        data = get_export_cache().get((result_hash(parsed_result), export_format))
+        if data is None and st.button(f"📦 Prepare {export_format} download", key=f"prepare_{key}_{export_format}"):
+            with st.spinner(f"Building {export_format} file..."):
+                data = export_result(parsed_result, export_format)
+        if data is not None:
+            st.download_button(
+                label=f"📥 Download Parsed Results as {export_format}",
+                data=data,
+                file_name=f"parsed_{file_name}.{extension}",
+                mime=mime,
+                key=f"download_{key}_{export_format}",
+            )
+
+# Success message per parse source (engine's parsed_by)
+PARSED_BY_MESSAGES = {
+    "warehouse": "✅ Document parsed successfully with Databricks AI!",
+    "local": "✅ Document text extracted locally from the PDF's text layer!",
+}
+
+def render_parsed_result(parsed_result, file_name, key=None, parsed_by="warehouse"):
+    """Show a parsed document table with download and summary"""
+    st.success(PARSED_BY_MESSAGES.get(parsed_by, PARSED_BY_MESSAGES["warehouse"]))
+
+    # Display parsed results in a table
+    st.markdown("""
+    <div style="margin-top: 1rem;">
+        <h3 style="color: #004d40; font-weight: 600;">📊 Extracted Content</h3>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Show one page of the dataframe at a time
+    key = key or result_hash(parsed_result)
+    render_paginated_dataframe(parsed_result, key, height=400)
+
+    # Option to download results, generated only when requested
+    render_result_downloads(parsed_result, file_name, key)
+
+    # Display summary statistics
+    with st.expander("📈 Data Summary"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Rows", parsed_result.shape[0])
+        with col2:
+            st.metric("Columns", parsed_result.shape[1])
+        with col3:
+            st.metric("Data Points", parsed_result.shape[0] * parsed_result.shape[1])
+
+        # Structured ai_parse_document output is flattened to one row per element
+        if "page_id" in parsed_result and "type" in parsed_result:
+            col4, col5, col6 = st.columns(3)
+            with col4:
+                st.metric("Pages", parsed_result["page_id"].nunique())
+            with col5:
+                st.metric("Tables", int(parsed_result["type"].eq("table").sum()))
+            with col6:
+                st.metric("Element Types", parsed_result["type"].nunique())
+
+def render_parse_cache_stats():
+    cache_stats = get_parse_cache().stats()
+    st.caption(
+        f"Parse cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+        f"{cache_stats['entries']} entries ({cache_stats['memory_bytes'] / (1024 * 1024):.1f} MB in memory)"
+    )
+
+def render_normalize_report(report):
+    """Caption how much client-side image normalization shrank the upload"""
+    if not report or not report["images"]:
+        return
+    saved = report["bytes_before"] - report["bytes_after"]
+    split = f", split {report['split']} multi-page files into {report['pages']} pages" if report["split"] else ""
+    st.caption(
+        f"🗜️ Normalized {report['changed']} of {report['images']} images in {report['seconds']:.1f}s{split}: "
+        f"{report['bytes_before'] / (1024 * 1024):.2f} MB → {report['bytes_after'] / (1024 * 1024):.2f} MB "
+        f"({saved / (1024 * 1024):.2f} MB less to upload and parse)"
+    )
+
+def render_table_write(result):
+    """Caption the outcome of writing a job's parse results to the Delta results table"""
+    if result.get("table_error"):
+        st.warning(f"⚠️ Could not write results to the Delta table: {result['table_error']}")
+    elif result.get("table"):
+        stats = result["table"]
+        st.caption(
+            f"💾 Wrote {stats['documents']} documents ({stats['rows']:,} rows) to the results table in "
+            f"{stats['statements']} MERGE statements ({stats['seconds']:.1f}s); {stats['unchanged']} were already up to date"
         )
-        
-        # Wait for completion
-        if statement.status.state == StatementState.SUCCEEDED:
-            # Get the result
-            if statement.result and statement.result.data_array:
-                data = statement.result.data_array
-                
-                if data and len(data) > 0:
-                    # Extract parsed content from first row
-                    parsed_content = data[0][0] if data[0] else None
-                    
-                    if parsed_content:
-                        # Convert parsed content to a structured format for display
-                        try:
-                            if isinstance(parsed_content, str):
-                                # Try to parse as JSON first
-                                try:
-                                    parsed_json = json.loads(parsed_content)
-                                    # If it's a list of dicts, create dataframe
-                                    if isinstance(parsed_json, list):
-                                        df = pd.DataFrame(parsed_json)
-                                    elif isinstance(parsed_json, dict):
-                                        df = pd.DataFrame([parsed_json])
-                                    else:
-                                        # Plain text - split by lines
-                                        lines = parsed_content.split('\n')
-                                        df = pd.DataFrame({'Content': lines})
-                                except json.JSONDecodeError:
-                                    # Not JSON, treat as plain text
-                                    lines = parsed_content.split('\n')
-                                    df = pd.DataFrame({'Content': lines})
-                            else:
-                                # If it's already structured, convert to dataframe
-                                df = pd.DataFrame([parsed_content])
-                            
-                            return df, None
-                        except Exception as e:
-                            # Fallback: return as single column dataframe
-                            df = pd.DataFrame({'Parsed_Text': [str(parsed_content)]})
-                            return df, None
-                    else:
-                        return None, "No content returned from ai_parse_document"
-                else:
-                    return None, "No data returned from query"
-            else:
-                return None, "Query returned no results"
+
+def render_upload_result(job, result):
+    """Render upload details and the AI parsing section of a finished single-file job"""
+    if result["skipped"]:
+        if result.get("page_paths"):
+            location = f"All {len(result['page_paths'])} pages of {result['file_name']} are"
         else:
-            error_msg = statement.status.error.message if statement.status.error else "Unknown error"
-            return None, f"SQL execution failed: {error_msg}"
-        
-    except Exception as e:
-        return None, str(e)
+            location = f"`{result['file_path']}` is"
+        st.info(
+            f"⏭️ {location} unchanged in the volume; skipped "
+            f"{result['size'] / (1024 * 1024):.2f} MB of transfer"
+        )
+    else:
+        st.success(f"✅ File successfully uploaded to Unity Catalog!")
+
+    # Display upload details
+    with st.expander("📋 Upload Details", expanded=True):
+        st.write(f"**File Name:** {result['file_name']}")
+        st.write(f"**File Size:** {result['size']:,} bytes ({result['size'] / 1024:.2f} KB)")
+        if result.get("page_paths"):
+            st.write(f"**Destination Paths:** {len(result['page_paths'])} pages")
+            st.code("\n".join(result["page_paths"]), language=None)
+        else:
+            st.write(f"**Destination Path:** `{result['file_path']}`")
+        st.write(f"**Volume:** {result['volume']}")
+        render_normalize_report(result.get("normalize"))
+
+    st.subheader("🤖 AI Document Parsing")
+    if not result["parsable"]:
+        file_extension = result["file_name"].lower().split('.')[-1]
+        st.info(f"ℹ️ AI document parsing is available for PDF and image files. Uploaded file type: `.{file_extension}`")
+    elif result["parse_error"]:
+        st.warning(f"⚠️ Document parsing encountered an issue: {result['parse_error']}")
+        render_parse_setup_help()
+    elif result["parsed"] is not None and not result["parsed"].empty:
+        if job.detail.get("from_cache"):
+            st.caption("⚡ Loaded from the parse cache: this exact file was parsed before.")
+        elif result["parsed_by"] == "local":
+            st.caption(f"⚡ Extracted locally from the PDF's text layer ({job.detail.get('local_parse')}); no warehouse compute used.")
+        render_table_write(result)
+        render_parsed_result(result["parsed"], result["file_name"], key=job.job_id, parsed_by=result["parsed_by"])
+    else:
+        st.info("ℹ️ No content extracted from the document. The file may be empty or contain no readable text.")
+    render_parse_cache_stats()
+
+def render_batch_result(job, result):
+    """Render the metrics, per-file status and bulk parse results of a finished batch job"""
+    import pandas as pd
+
+    summary = result["summary"]
+    st.dataframe(pd.DataFrame(job.detail["status_rows"].values()), use_container_width=True)
+
+    col_b1, col_b2, col_b3, col_b4 = st.columns(4)
+    with col_b1:
+        st.metric("Uploaded", len(summary.succeeded) - len(summary.skipped))
+    with col_b2:
+        st.metric("Failed", len(summary.failed))
+    with col_b3:
+        st.metric("Total Size", f"{summary.total_bytes / (1024 * 1024):.2f} MB")
+    with col_b4:
+        st.metric("Throughput", f"{summary.throughput_mb_s:.2f} MB/s")
+
+    if summary.skipped:
+        st.info(
+            f"⏭️ Skipped {len(summary.skipped)} unchanged files, "
+            f"saving {summary.bytes_saved / (1024 * 1024):.2f} MB of transfer"
+        )
+
+    total = len(summary.results)
+    if summary.failed:
+        st.warning(f"⚠️ {len(summary.failed)} of {total} files failed to upload. See the status table for details.")
+    else:
+        st.success(f"✅ All {total} files uploaded to Unity Catalog in {summary.elapsed:.1f}s!")
+    render_normalize_report(result.get("normalize"))
+
+    if result["parse_rows"]:
+        st.subheader("🤖 AI Document Parsing")
+        st.dataframe(pd.DataFrame(result["parse_rows"]), use_container_width=True)
+        st.caption(f"Parsed {len(result['parsed'])} of {result['parse_count']} documents in {result['parse_elapsed']:.1f}s")
+        render_table_write(result)
+
+        for file_name, parsed_result in result["parsed"].items():
+            with st.expander(f"📊 {file_name}"):
+                render_paginated_dataframe(parsed_result, f"{job.job_id}_{file_name}", height=300)
+                render_result_downloads(parsed_result, file_name, f"{job.job_id}_{file_name}")
+
+def render_job_error(job):
+    """Show why a background job failed, with hints for the common causes"""
+    resumable = job.detail.get("resumable")
+    if job.error_type == "ResumableUploadError" and resumable:
+        st.error(f"❌ Upload interrupted: {job.error}")
+        st.info(
+            f"ℹ️ {resumable['parts_done']} of {resumable['part_count']} parts "
+            f"({resumable['bytes_done'] / (1024 * 1024):.1f} MB) are safely stored. "
+            "Click **Upload File** again to resume from where it stopped."
+        )
+    # Check if it's a DatabricksError
+    elif job.error_type == 'DatabricksError':
+        st.error(f"❌ Databricks Error: {job.error}")
+        with st.expander("🔍 Error Details"):
+            st.write(f"**Error Type:** DatabricksError")
+            st.write(f"**Message:** {job.error}")
+            st.write("**Common Issues:**")
+            st.write("- Check that the Unity Catalog volume exists")
+            st.write("- Verify you have WRITE permissions on the volume")
+            st.write("- Ensure the path format is correct: catalog.schema.volume_name")
+    else:
+        # General error handling
+        st.error(f"❌ Upload Failed: {job.error}")
+        with st.expander("🔍 Error Details"):
+            st.write(f"**Error Type:** {job.error_type}")
+            st.write(f"**Message:** {job.error}")
+
+def render_job_timings(job):
+    """Collapsible breakdown of where a job's time (and optionally memory) went, from its spans"""
+    import pandas as pd
+
+    with st.expander("⏱️ Performance Metrics"):
+        totals = {phase: ms for phase, ms in phase_totals(job.spans).items() if ms > 0}
+        if totals:
+            columns = st.columns(len(totals))
+            for column, (phase, ms) in zip(columns, totals.items()):
+                with column:
+                    st.metric(phase, f"{ms / 1000:.2f}s" if ms >= 1000 else f"{ms:.0f} ms")
+
+        # Indent each span under its parent, in start order
+        depth = {}
+        rows = []
+        for record in sorted(job.spans, key=lambda r: r["start_time"]):
+            depth[record["span_id"]] = depth.get(record["parent_span_id"], -1) + 1
+            peak = record.get("memory_peak_bytes")
+            rows.append({
+                "Span": "\u2003" * depth[record["span_id"]] + record["name"],
+                "Duration (ms)": record["duration_ms"],
+                "Peak Memory (MB)": round(peak / (1024 * 1024), 2) if peak is not None else None,
+                "Status": record["status"],
+                "Attributes": ", ".join(f"{k}={v}" for k, v in record["attributes"].items()),
+            })
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+        st.caption("Each span is also logged as a JSON record by the `telemetry` logger.")
+        render_warehouse_health()
+
+def render_warehouse_health():
+    """Table of what the warehouse router knows about each warehouse it has routed to"""
+    import pandas as pd
+
+    health = get_router().snapshot()
+    if not health:
+        return
+    now = time.monotonic()
+    st.markdown("**Warehouse routing**")
+    st.dataframe(pd.DataFrame([
+        {
+            "Warehouse": warehouse_id,
+            "State": warehouse.state or ("warm" if warehouse.warm(now) else "unknown"),
+            "Avg Latency (s)": round(warehouse.latency_s, 2) if warehouse.latency_s is not None else None,
+            "Succeeded": warehouse.successes,
+            "Failed": warehouse.failures,
+            "Cooldown (s)": round(max(warehouse.cooldown_until - now, 0.0)),
+            "Last Error": warehouse.last_error,
+        }
+        for warehouse_id, warehouse in health.items()
+    ]), use_container_width=True)
+
+def render_job(registry, job):
+    """Render one background job: live progress while it runs, its result once finished"""
+    import pandas as pd
+
+    icons = {"QUEUED": "🕒", "RUNNING": "⏳", "SUCCEEDED": "✅", "FAILED": "❌", "CANCELED": "⏹️"}
+    col_j1, col_j2 = st.columns([4, 1])
+    with col_j1:
+        st.markdown(f"**{icons.get(job.state, '')} {job.label}** · {job.state.lower()} · {job.elapsed:.0f}s")
+    with col_j2:
+        if not job.done:
+            if st.button("⏹️ Cancel", key=f"cancel_{job.job_id}", use_container_width=True):
+                registry.cancel(job.job_id)
+        elif st.button("🗑️ Dismiss", key=f"dismiss_{job.job_id}", use_container_width=True):
+            registry.forget(job.job_id)
+            st.rerun()
+
+    if not job.done:
+        st.progress(job.progress, text=job.message or "Queued...")
+        if job.detail.get("queue_position"):
+            st.caption(
+                f"🚦 Position {job.detail['queue_position']} in the SQL warehouse queue; "
+                f"up to {get_max_concurrent_statements()} parses run at once and waiting sessions take turns"
+            )
+        if "status_rows" in job.detail:
+            st.dataframe(pd.DataFrame(job.detail["status_rows"].values()), use_container_width=True)
+    elif job.state == "CANCELED":
+        st.info(f"ℹ️ {job.error or 'Job was cancelled.'}")
+    elif job.state == "FAILED":
+        render_job_error(job)
+    elif job.kind == "batch":
+        render_batch_result(job, job.result)
+    else:
+        render_upload_result(job, job.result)
+
+    if job.done and job.spans:
+        render_job_timings(job)
+
+def render_search():
+    """Search box over every document parsed by this app, answered from the local index"""
+    st.divider()
+    st.header("🔎 Search Parsed Documents")
+    index = get_search_index()
+    query = st.text_input(
+        "Search",
+        placeholder="e.g. invoice total 2024",
+        key="search_query",
+        label_visibility="collapsed"
+    )
+    if not query:
+        stats = index.stats()
+        st.caption(f"{stats['documents']} documents indexed · {stats['terms']} distinct terms")
+        return
+
+    started = time.perf_counter()
+    hits, total = index.search(query)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    st.caption(f"{total} matching documents of {len(index)} in {elapsed_ms:.1f} ms")
+    if hits:
+        st.dataframe(
+            [
+                {
+                    "Document": hit.name,
+                    "Pages": ", ".join(str(page + 1) for page in hit.pages[:10]) + (" …" if len(hit.pages) > 10 else ""),
+                    "Score": hit.score,
+                    "Snippet": hit.snippet,
+                    "Path": hit.file_path,
+                }
+                for hit in hits
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.info("No parsed document contains every search term")
+
+def render_jobs(registry, owner):
+    """Render this session's background jobs, newest first, and poll while any is running"""
+    jobs = registry.jobs_for(owner)
+    if not jobs:
+        return
+
+    st.divider()
+    st.header("🧵 Background Jobs")
+    for job in reversed(jobs):
+        with st.container():
+            render_job(registry, job)
+        st.divider()
+
+    # Jobs keep running between reruns; poll their status without blocking the page for long
+    if any(not job.done for job in jobs):
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
 
 # Title and Description
 st.markdown("""
@@ -343,7 +472,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Display SDK availability status
-warehouse_id = os.environ.get("DATABRICKS_WAREHOUSE_ID")
+warehouse_ids = get_warehouse_ids()
 
 col_status1, col_status2 = st.columns(2)
 
@@ -354,7 +483,9 @@ with col_status1:
         st.success("✅ Databricks SDK is available")
 
 with col_status2:
-    if warehouse_id and warehouse_id != "YOUR_WAREHOUSE_ID_HERE":
+    if len(warehouse_ids) > 1:
+        st.success(f"✅ {len(warehouse_ids)} SQL Warehouses configured (routed with failover)")
+    elif warehouse_ids:
         st.success("✅ SQL Warehouse configured")
     else:
         st.warning("⚠️ SQL Warehouse not configured")
@@ -364,7 +495,7 @@ with col_status2:
                 <p>AI document parsing requires a SQL Warehouse ID to be configured.</p>
                 <p style="margin-top: 1rem;"><strong style="color: #004d40;">Setup:</strong></p>
                 <ol>
-                    <li>Set <code style="background-color: #e0e0e0; padding: 0.2rem 0.5rem; border-radius: 3px;">DATABRICKS_WAREHOUSE_ID</code> in your <code>app.yaml</code></li>
+                    <li>Set <code class="uc-code">DATABRICKS_WAREHOUSE_ID</code> in your <code>app.yaml</code></li>
                     <li>Find your Warehouse ID in Databricks SQL > SQL Warehouses</li>
                     <li>Redeploy the app after updating the configuration</li>
                 </ol>
@@ -378,13 +509,30 @@ st.header("📁 Upload File to Unity Catalog Volume")
 col1, col2 = st.columns([2, 1])
 
 with col1:
-    uploaded_file = st.file_uploader(
-        "Select file to upload",
-        help="Choose any file from your local machine"
+    batch_mode = st.checkbox(
+        "📦 Batch upload (multiple files)",
+        help="Upload many files at once through a concurrent upload pool"
     )
 
+    if batch_mode:
+        uploaded_file = None
+        uploaded_files = st.file_uploader(
+            "Select files to upload",
+            accept_multiple_files=True,
+            help="Choose one or more files from your local machine"
+        ) or []
+    else:
+        uploaded_file = st.file_uploader(
+            "Select file to upload",
+            help="Choose any file from your local machine"
+        )
+        uploaded_files = [uploaded_file] if uploaded_file else []
+
 with col2:
-    if uploaded_file:
+    if batch_mode and uploaded_files:
+        st.metric("Files", len(uploaded_files))
+        st.metric("Total Size", f"{sum(f.size for f in uploaded_files) / (1024 * 1024):.2f} MB")
+    elif uploaded_file:
         st.metric("File Size", f"{uploaded_file.size / 1024:.2f} KB")
         st.metric("File Type", uploaded_file.type or "unknown")
 
@@ -395,13 +543,13 @@ st.subheader("🎯 Specify Destination Path")
 st.markdown("""
 <div style="background-color: #f5f5f5; padding: 1rem; border-radius: 8px; border-left: 4px solid #004d40; margin-bottom: 1rem;">
     <p style="margin: 0; color: #333333;">
-        Enter the Unity Catalog volume path in the format: <code style="background-color: #e0e0e0; padding: 0.2rem 0.5rem; border-radius: 3px;">catalog.schema.volume_name</code>
+        Enter the Unity Catalog volume path in the format: <code class="uc-code">catalog.schema.volume_name</code>
     </p>
     <p style="margin-top: 0.75rem; margin-bottom: 0.5rem; color: #004d40; font-weight: 500;">Examples:</p>
     <ul style="margin: 0; color: #757575;">
-        <li><code style="background-color: #e0e0e0; padding: 0.2rem 0.5rem; border-radius: 3px;">main.default.my_volume</code></li>
-        <li><code style="background-color: #e0e0e0; padding: 0.2rem 0.5rem; border-radius: 3px;">users.jason_taylor.agent_app_uploads</code></li>
-        <li><code style="background-color: #e0e0e0; padding: 0.2rem 0.5rem; border-radius: 3px;">prod.data.raw_files</code></li>
+        <li><code class="uc-code">main.default.my_volume</code></li>
+        <li><code class="uc-code">users.jason_taylor.agent_app_uploads</code></li>
+        <li><code class="uc-code">prod.data.raw_files</code></li>
     </ul>
 </div>
 """, unsafe_allow_html=True)
@@ -421,26 +569,110 @@ subfolder = st.text_input(
     help="Optional subfolder within the volume"
 )
 
+# Skip re-uploading files the volume already holds
+skip_unchanged = st.checkbox(
+    "⏭️ Skip files that are unchanged in the volume",
+    help="Checks the remote file before uploading and skips it when it already matches"
+)
+compare_hash = skip_unchanged and st.radio(
+    "Treat a file as unchanged when",
+    ["Size and content hash match", "Size matches"],
+    horizontal=True,
+    help="Content hash also needs a record of the SHA-256 this app uploaded earlier, so a file is skipped only "
+         "when its bytes are known to be the same"
+) == "Size and content hash match"
+if skip_unchanged and not compare_hash:
+    st.caption(
+        "⚠️ Size only: an edited file of the same size (a fixed typo, a re-scanned page) counts as unchanged "
+        "and is neither re-uploaded nor re-parsed."
+    )
+
+# Shrink scanned images before they are uploaded and parsed
+normalize = st.checkbox(
+    "🗜️ Normalize images before upload",
+    value=image_normalize_enabled(),
+    disabled=not PIL_AVAILABLE,
+    help=(
+        f"Splits multi-page TIFFs into pages, downscales scans above {get_target_dpi()} DPI and recompresses "
+        "lossless images as PNG, so less is uploaded and parsed" if PIL_AVAILABLE
+        else "Install Pillow to normalize images before upload"
+    )
+)
+
+# Persist parse results in a Delta table instead of downloading them
+results_table = st.text_input(
+    "💾 Delta results table (optional)",
+    value=get_results_table() or "",
+    placeholder="catalog.schema.table_name",
+    help="Parsed elements are merged into this table, keyed by file path and content hash; it is created if missing"
+).strip() or None
+if results_table:
+    try:
+        table_identifier(results_table)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        st.stop()
+
 # Upload Button
 st.divider()
 
-if uploaded_file and upload_volume_path:
-    # Parse the volume path (catalog.schema.volume_name)
+if batch_mode and uploaded_files and upload_volume_path:
     try:
-        parts = upload_volume_path.split('.')
-        if len(parts) != 3:
-            st.error("❌ Invalid volume path format. Please use: catalog.schema.volume_name")
-            st.stop()
-        
-        catalog, schema, volume_name = parts
-        
-        # Construct full file path with proper Unity Catalog format
-        if subfolder:
-            file_path = f"/Volumes/{catalog}/{schema}/{volume_name}/{subfolder}/{uploaded_file.name}"
+        volume_directory = get_volume_directory(upload_volume_path, subfolder)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        st.stop()
+
+    st.info(f"📍 **Destination:** `{volume_directory}/` ({len(uploaded_files)} files)")
+
+    concurrency = st.slider(
+        "Concurrent uploads",
+        min_value=1,
+        max_value=16,
+        value=min(get_upload_concurrency(), 16),
+        help="Maximum number of files uploaded at the same time"
+    )
+
+    parse_batch = st.checkbox(
+        "🤖 Parse PDF and image files with Databricks AI after upload",
+        value=True,
+        help="Parses all supported files together in a single ai_parse_document statement"
+    )
+
+    if st.button("🔼 Upload Files", type="primary", use_container_width=True):
+        if not DATABRICKS_SDK_AVAILABLE:
+            st.error("❌ Databricks SDK not available. Please install databricks-sdk.")
         else:
-            file_path = f"/Volumes/{catalog}/{schema}/{volume_name}/{uploaded_file.name}"
-    except Exception as e:
-        st.error(f"❌ Error parsing volume path: {e}")
+            try:
+                w = get_workspace_client()
+            except Exception as e:
+                st.error(f"❌ Could not connect to Databricks: {e}")
+                st.stop()
+
+            # Uploads and parsing run on the background worker pool and survive reruns
+            items = [(f.name, f"{volume_directory}/{f.name}", f) for f in uploaded_files]
+            job_registry.submit(
+                ingest_batch,
+                w,
+                items,
+                concurrency,
+                parse_batch,
+                skip_unchanged=skip_unchanged,
+                compare_hash=compare_hash,
+                normalize=normalize,
+                results_table=results_table,
+                kind="batch",
+                label=f"Batch upload of {len(items)} files to {volume_directory}/",
+                owner=session_id
+            )
+            st.toast(f"🔼 Queued {len(items)} files for upload")
+
+elif uploaded_file and upload_volume_path:
+    # Parse the volume path (catalog.schema.volume_name)
+    try:
+        file_path = f"{get_volume_directory(upload_volume_path, subfolder)}/{uploaded_file.name}"
+    except ValueError as e:
+        st.error(f"❌ {e}")
         st.stop()
     
     # Display where file will be uploaded
@@ -451,129 +683,37 @@ if uploaded_file and upload_volume_path:
         if not DATABRICKS_SDK_AVAILABLE:
             st.error("❌ Databricks SDK not available. Please install databricks-sdk.")
         else:
-            with st.spinner(f"Uploading {uploaded_file.name}..."):
-                try:
-                    # Initialize workspace client only when needed
-                    w = WorkspaceClient()
-                    
-                    # Read file content into BytesIO buffer
-                    file_content = uploaded_file.read()
-                    buffer = io.BytesIO(file_content)
-                    
-                    # Upload to Unity Catalog volume using Databricks SDK
-                    w.files.upload(file_path=file_path, contents=buffer, overwrite=True)
-                    
-                    # Success message
-                    st.success(f"✅ File successfully uploaded to Unity Catalog!")
-                    st.balloons()
-                    
-                    # Display upload details
-                    with st.expander("📋 Upload Details", expanded=True):
-                        st.write(f"**File Name:** {uploaded_file.name}")
-                        st.write(f"**File Size:** {len(file_content):,} bytes ({len(file_content) / 1024:.2f} KB)")
-                        st.write(f"**Destination Path:** `{file_path}`")
-                        st.write(f"**Volume:** {upload_volume_path}")
-                    
-                    # AI Document Parsing Section
-                    st.divider()
-                    st.subheader("🤖 AI Document Parsing")
-                    
-                    # Check if file is a PDF or image
-                    file_extension = uploaded_file.name.lower().split('.')[-1]
-                    supported_formats = ['pdf', 'png', 'jpg', 'jpeg', 'tiff', 'bmp']
-                    
-                    if file_extension in supported_formats:
-                        with st.spinner("Reading file and parsing document with Databricks AI... (this may take up to 50 seconds)"):
-                            try:
-                                parsed_result, parse_error = parse_document_with_ai(file_path, w)
-                                
-                                if parse_error:
-                                    st.warning(f"⚠️ Document parsing encountered an issue: {parse_error}")
-                                    with st.expander("ℹ️ Setup Instructions"):
-                                        st.markdown("""
-                                        <div style="font-family: 'Roboto', sans-serif; color: #333333;">
-                                            <p>This app uses Databricks' built-in <code style="background-color: #e0e0e0; padding: 0.2rem 0.5rem; border-radius: 3px;">ai_parse_document</code> function to extract text and structure from documents.</p>
-                                            <p style="margin-top: 1rem;"><strong style="color: #004d40;">Requirements:</strong></p>
-                                            <ul>
-                                                <li>A Databricks SQL Warehouse for query execution</li>
-                                                <li>Databricks Runtime with AI functions enabled</li>
-                                                <li>Access to Databricks AI/Foundation Model APIs</li>
-                                                <li>Environment variable <code style="background-color: #e0e0e0; padding: 0.2rem 0.5rem; border-radius: 3px;">DATABRICKS_WAREHOUSE_ID</code> must be set</li>
-                                            </ul>
-                                            <p style="margin-top: 1rem;"><strong style="color: #004d40;">How to set the Warehouse ID:</strong></p>
-                                            <ol>
-                                                <li>Go to your Databricks SQL Warehouses</li>
-                                                <li>Copy the Warehouse ID from your SQL Warehouse</li>
-                                                <li>Set it as an environment variable in your app configuration</li>
-                                            </ol>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                elif parsed_result is not None and not parsed_result.empty:
-                                    st.success("✅ Document parsed successfully with Databricks AI!")
-                                    
-                                    # Display parsed results in a table
-                                    st.markdown("""
-                                    <div style="margin-top: 1rem;">
-                                        <h3 style="color: #004d40; font-weight: 600;">📊 Extracted Content</h3>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                    
-                                    # Show dataframe with custom styling
-                                    st.dataframe(
-                                        parsed_result,
-                                        use_container_width=True,
-                                        height=400
-                                    )
-                                    
-                                    # Option to download results
-                                    csv = parsed_result.to_csv(index=False).encode('utf-8')
-                                    st.download_button(
-                                        label="📥 Download Parsed Results as CSV",
-                                        data=csv,
-                                        file_name=f"parsed_{uploaded_file.name}.csv",
-                                        mime="text/csv",
-                                    )
-                                    
-                                    # Display summary statistics
-                                    with st.expander("📈 Data Summary"):
-                                        col1, col2, col3 = st.columns(3)
-                                        with col1:
-                                            st.metric("Rows", parsed_result.shape[0])
-                                        with col2:
-                                            st.metric("Columns", parsed_result.shape[1])
-                                        with col3:
-                                            st.metric("Data Points", parsed_result.shape[0] * parsed_result.shape[1])
-                                else:
-                                    st.info("ℹ️ No content extracted from the document. The file may be empty or contain no readable text.")
-                                    
-                            except Exception as e:
-                                st.error(f"❌ Document parsing failed: {e}")
-                                with st.expander("🔍 Error Details"):
-                                    st.write(f"**Error Type:** {type(e).__name__}")
-                                    st.write(f"**Message:** {str(e)}")
-                                    st.write("**Tip:** Ensure you have access to Databricks AI functions and the workspace is properly configured.")
-                    else:
-                        st.info(f"ℹ️ AI document parsing is available for PDF and image files. Uploaded file type: `.{file_extension}`")
-                        
-                except Exception as e:
-                    # Check if it's a DatabricksError
-                    if DATABRICKS_SDK_AVAILABLE and type(e).__name__ == 'DatabricksError':
-                        st.error(f"❌ Databricks Error: {e}")
-                        with st.expander("🔍 Error Details"):
-                            st.write(f"**Error Type:** DatabricksError")
-                            st.write(f"**Message:** {str(e)}")
-                            st.write("**Common Issues:**")
-                            st.write("- Check that the Unity Catalog volume exists")
-                            st.write("- Verify you have WRITE permissions on the volume")
-                            st.write("- Ensure the path format is correct: catalog.schema.volume_name")
-                    else:
-                        # General error handling
-                        st.error(f"❌ Upload Failed: {e}")
-                        with st.expander("🔍 Error Details"):
-                            st.write(f"**Error Type:** {type(e).__name__}")
-                            st.write(f"**Message:** {str(e)}")
-
-elif not uploaded_file:
+            try:
+                # Reuse the process-wide client and its warm connection pool
+                w = get_workspace_client()
+            except Exception as e:
+                st.error(f"❌ Could not connect to Databricks: {e}")
+                st.stop()
+
+            # Upload and parsing run on the background worker pool, so widget
+            # interactions while they run no longer abandon or repeat the work
+            job_registry.submit(
+                ingest_file,
+                w,
+                uploaded_file.name,
+                file_path,
+                uploaded_file,
+                upload_volume_path,
+                st.session_state.setdefault("resumable_uploads", {}),
+                skip_unchanged=skip_unchanged,
+                compare_hash=compare_hash,
+                normalize=normalize,
+                results_table=results_table,
+                kind="upload",
+                label=f"Upload {uploaded_file.name}",
+                owner=session_id
+            )
+            st.toast(f"🔼 Queued {uploaded_file.name} for upload")
+
+elif not uploaded_files:
     st.warning("⚠️ Please select a file to upload")
 elif not upload_volume_path:
     st.warning("⚠️ Please specify a Unity Catalog volume path")
+
+render_search()
+render_jobs(job_registry, session_id)
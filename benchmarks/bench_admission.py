@@ -0,0 +1,90 @@
+"""Burst of parse requests from several sessions against a saturated fake warehouse, with and without admission control.
+
+One session submits a large batch of single-file parses, then a few other
+sessions each submit one. Without a cap every statement goes straight to
+the warehouse, whose FIFO queue makes the small sessions wait behind the
+whole batch and pushes late statements past the parse timeout. With
+admission control the process holds at most --cap statements on the
+warehouse and admits the waiting sessions round-robin.
+
+    python benchmarks/bench_admission.py --capacity 2 --batch 10 --sessions 4 --timeout 6
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_workspace import FakeStatementExecution, FakeWorkspaceClient  # noqa: E402
+
+from admission import admission_scope  # noqa: E402
+from parsing import parse_document_with_ai  # noqa: E402
+
+
+def run_burst(args, cap):
+    # A separate warehouse id per run gives each run its own admission controller
+    os.environ["DATABRICKS_WAREHOUSE_ID"] = f"fake-warehouse-cap-{cap}"
+    os.environ["PARSE_MAX_CONCURRENT_STATEMENTS"] = str(cap)
+    statements = FakeStatementExecution(queue_s=0.1, execution_s=args.execution_s, capacity=args.capacity,
+                                        pages=2, elements_per_page=5)
+    client = FakeWorkspaceClient(statement_execution=statements)
+
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def parse(owner, index):
+        started = time.perf_counter()
+        with admission_scope(owner):
+            _, error = parse_document_with_ai(f"/Volumes/c/s/v/{owner}_{index}.pdf", client, timeout=args.timeout)
+        with lock:
+            latencies.setdefault(owner, []).append(time.perf_counter() - started)
+            if error:
+                errors[owner] = errors.get(owner, 0) + 1
+
+    threads = [threading.Thread(target=parse, args=("batch", i)) for i in range(args.batch)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    small = [threading.Thread(target=parse, args=(f"session{i}", 0)) for i in range(args.sessions)]
+    for thread in small:
+        thread.start()
+    started = time.perf_counter()
+    for thread in threads + small:
+        thread.join()
+
+    small_latencies = [latency for owner, values in latencies.items() if owner != "batch" for latency in values]
+    warehouse_queue = [info["running_at"] - info["submitted_at"] for info in statements.statements.values()]
+    return {
+        "batch_mean": statistics.mean(latencies["batch"]),
+        "small_mean": statistics.mean(small_latencies),
+        "small_max": max(small_latencies),
+        "timeouts": sum(errors.values()),
+        "warehouse_queue_max": max(warehouse_queue),
+        "wall": time.perf_counter() - started + 0.2,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--capacity", type=int, default=2, help="Statements the fake warehouse runs at once")
+    parser.add_argument("--execution-s", type=float, default=1.2, help="Run time of one statement")
+    parser.add_argument("--batch", type=int, default=10, help="Parses submitted by the large session")
+    parser.add_argument("--sessions", type=int, default=4, help="Other sessions submitting one parse each")
+    parser.add_argument("--timeout", type=float, default=6.0, help="Per-statement parse timeout in seconds")
+    parser.add_argument("--cap", type=int, help="Admission cap (default: the warehouse capacity)")
+    args = parser.parse_args()
+
+    print(f"{'mode':<22} {'batch mean':>10} {'small mean':>10} {'small max':>10} {'timeouts':>9} {'wh queue max':>12} {'wall':>7}")
+    for label, cap in (("no admission control", 10_000), (f"admission cap {args.cap or args.capacity}", args.cap or args.capacity)):
+        r = run_burst(args, cap)
+        print(f"{label:<22} {r['batch_mean']:>9.1f}s {r['small_mean']:>9.1f}s {r['small_max']:>9.1f}s "
+              f"{r['timeouts']:>9} {r['warehouse_queue_max']:>11.1f}s {r['wall']:>6.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Cold-start and per-rerun cost of the Streamlit page, measured with streamlit.testing.
+
+Each sample runs in a fresh interpreter: the first AppTest run pays for
+importing the app's modules (cold start), the following runs are reruns of
+the already-imported script. Also reports which heavy libraries the first
+render imported.
+
+    python benchmarks/bench_app_startup.py --samples 5 --reruns 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["pandas", "pyarrow", "databricks.sdk", "pypdf"]
+
+_SAMPLE = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+streamlit_loaded = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=60)
+at.run()
+first = time.perf_counter()
+loaded = [m for m in {heavy!r} if m in sys.modules]
+reruns = []
+for _ in range({reruns}):
+    t = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - t)
+assert not at.exception, at.exception
+print(json.dumps({{
+    "streamlit_import": streamlit_loaded - started,
+    "first_run": first - streamlit_loaded,
+    "reruns": reruns,
+    "loaded": loaded,
+}}))
+"""
+
+
+def run_sample(reruns):
+    code = _SAMPLE.format(heavy=HEAVY_MODULES, reruns=reruns)
+    env = dict(os.environ, DATABRICKS_WAREHOUSE_ID="")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=5, help="Fresh interpreters to start")
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns timed per interpreter")
+    args = parser.parse_args()
+
+    samples = [run_sample(args.reruns) for _ in range(args.samples)]
+    first = [s["first_run"] * 1000 for s in samples]
+    reruns = [r * 1000 for s in samples for r in s["reruns"]]
+    print(f"streamlit import:   {statistics.median(s['streamlit_import'] for s in samples) * 1000:8.1f} ms (not app cost)")
+    print(f"cold first render:  {statistics.median(first):8.1f} ms median of {len(first)}")
+    print(f"rerun:              {statistics.median(reruns):8.1f} ms median of {len(reruns)}")
+    print(f"imported on first render: {', '.join(samples[0]['loaded']) or 'none of ' + ', '.join(HEAVY_MODULES)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Measure batch upload throughput against a local fake of the Files API.
+
+The fake simulates per-request latency and bandwidth and fails a fraction of
+uploads, so the run also checks that one failure does not abort the batch.
+
+    python benchmarks/bench_batch_upload.py --files 200 --size-kb 512 --concurrency 1 4 16
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uploads import upload_batch  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class FakeFiles:
+    """Files API stand-in with fixed latency, per-connection bandwidth and random failures"""
+
+    def __init__(self, latency=0.05, bandwidth_mb_s=50.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.bandwidth = bandwidth_mb_s * MB
+        self.failure_rate = failure_rate
+        self.stored = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def upload(self, file_path, contents, overwrite=True):
+        with self._lock:
+            fail = self._random.random() < self.failure_rate
+        time.sleep(self.latency)
+        if fail:
+            raise IOError(f"Injected failure uploading {file_path}")
+
+        received = 0
+        while True:
+            block = contents.read(MB)
+            if not block:
+                break
+            received += len(block)
+        time.sleep(received / self.bandwidth)
+
+        with self._lock:
+            self.stored[file_path] = received
+
+
+class FakeWorkspaceClient:
+    def __init__(self, **kwargs):
+        self.files = FakeFiles(**kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per upload request")
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_kb * 1024)
+
+    print(f"{'workers':>8} {'ok':>5} {'failed':>7} {'seconds':>8} {'MB/s':>8}")
+    for workers in args.concurrency:
+        client = FakeWorkspaceClient(latency=args.latency, failure_rate=args.failure_rate)
+        items = [(f"doc_{i}.pdf", f"/Volumes/c/s/v/doc_{i}.pdf", io.BytesIO(payload)) for i in range(args.files)]
+        summary = upload_batch(client, items, max_workers=workers)
+
+        assert len(summary.results) == args.files
+        assert len(client.files.stored) == len(summary.succeeded)
+        print(f"{workers:>8} {len(summary.succeeded):>5} {len(summary.failed):>7} "
+              f"{summary.elapsed:>8.2f} {summary.throughput_mb_s:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
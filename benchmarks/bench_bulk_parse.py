@@ -0,0 +1,95 @@
+"""Compare one parse statement per file with bulk parse statements.
+
+Uses a stub statement-execution client in which every statement pays a fixed
+warehouse queueing delay plus a per-file execution cost.
+
+    python benchmarks/bench_bulk_parse.py --files 20 --queue-s 1.0 --per-file-s 0.02
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from databricks.sdk.service.sql import StatementState  # noqa: E402
+
+from parsing import parse_document_with_ai, parse_documents_bulk  # noqa: E402
+
+_READ_FILES = re.compile(r"read_files\('((?:[^'\\]|\\.)*)'")
+
+
+class StubStatementExecution:
+    """Statement Execution API stand-in; statements finish after queue + per-file time"""
+
+    def __init__(self, queue_s, per_file_s):
+        self.queue_s = queue_s
+        self.per_file_s = per_file_s
+        self.statements = {}
+        self.executed = 0
+        self._lock = threading.Lock()
+
+    def execute_statement(self, warehouse_id, statement, **kwargs):
+        paths = [p.replace("\\'", "'") for p in _READ_FILES.findall(statement)]
+        with self._lock:
+            self.executed += 1
+            statement_id = f"stmt-{self.executed}"
+            self.statements[statement_id] = {
+                "paths": paths,
+                "done_at": time.monotonic() + self.queue_s + self.per_file_s * len(paths),
+                "with_path": "SELECT path," in statement,
+            }
+        return self.get_statement(statement_id)
+
+    def get_statement(self, statement_id):
+        info = self.statements[statement_id]
+        if time.monotonic() < info["done_at"]:
+            return SimpleNamespace(statement_id=statement_id, status=SimpleNamespace(state=StatementState.RUNNING, error=None), result=None)
+
+        rows = []
+        for path in info["paths"]:
+            parsed = json.dumps({"document": {"pages": [{"id": 0}], "elements": [{"type": "text", "content": path}]}})
+            rows.append([f"dbfs:{path}", parsed] if info["with_path"] else [parsed])
+        result = SimpleNamespace(data_array=rows, next_chunk_index=None)
+        return SimpleNamespace(statement_id=statement_id, status=SimpleNamespace(state=StatementState.SUCCEEDED, error=None), result=result)
+
+    def cancel_execution(self, statement_id):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--queue-s", type=float, default=1.0, help="Warehouse queueing delay per statement")
+    parser.add_argument("--per-file-s", type=float, default=0.02, help="ai_parse_document cost per file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABRICKS_WAREHOUSE_ID", "stub-warehouse")
+    paths = [f"/Volumes/c/s/v/invoice_{i}.pdf" for i in range(args.files)]
+
+    client = SimpleNamespace(statement_execution=StubStatementExecution(args.queue_s, args.per_file_s))
+    started = time.perf_counter()
+    for path in paths:
+        _, error = parse_document_with_ai(path, client)
+        assert error is None, error
+    per_file = time.perf_counter() - started
+    per_file_statements = client.statement_execution.executed
+
+    client = SimpleNamespace(statement_execution=StubStatementExecution(args.queue_s, args.per_file_s))
+    started = time.perf_counter()
+    results = parse_documents_bulk(client, paths)
+    bulk = time.perf_counter() - started
+    assert all(error is None for _, error in results.values())
+
+    print(f"{'mode':<10} {'statements':>10} {'seconds':>9}")
+    print(f"{'per-file':<10} {per_file_statements:>10} {per_file:>9.2f}")
+    print(f"{'bulk':<10} {client.statement_execution.executed:>10} {bulk:>9.2f}")
+    print(f"speedup: {per_file / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
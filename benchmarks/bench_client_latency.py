@@ -0,0 +1,103 @@
+"""Compare upload latency with a WorkspaceClient per click vs. the shared cached client.
+
+Runs the real databricks-sdk against a local HTTP stand-in for the Files API.
+The server sleeps once per new connection to model the TCP + TLS handshake
+a fresh client pays against a real workspace.
+
+    python benchmarks/bench_client_latency.py --uploads 20 --handshake-ms 40
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workspace  # noqa: E402
+from uploads import upload_to_volume  # noqa: E402
+
+
+def _make_handler(handshake_seconds):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # New connection: charge the simulated handshake once
+            time.sleep(handshake_seconds)
+
+        def _reply(self, status=200, body=b"{}"):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _drain(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+
+        def do_PUT(self):
+            self._drain()
+            self._reply(204, b"")
+
+        def do_POST(self):
+            self._drain()
+            self._reply()
+
+        def do_GET(self):
+            self._reply()
+
+        def do_HEAD(self):
+            self._reply()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _time_uploads(get_client, uploads, payload):
+    timings = []
+    for i in range(uploads):
+        started = time.perf_counter()
+        client = get_client()
+        upload_to_volume(client, f"/Volumes/c/s/v/bench_{i}.pdf", io.BytesIO(payload))
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _report(label, timings):
+    steady = timings[1:] or timings
+    print(f"{label:<22} first {timings[0] * 1000:8.1f} ms   steady median {statistics.median(steady) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--handshake-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(args.handshake_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["DATABRICKS_HOST"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["DATABRICKS_TOKEN"] = "dapi-benchmark"
+    payload = os.urandom(args.size_kb * 1024)
+
+    try:
+        _report("client per upload", _time_uploads(workspace.create_workspace_client, args.uploads, payload))
+        workspace.reset_workspace_client()
+        _report("shared cached client", _time_uploads(workspace.get_workspace_client, args.uploads, payload))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
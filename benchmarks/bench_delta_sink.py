@@ -0,0 +1,98 @@
+"""Cost of persisting parse results in a Delta table: per-document writes, micro-batched MERGE and server-side parse.
+
+Every mode writes --docs documents of --pages x --elements-per-page elements
+through delta_sink against a fake warehouse whose statements each take
+--statement-s, and then writes them again to show the idempotent re-run
+(fetched parses come from the parse cache the second time).
+"fetch + per-document" and "fetch + micro-batched" first fetch warehouse
+parse results into the process and send the rows back in MERGE statements;
+"server-side" runs ai_parse_document inside the MERGE, so only SQL text
+crosses the wire.
+
+    python benchmarks/bench_delta_sink.py --docs 200 --pages 5 --elements-per-page 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_workspace import FakeStatementExecution, FakeWorkspaceClient  # noqa: E402
+
+from delta_sink import DeltaSink  # noqa: E402
+from parsing import parse_documents_bulk, parsed_content_to_dataframe  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class MeteredStatementExecution(FakeStatementExecution):
+    """Counts the statement text sent and the result bytes returned"""
+
+    sent = 0
+    received = 0
+
+    def execute_statement(self, warehouse_id, statement, **kwargs):
+        self.sent += len(statement)
+        return super().execute_statement(warehouse_id, statement, **kwargs)
+
+    def get_statement(self, statement_id):
+        response = super().get_statement(statement_id)
+        if response.result is not None:
+            self.received += sum(len(str(value)) for row in response.result.data_array for value in row)
+        return response
+
+
+def run_mode(mode, args):
+    statement_execution = MeteredStatementExecution(
+        queue_s=0.0, execution_s=args.statement_s, per_file_s=0.0, pages=args.pages,
+        elements_per_page=args.elements_per_page
+    )
+    client = FakeWorkspaceClient(statement_execution=statement_execution)
+    # Hashes are distinct per mode so one mode's parse cache entries do not serve the next
+    file_hashes = {f"/Volumes/c/s/v/doc{i:05d}.pdf": f"{mode}:{i:064x}" for i in range(args.docs)}
+
+    def write():
+        sink = DeltaSink(client, "main.default.parsed_elements", batch_rows=args.batch_rows)
+        if mode == "server-side":
+            sink.parse_into_table(file_hashes)
+            return sink.stats
+        parsed = parse_documents_bulk(client, list(file_hashes), file_hashes=file_hashes)
+        for file_path, (content, _) in parsed.items():
+            sink.add(file_path, file_hashes[file_path], parsed_content_to_dataframe(content), "warehouse")
+            if mode == "fetch + per-document":
+                sink.flush()
+        return sink.flush()
+
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        stats = write()
+        timings.append((time.perf_counter() - started, stats["statements"], stats["rows"]))
+    table = statement_execution.tables.tables["`main`.`default`.`parsed_elements`"]
+    return timings, len(statement_execution.statements), statement_execution.sent, statement_execution.received, len(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--elements-per-page", type=int, default=20)
+    parser.add_argument("--batch-rows", type=int, default=10000, help="Rows per MERGE (RESULTS_TABLE_BATCH_ROWS)")
+    parser.add_argument("--statement-s", type=float, default=0.3, help="Simulated time of every statement")
+    args = parser.parse_args()
+    os.environ.setdefault("DATABRICKS_WAREHOUSE_ID", "fake-warehouse")
+    os.environ["PARSE_RESULT_DISPOSITION"] = "INLINE"
+
+    print(f"{'mode':<22} {'write':>7} {'MERGEs':>7} {'rerun':>7} {'rerun MERGEs':>12} "
+          f"{'all stmts':>9} {'sent':>8} {'received':>9} {'table rows':>10}")
+    for mode in ("fetch + per-document", "fetch + micro-batched", "server-side"):
+        timings, statements, sent, received, rows = run_mode(mode, args)
+        (first, first_merges, _), (rerun, rerun_merges, _) = timings
+        print(f"{mode:<22} {first:>6.2f}s {first_merges:>7} {rerun:>6.2f}s {rerun_merges:>12} "
+              f"{statements:>9} {sent / MB:>7.2f}M {received / MB:>8.2f}M {rows:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Bytes uploaded and parse time for a scanned-image batch with and without client-side normalization.
+
+Builds a synthetic scan corpus with Pillow: a multi-page uncompressed TIFF
+and a BMP scanned at --dpi, a PNG at twice that and a JPEG that is already
+small. It reports what imageprep.normalize_images does to each file, the
+normalization time with one worker and with --workers, and the end-to-end
+ingest_batch time against a fake workspace whose upload bandwidth and parse
+cost per MB are set by --bandwidth-mb-s and --parse-s-per-mb.
+
+    python benchmarks/bench_image_normalize.py --tiff-pages 8 --dpi 300 --workers 4
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_workspace import FakeFiles, FakeStatementExecution, FakeWorkspaceClient  # noqa: E402
+
+from engine import ingest_batch  # noqa: E402
+from imageprep import PIL_AVAILABLE, normalize_images  # noqa: E402
+from jobs import Job  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def make_scan(dpi, seed, mode="L"):
+    """Letter-size page of text lines with light scanner noise"""
+    from PIL import Image, ImageDraw
+
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    line_height = max(12, dpi // 6)
+    for number, y in enumerate(range(dpi, height - dpi, line_height)):
+        draw.text((dpi, y), f"Invoice {seed}-{number}: quantity, unit price and total for the period", fill=0)
+    noise = Image.effect_noise((width, height), 6).point(lambda v: 255 if v > 140 else 0)
+    page = Image.composite(page, Image.new("L", (width, height), 235), noise)
+    return page.convert(mode)
+
+
+def make_corpus(tiff_pages, dpi):
+    """(name, bytes) pairs of a multi-page TIFF, a BMP, an oversized PNG and a small JPEG"""
+    def encode(image, image_format, **options):
+        out = io.BytesIO()
+        image.save(out, format=image_format, **options)
+        return out.getvalue()
+
+    pages = [make_scan(dpi, seed) for seed in range(tiff_pages)]
+    return [
+        ("scan_batch.tiff", encode(pages[0], "TIFF", save_all=True, append_images=pages[1:], dpi=(dpi, dpi))),
+        ("letter.bmp", encode(make_scan(dpi, 100, "RGB"), "BMP")),
+        ("photo_scan.png", encode(make_scan(dpi * 2, 200), "PNG", dpi=(dpi * 2, dpi * 2))),
+        ("receipt.jpg", encode(make_scan(150, 300, "RGB"), "JPEG", quality=85, dpi=(150, 150))),
+    ]
+
+
+def timed_ingest(corpus, normalize, args):
+    files = FakeFiles(latency=0.02, bandwidth_mb_s=args.bandwidth_mb_s)
+    client = FakeWorkspaceClient(files=files, statement_execution=FakeStatementExecution(
+        queue_s=0.2, execution_s=0.5, per_file_s=0.1, pages=1, elements_per_page=5,
+        files=files, per_mb_s=args.parse_s_per_mb
+    ))
+    items = [(name, f"/Volumes/c/s/v/{name}", io.BytesIO(data)) for name, data in corpus]
+    job = Job(uuid.uuid4().hex, "batch", "bench")
+    started = time.perf_counter()
+    result = ingest_batch(job, client, items, 4, True, normalize=normalize)
+    elapsed = time.perf_counter() - started
+    uploaded = sum(stored[0] for stored in files.stored.values())
+    return elapsed, uploaded, len(files.stored), len(result["parsed"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tiff-pages", type=int, default=8)
+    parser.add_argument("--dpi", type=int, default=300, help="Scan resolution of the TIFF and BMP")
+    parser.add_argument("--target-dpi", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--bandwidth-mb-s", type=float, default=20.0, help="Simulated upload bandwidth")
+    parser.add_argument("--parse-s-per-mb", type=float, default=0.5, help="Simulated parse cost per MB read")
+    args = parser.parse_args()
+    if not PIL_AVAILABLE:
+        sys.exit("Pillow is required: pip install Pillow")
+    os.environ.setdefault("DATABRICKS_WAREHOUSE_ID", "fake-warehouse")
+    os.environ["IMAGE_TARGET_DPI"] = str(args.target_dpi)
+
+    corpus = make_corpus(args.tiff_pages, args.dpi)
+    print(f"{'file':<16} {'before':>9} {'after':>9} {'pages':>6} {'changed':>8}")
+    for image in normalize_images(corpus, args.target_dpi, workers=1):
+        print(f"{image.name:<16} {image.original_bytes / MB:>8.2f}M {image.normalized_bytes / MB:>8.2f}M "
+              f"{len(image.pages):>6} {str(image.changed):>8}")
+
+    print(f"\nNormalize time ({os.cpu_count()} CPUs available)")
+    for workers in sorted({1, args.workers}):
+        normalize_images(corpus, args.target_dpi, workers=workers)  # warm the pool
+        started = time.perf_counter()
+        normalize_images(corpus, args.target_dpi, workers=workers)
+        print(f"  {workers} worker{'s' if workers > 1 else ''}: {time.perf_counter() - started:.2f}s")
+
+    print(f"\n{'mode':<12} {'uploaded':>9} {'files':>6} {'parsed':>7} {'ingest':>8}")
+    for label, normalize in (("original", False), ("normalized", True)):
+        elapsed, uploaded, files, parsed = timed_ingest(corpus, normalize, args)
+        print(f"{label:<12} {uploaded / MB:>8.2f}M {files:>6} {parsed:>7} {elapsed:>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Time the local text-layer PDF parser against a simulated warehouse ai_parse_document round trip.
+
+Generates a text-native PDF and an image-only (scanned-like) PDF, runs them
+through localparse.parse_pdf_locally and reports which path each one takes.
+
+    python benchmarks/bench_local_parse.py --pages 200 --workers 4 --warehouse-seconds 20
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from localparse import PYPDF_AVAILABLE, parse_pdf_locally  # noqa: E402
+
+
+def make_text_pdf(pages, lines_per_page=40):
+    """Minimal multi-page PDF with a Helvetica text layer"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for number in range(pages):
+        text = [b"BT /F1 18 Tf 72 760 Td (Quarterly report page %d) Tj ET" % number]
+        for line in range(lines_per_page):
+            text.append(b"BT /F1 10 Tf 72 %d Td (Line %d of page %d: revenue, costs and notes for the period.) Tj ET"
+                        % (730 - line * 16, line, number))
+        stream = b"\n".join(text)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_scanned_pdf(pages):
+    """Image-only PDF, like the output of a document scanner"""
+    from PIL import Image
+
+    images = [Image.new("L", (850, 1100), color=255) for _ in range(pages)]
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:])
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--warehouse-seconds", type=float, default=20.0,
+                        help="Typical ai_parse_document latency to compare against")
+    args = parser.parse_args()
+
+    if not PYPDF_AVAILABLE:
+        sys.exit("pypdf is not installed")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    for name, data in (("text-native", make_text_pdf(args.pages)), ("scanned", make_scanned_pdf(min(args.pages, 20)))):
+        for workers in sorted({1, args.workers}):
+            started = time.perf_counter()
+            content, decision = parse_pdf_locally(data, file_name=f"{name}.pdf", workers=workers)
+            elapsed = time.perf_counter() - started
+            path = "local" if content else "warehouse fallback"
+            print(f"{name:12s} workers={workers}: {path:18s} {elapsed:6.2f}s "
+                  f"(warehouse ~{args.warehouse_seconds:.0f}s) - {decision.reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Show how much data a resumed multipart upload re-sends after a dropped connection.
+
+A fake multipart Files API fails a fraction of part uploads at random and
+drops the connection entirely once --drop-at of the file has been sent.
+
+    python benchmarks/bench_resumable_upload.py --size-mb 256 --part-mb 8 --drop-at 0.95
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resumable import ResumableUploadError, resumable_upload  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class FakeMultipartTransport:
+    """Multipart transport stand-in with random part failures and a one-off connection drop"""
+
+    def __init__(self, size, failure_rate=0.05, drop_at=None, seed=0):
+        self.size = size
+        self.failure_rate = failure_rate
+        self.drop_at = drop_at
+        self.dropped = False
+        self.bytes_sent = 0
+        self.parts = {}
+        self.completed = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def initiate(self, file_path, overwrite=True):
+        return f"session-{file_path}"
+
+    def upload_part(self, file_path, session_token, part_number, data):
+        with self._lock:
+            self.bytes_sent += len(data)
+            if self.drop_at is not None and sum(self.parts.values()) + len(data) > self.drop_at * self.size:
+                self.dropped = True
+            if self.dropped and self.drop_at is not None:
+                raise ConnectionError("connection dropped")
+            if self._random.random() < self.failure_rate:
+                raise IOError(f"injected failure on part {part_number}")
+            self.parts[part_number] = len(data)
+        time.sleep(0.001)
+        return f"etag-{part_number}"
+
+    def complete(self, file_path, session_token, etags):
+        assert sorted(etags) == sorted(self.parts)
+        self.completed = sum(self.parts.values())
+
+    def reconnect(self):
+        self.drop_at = None
+        self.dropped = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--part-mb", type=int, default=8)
+    parser.add_argument("--drop-at", type=float, default=0.95)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    size = args.size_mb * MB
+    source = io.BytesIO(os.urandom(size))
+    transport = FakeMultipartTransport(size, failure_rate=args.failure_rate, drop_at=args.drop_at)
+
+    state = None
+    try:
+        resumable_upload(transport, source, "/Volumes/c/s/v/scan.tiff", "fingerprint",
+                         part_size=args.part_mb * MB, max_retries=2)
+    except ResumableUploadError as e:
+        state = e.state
+        print(f"first attempt: dropped with {len(state.etags)}/{state.part_count} parts stored")
+
+    transport.reconnect()
+    sent_before = transport.bytes_sent
+    state = resumable_upload(transport, source, "/Volumes/c/s/v/scan.tiff", "fingerprint", state=state,
+                             part_size=args.part_mb * MB, max_retries=5)
+    assert state.completed and transport.completed == size
+
+    resent = transport.bytes_sent - sent_before
+    print(f"resume re-sent {resent / MB:.1f} MB of {args.size_mb} MB "
+          f"(restart from zero would re-send {args.size_mb} MB); "
+          f"total sent incl. retries {transport.bytes_sent / MB:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
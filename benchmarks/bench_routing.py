@@ -0,0 +1,69 @@
+"""Parse latency with one cold warehouse vs. routing across a cold, a failing and a warm warehouse (fake backend).
+
+The cold warehouse keeps statements PENDING while it starts, the failing
+one rejects every statement on submit, and the warm one answers quickly.
+Routing skips the stopped warehouse, fails over away from submit errors and
+pending timeouts, and then keeps sending work to the warehouse that works.
+
+    python benchmarks/bench_routing.py --parses 6 --cold-start-s 8 --pending-timeout 2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_workspace import FakeStatementExecution, FakeWarehouses, FakeWorkspaceClient  # noqa: E402
+
+import routing  # noqa: E402
+from parsing import parse_document_with_ai  # noqa: E402
+from telemetry import recording  # noqa: E402
+
+
+def run(warehouse_ids, args):
+    os.environ.pop("DATABRICKS_WAREHOUSE_ID", None)
+    os.environ["DATABRICKS_WAREHOUSE_IDS"] = ",".join(warehouse_ids)
+    os.environ["WAREHOUSE_PENDING_TIMEOUT_SECONDS"] = str(args.pending_timeout)
+    routing._router = None  # fresh health for each run
+
+    client = FakeWorkspaceClient(
+        statement_execution=FakeStatementExecution(
+            queue_s=0.1,
+            execution_s=args.execution_s,
+            pages=2,
+            elements_per_page=5,
+            warehouses={"wh-cold": {"queue_s": args.cold_start_s}, "wh-failing": {"submit_failure_rate": 1.0}},
+        ),
+        warehouses=FakeWarehouses({"wh-cold": "STOPPED"}),
+    )
+    for i in range(args.parses):
+        spans = []
+        started = time.perf_counter()
+        with recording(spans):
+            _, error = parse_document_with_ai(f"/Volumes/c/s/v/doc_{i}.pdf", client)
+        elapsed = time.perf_counter() - started
+        route = " -> ".join(
+            f"{r['attributes']['warehouse_id']} ({r['attributes'].get('outcome')})"
+            for r in spans if r["name"] == "sql.route"
+        )
+        print(f"  parse {i + 1}: {elapsed:5.1f}s {'error: ' + error if error else 'ok':<12} {route}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parses", type=int, default=6)
+    parser.add_argument("--cold-start-s", type=float, default=8.0, help="PENDING time on the cold warehouse")
+    parser.add_argument("--execution-s", type=float, default=1.0)
+    parser.add_argument("--pending-timeout", type=int, default=2, help="WAREHOUSE_PENDING_TIMEOUT_SECONDS")
+    args = parser.parse_args()
+
+    print("Single warehouse (cold):")
+    run(["wh-cold"], args)
+    print("Routed across wh-cold, wh-failing, wh-warm:")
+    run(["wh-cold", "wh-failing", "wh-warm"], args)
+
+
+if __name__ == "__main__":
+    main()
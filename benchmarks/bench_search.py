@@ -0,0 +1,100 @@
+"""Build and query speed of the local search index over synthetic parsed documents.
+
+Documents draw their words from a Zipf-distributed vocabulary, so queries
+mix very common terms (long posting lists) with rare ones. Reports index
+build throughput, the time to reopen the SQLite file (replaying every
+document, then from the postings snapshot) and query latency percentiles
+for one-, two- and three-term queries.
+
+    python benchmarks/bench_search.py --docs 2000 20000 --pages 3 --words-per-page 150
+"""
+import argparse
+import itertools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex  # noqa: E402
+
+VOCABULARY = 30_000
+
+
+def make_vocabulary(rng):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "si", "de", "pa", "gu", "ze"]
+    words = set()
+    while len(words) < VOCABULARY:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 5))))
+    return sorted(words, key=lambda _: rng.random())
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def run(docs, args):
+    rng = random.Random(docs)
+    vocabulary = make_vocabulary(rng)
+    cumulative = list(itertools.accumulate(1 / rank for rank in range(1, VOCABULARY + 1)))
+
+    def page_text():
+        return " ".join(rng.choices(vocabulary, cum_weights=cumulative, k=args.words_per_page))
+
+    documents = [{page: page_text() for page in range(args.pages)} for _ in range(docs)]
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_search_"), "index.sqlite")
+    index = SearchIndex(path)
+    started = time.perf_counter()
+    for i, pages in enumerate(documents):
+        index.add(f"/Volumes/c/s/v/doc_{i:06d}.pdf", f"doc_{i:06d}.pdf", pages, sha256=str(i))
+    build = time.perf_counter() - started
+
+    # The first reopen replays every document and writes the postings snapshot
+    started = time.perf_counter()
+    SearchIndex(path)
+    replay = time.perf_counter() - started
+    started = time.perf_counter()
+    reloaded = SearchIndex(path)
+    load = time.perf_counter() - started
+
+    latencies = {}
+    for terms in (1, 2, 3):
+        samples = []
+        for _ in range(args.queries):
+            # Terms from the head, middle and tail of the distribution
+            query = " ".join(vocabulary[int(rng.paretovariate(0.6)) % 2000] for _ in range(terms))
+            started = time.perf_counter()
+            reloaded.search(query)
+            samples.append((time.perf_counter() - started) * 1000)
+        latencies[terms] = samples
+
+    directory = os.path.dirname(path)
+    size_mb = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / (1024 * 1024)
+    shutil.rmtree(directory)
+    return build, replay, load, latencies, len(reloaded._postings), size_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, nargs="+", default=[2000, 20000])
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--words-per-page", type=int, default=150)
+    parser.add_argument("--queries", type=int, default=200, help="Queries timed per term count")
+    args = parser.parse_args()
+
+    for docs in args.docs:
+        build, replay, load, latencies, terms, size_mb = run(docs, args)
+        print(f"{docs} documents, {terms} terms, {size_mb:.0f} MB on disk: build {docs / build:,.0f} docs/s "
+              f"({build:.1f}s), reopen with replay {replay:.2f}s, reopen from snapshot {load:.2f}s")
+        for count, samples in latencies.items():
+            print(f"  {count}-term query: p50 {statistics.median(samples):6.2f} ms  "
+                  f"p95 {percentile(samples, 0.95):6.2f} ms  max {max(samples):6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
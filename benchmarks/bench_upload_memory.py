@@ -0,0 +1,136 @@
+"""Compare peak memory of the old read() + BytesIO upload path with the chunked stream.
+
+Each upload runs in a fresh subprocess that first opens the source and
+then uploads it through a fake multipart Files API; the reported figure is
+how far the process's peak resident set size (resource.getrusage) grows
+during the upload. Both paths send the same part size with the same
+parallelism, so the difference is the extra copy of the file the old path
+makes. Two sources are measured: an UploadedFile-like in-memory object, as
+Streamlit hands to the page, and a file opened from disk, as ingest.py and
+the watcher upload. CPython's BytesIO.read() returns its initial bytes
+without copying, so for the in-memory source both paths stay close to the
+in-flight parts; read() on a disk file materialises the whole file.
+
+Run from the repository root:
+
+    python benchmarks/bench_upload_memory.py --sizes 16 64 256 --chunk-mb 10 --parallelism 4
+"""
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uploads import upload_to_volume  # noqa: E402
+
+MB = 1024 * 1024
+
+# ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+class _UploadedFile(io.BytesIO):
+    """In-memory upload with the name / type / size attributes of Streamlit's UploadedFile"""
+
+    def __init__(self, data, name, type="application/pdf"):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+        self.size = len(data)
+
+
+class _MultipartFiles:
+    """Stand-in for WorkspaceClient.files that buffers parts like the SDK multipart upload"""
+
+    def __init__(self):
+        self.received = 0
+
+    def upload(self, file_path, contents, overwrite=True, part_size=None, use_parallel=True, parallelism=None):
+        parallelism = (parallelism or 10) if use_parallel else 1
+        self.received = 0
+        in_flight = []
+        while True:
+            part = contents.read(part_size)
+            if not part:
+                break
+            in_flight.append(part)
+            self.received += len(part)
+            if len(in_flight) >= parallelism:
+                in_flight.clear()
+
+
+class _FakeClient:
+    def __init__(self):
+        self.files = _MultipartFiles()
+
+
+def _legacy_upload(client, file_path, source, chunk_size, parallelism):
+    file_content = source.read()
+    buffer = io.BytesIO(file_content)
+    client.files.upload(file_path=file_path, contents=buffer, overwrite=True, part_size=chunk_size,
+                        use_parallel=parallelism > 1, parallelism=parallelism if parallelism > 1 else None)
+    return len(file_content)
+
+
+def _peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAXRSS_UNIT
+
+
+def _child(mode, source_kind, path, size_mb, chunk_size, parallelism):
+    """Upload one file in this process and print how much the peak RSS grew"""
+    if source_kind == "uploaded":
+        with open(path, "rb") as f:
+            source = _UploadedFile(f.read(), "f.pdf")
+    else:
+        source = open(path, "rb")
+    client = _FakeClient()
+    baseline = _peak_rss()
+    if mode == "legacy":
+        _legacy_upload(client, "/Volumes/c/s/v/f.pdf", source, chunk_size, parallelism)
+    else:
+        upload_to_volume(client, "/Volumes/c/s/v/f.pdf", source, chunk_size=chunk_size, parallelism=parallelism)
+    assert client.files.received == size_mb * MB
+    print(_peak_rss() - baseline)
+
+
+def _measure(mode, source_kind, path, size_mb, chunk_size, parallelism):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, source_kind, path, "--sizes", str(size_mb),
+         "--chunk-mb", str(chunk_size / MB), "--parallelism", str(parallelism)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return int(output.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256], help="File sizes in MB")
+    parser.add_argument("--chunk-mb", type=float, default=10, help="Upload part size in MB")
+    parser.add_argument("--parallelism", type=int, default=1, help="Parts sent concurrently per upload, both paths")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "SOURCE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    chunk_size = int(args.chunk_mb * MB)
+    if args.child:
+        _child(*args.child, args.sizes[0], chunk_size, args.parallelism)
+        return
+
+    print(f"{'file MB':>8} {'source':>9} {'legacy peak RSS +MB':>20} {'chunked peak RSS +MB':>21}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in args.sizes:
+            path = os.path.join(directory, f"{size_mb}.pdf")
+            with open(path, "wb") as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(MB))
+            for source_kind in ("uploaded", "disk"):
+                legacy = _measure("legacy", source_kind, path, size_mb, chunk_size, args.parallelism)
+                chunked = _measure("chunked", source_kind, path, size_mb, chunk_size, args.parallelism)
+                print(f"{size_mb:>8} {source_kind:>9} {legacy / MB:>20.1f} {chunked / MB:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Cost of a watcher poll when a few files arrive in a large directory, with and without a checkpoint.
+
+Fills a local directory (standing in for the volume) with --files images
+and parses them once. Then --new files are added and one existing file is
+rewritten, and the next poll is timed twice: resuming from the checkpoint,
+which only reads and parses the changed files, and from an empty
+checkpoint, which has to re-read and hash every file (parse results still
+come from the cache).
+
+    python benchmarks/bench_watcher.py --files 500 2000 --new 10
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_workspace import FakeStatementExecution, FakeWorkspaceClient  # noqa: E402
+
+from jobs import Job  # noqa: E402
+from watcher import LocalDirectory, WatchCheckpoint, poll  # noqa: E402
+
+
+def write_files(root, start, count, size):
+    for i in range(start, start + count):
+        folder = os.path.join(root, f"batch{i // 500:03d}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"scan{i:06d}.png"), "wb") as f:
+            f.write(os.urandom(size))
+
+
+def timed_poll(client, directory, checkpoint):
+    statements = len(client.statement_execution.statements)
+    started = time.perf_counter()
+    records = list(poll(Job(uuid.uuid4().hex, "watch", "bench"), client, directory, checkpoint, parse_batch_size=1000))
+    return time.perf_counter() - started, len(records), len(client.statement_execution.statements) - statements
+
+
+def run(files, args):
+    os.environ.setdefault("DATABRICKS_WAREHOUSE_ID", "fake-warehouse")
+    root = tempfile.mkdtemp(prefix="bench_watcher_")
+    try:
+        write_files(root, 0, files, args.size_kb * 1024)
+        client = FakeWorkspaceClient(statement_execution=FakeStatementExecution(
+            queue_s=0.2, execution_s=0.2, per_file_s=0.0, pages=1, elements_per_page=2
+        ))
+        directory = LocalDirectory(root, "/Volumes/c/s/v")
+        checkpoint = WatchCheckpoint(os.path.join(root, "..", os.path.basename(root) + ".checkpoint.json"))
+        initial = timed_poll(client, directory, checkpoint)[0]
+
+        write_files(root, files, args.new, args.size_kb * 1024)
+        with open(os.path.join(root, "batch000", "scan000000.png"), "wb") as f:
+            f.write(os.urandom(args.size_kb * 1024 + 1))
+
+        resumed = timed_poll(client, directory, WatchCheckpoint(checkpoint.path))
+        rescanned = timed_poll(client, directory, WatchCheckpoint())
+        os.remove(checkpoint.path)
+        return initial, resumed, rescanned
+    finally:
+        shutil.rmtree(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, nargs="+", default=[500, 2000], help="Files already in the directory")
+    parser.add_argument("--new", type=int, default=10, help="Files added before the timed poll")
+    parser.add_argument("--size-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'files':>6} {'initial poll':>12} {'mode':<18} {'poll':>8} {'records':>8} {'statements':>10}")
+    for files in args.files:
+        initial, resumed, rescanned = run(files, args)
+        for label, (elapsed, records, statements) in (("from checkpoint", resumed), ("empty checkpoint", rescanned)):
+            print(f"{files:>6} {initial:>11.2f}s {label:<18} {elapsed:>7.2f}s {records:>8} {statements:>10}")
+
+
+if __name__ == "__main__":
+    main()
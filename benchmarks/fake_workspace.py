@@ -0,0 +1,346 @@
+"""Local fake of the WorkspaceClient Files and Statement Execution APIs for benchmarks.
+
+Latency, bandwidth, warehouse queueing/execution time, failure rates and
+parse payload sizes are configurable; everything runs in-process with no
+network, and random choices are seeded so runs are reproducible.
+"""
+import heapq
+import io
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from databricks.sdk.errors import NotFound
+from databricks.sdk.service.sql import StatementState
+
+MB = 1024 * 1024
+
+ELEMENT_TYPES = ["text", "title", "section_header", "table", "figure", "caption", "page_footer"]
+
+_READ_FILES = re.compile(r"read_files\('((?:[^'\\]|\\.)*)'")
+
+_SQL_TOKEN = re.compile(r"'((?:[^'\\]|\\.)*)'|(NULL)|(-?[0-9][0-9.eE+-]*)|([()])")
+_TABLE_NAME = re.compile(r"(?:INTO|FROM|EXISTS) (`[^`]+`\.`[^`]+`\.`[^`]+`)")
+_VERSION = re.compile(r"WHEN '((?:[^'\\]|\\.)*)' THEN '((?:[^'\\]|\\.)*)'")
+_PARSE_SOURCE = re.compile(r"SELECT '((?:[^'\\]|\\.)*)' AS path, '((?:[^'\\]|\\.)*)' AS content_sha256")
+
+
+def make_document(pages, elements_per_page, seed=0):
+    """Synthetic ai_parse_document output with the given number of pages and elements"""
+    rng = random.Random(seed)
+    elements = []
+    for page_id in range(pages):
+        for _ in range(elements_per_page):
+            element_type = rng.choice(ELEMENT_TYPES)
+            x0, y0 = rng.uniform(0, 500), rng.uniform(0, 700)
+            elements.append({
+                "id": len(elements),
+                "type": element_type,
+                "content": "<table><tr><td>1</td></tr></table>" if element_type == "table" else "lorem ipsum " * 8,
+                "bbox": [{"coord": [x0, y0, x0 + 80, y0 + 20], "page_id": page_id}],
+            })
+    return json.dumps({
+        "document": {"pages": [{"id": i, "image_uri": f"/tmp/page_{i}.png"} for i in range(pages)], "elements": elements},
+        "metadata": {"version": "2.0"},
+    })
+
+
+class FakeFiles:
+    """Files API stand-in with fixed latency, per-connection bandwidth and random failures.
+
+    Uploaded bytes are only kept (for download()) with keep_contents, so
+    upload benchmarks do not hold every file in memory.
+    """
+
+    def __init__(self, latency=0.05, bandwidth_mb_s=50.0, failure_rate=0.0, keep_contents=False, seed=0):
+        self.latency = latency
+        self.bandwidth = bandwidth_mb_s * MB
+        self.failure_rate = failure_rate
+        self.keep_contents = keep_contents
+        self.stored = {}
+        self.contents = {}
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def upload(self, file_path, contents, overwrite=True, part_size=None, use_parallel=None, parallelism=None):
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.failure_rate
+        time.sleep(self.latency)
+        if fail:
+            raise IOError(f"Injected failure uploading {file_path}")
+
+        # Read the stream part by part like the SDK does, so memory behaviour matches
+        received = 0
+        kept = io.BytesIO() if self.keep_contents else None
+        while True:
+            block = contents.read(part_size or MB)
+            if not block:
+                break
+            received += len(block)
+            if kept is not None:
+                kept.write(block)
+        time.sleep(received / self.bandwidth)
+
+        with self._lock:
+            self.stored[file_path] = (received, time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime()),
+                                      time.time_ns() // 1_000_000)
+            if kept is not None:
+                self.contents[file_path] = kept.getvalue()
+
+    def get_metadata(self, file_path):
+        time.sleep(self.latency)
+        with self._lock:
+            stored = self.stored.get(file_path)
+        if stored is None:
+            raise NotFound(f"{file_path} does not exist")
+        return SimpleNamespace(content_length=stored[0], last_modified=stored[1])
+
+    def list_directory_contents(self, directory_path):
+        """Direct children of a directory, like the paginated SDK listing (one request per call)"""
+        time.sleep(self.latency)
+        prefix = directory_path.rstrip("/") + "/"
+        with self._lock:
+            stored = dict(self.stored)
+        directories = set()
+        for file_path, (size, _, modified_ms) in sorted(stored.items()):
+            if not file_path.startswith(prefix):
+                continue
+            name, _, rest = file_path[len(prefix):].partition("/")
+            if rest:
+                if name not in directories:
+                    directories.add(name)
+                    yield SimpleNamespace(path=prefix + name, name=name, is_directory=True, file_size=None,
+                                          last_modified=None)
+            else:
+                yield SimpleNamespace(path=file_path, name=name, is_directory=False, file_size=size,
+                                      last_modified=modified_ms)
+
+    def download(self, file_path):
+        time.sleep(self.latency)
+        with self._lock:
+            stored = self.stored.get(file_path)
+            contents = self.contents.get(file_path)
+        if stored is None:
+            raise NotFound(f"{file_path} does not exist")
+        time.sleep(stored[0] / self.bandwidth)
+        return SimpleNamespace(contents=io.BytesIO(contents if contents is not None else bytes(stored[0])))
+
+
+def _unquote(value):
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+class FakeTables:
+    """Delta tables written by delta_sink, kept as {table: {(path, content_sha256, element_index): row}}.
+
+    Understands exactly the statements delta_sink generates: CREATE TABLE,
+    the written-versions SELECT, DELETE, and both MERGE forms (VALUES rows,
+    or ai_parse_document over read_files, which yields elements_per_document
+    rows per file).
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.rows_received = 0
+
+    def is_table_statement(self, statement):
+        head = statement.lstrip()[:16].upper()
+        return head.startswith(("CREATE TABLE", "MERGE INTO", "DELETE FROM")) or "AS element_rows" in statement
+
+    def execute(self, statement, elements_per_document):
+        """Apply one statement; returns its result rows"""
+        table = self.tables.setdefault(_TABLE_NAME.search(statement).group(1), {})
+        head = statement.lstrip()[:12].upper()
+        if head.startswith("CREATE"):
+            return []
+        if head.startswith("SELECT"):
+            paths = {_unquote(path) for path in re.findall(r"'((?:[^'\\]|\\.)*)'", statement.split(" IN ", 1)[1])}
+            counts = {}
+            for (path, sha, _), row in table.items():
+                if path in paths:
+                    counts[(path, sha, row[-1])] = counts.get((path, sha, row[-1]), 0) + 1
+            return [[path, sha, parsed_by, str(count)] for (path, sha, parsed_by), count in counts.items()]
+        if head.startswith("DELETE"):
+            paths = {_unquote(path) for path in re.findall(r"'((?:[^'\\]|\\.)*)'", statement)}
+            for key in [key for key in table if key[0] in paths]:
+                del table[key]
+            return []
+
+        version_cases, parser_cases = statement.split("t.parsed_by <> CASE", 1)
+        versions = {_unquote(path): _unquote(sha) for path, sha in _VERSION.findall(version_cases)}
+        parsers = {_unquote(path): _unquote(parsed_by) for path, parsed_by in _VERSION.findall(parser_cases)}
+        if "FROM VALUES" in statement:
+            values = statement.split("FROM VALUES", 1)[1].rsplit("AS v(", 1)[0]
+            rows, row = [], None
+            for string, null, number, paren in _SQL_TOKEN.findall(values):
+                if paren == "(":
+                    row = []
+                elif paren == ")":
+                    rows.append(row)
+                elif null:
+                    row.append(None)
+                elif number:
+                    row.append(float(number) if any(c in number for c in ".eE") else int(number))
+                else:
+                    row.append(_unquote(string))
+        else:
+            rows = [
+                [_unquote(path), _unquote(sha), index] + [None] * 9 + ["warehouse"]
+                for path, sha in _PARSE_SOURCE.findall(statement)
+                for index in range(elements_per_document)
+            ]
+        self.rows_received += len(rows) if "FROM VALUES" in statement else 0
+
+        source_keys = {(row[0], row[1], row[2]) for row in rows}
+        deleted = [
+            key for key, row in table.items()
+            if key[0] in versions and key not in source_keys
+            and (key[1] != versions[key[0]] or row[-1] != parsers[key[0]])
+        ]
+        for key in deleted:
+            del table[key]
+        inserted = updated = 0
+        for row in rows:
+            key = (row[0], row[1], row[2])
+            if key not in table:
+                inserted += 1
+            elif table[key][-1] != row[-1]:
+                updated += 1
+            else:
+                continue
+            table[key] = row
+        return [[str(inserted + updated + len(deleted)), str(updated), str(len(deleted)), str(inserted)]]
+
+
+class FakeStatementExecution:
+    """Statement Execution API stand-in for ai_parse_document queries.
+
+    Each statement is PENDING for queue_s, RUNNING for execution_s plus
+    per_file_s per file it reads, and then SUCCEEDED with one synthetic
+    document of pages x elements_per_page per file, returned inline. With
+    capacity, at most that many statements run at once and the rest stay
+    PENDING first-come first-served, like a saturated warehouse.
+    failure_rate is the share of statements that run and then FAILED;
+    submit_failure_rate the share rejected when submitted, like an
+    unreachable warehouse. warehouses maps a warehouse id to overrides of
+    queue_s, execution_s, failure_rate, submit_failure_rate and capacity, to
+    model a cold, slow or broken warehouse.
+    Given the FakeFiles the documents were uploaded to, each statement also
+    runs per_mb_s for every MB it reads, like a parser whose cost grows with
+    image size.
+    """
+
+    def __init__(self, queue_s=1.0, execution_s=0.5, per_file_s=0.02, pages=5, elements_per_page=20,
+                 failure_rate=0.0, capacity=None, warehouses=None, seed=0, files=None, per_mb_s=0.0,
+                 submit_failure_rate=0.0):
+        self.queue_s = queue_s
+        self.execution_s = execution_s
+        self.per_file_s = per_file_s
+        self.pages = pages
+        self.elements_per_page = elements_per_page
+        self.failure_rate = failure_rate
+        self.submit_failure_rate = submit_failure_rate
+        self.capacity = capacity
+        self.warehouses = warehouses or {}
+        self.files = files
+        self.per_mb_s = per_mb_s
+        self.tables = FakeTables()
+        self._slots_free_at = {}
+        self.statements = {}
+        self.executed = 0
+        self._random = random.Random(seed)
+        self._document = None
+        self._lock = threading.Lock()
+
+    def _payload(self):
+        if self._document is None:
+            self._document = make_document(self.pages, self.elements_per_page)
+        return self._document
+
+    def execute_statement(self, warehouse_id, statement, **kwargs):
+        paths = [p.replace("\\'", "'") for p in _READ_FILES.findall(statement)]
+        now = time.monotonic()
+        settings = self.warehouses.get(warehouse_id, {})
+        duration = settings.get("execution_s", self.execution_s) + self.per_file_s * len(paths)
+        if self.files is not None and self.per_mb_s:
+            read_bytes = sum(self.files.stored.get(path, (0,))[0] for path in paths)
+            duration += self.per_mb_s * read_bytes / (1024 * 1024)
+        capacity = settings.get("capacity", self.capacity)
+        with self._lock:
+            if self._random.random() < settings.get("submit_failure_rate", self.submit_failure_rate):
+                raise ConnectionError(f"Injected failure submitting to warehouse {warehouse_id}")
+            self.executed += 1
+            statement_id = f"stmt-{self.executed}"
+            running_at = now + settings.get("queue_s", self.queue_s)
+            if capacity:
+                slots = self._slots_free_at.setdefault(warehouse_id, [0.0] * capacity)
+                running_at = max(running_at, heapq.heappop(slots))
+                heapq.heappush(slots, running_at + duration)
+            self.statements[statement_id] = {
+                "warehouse_id": warehouse_id,
+                "paths": paths,
+                "submitted_at": now,
+                "running_at": running_at,
+                "done_at": running_at + duration,
+                "with_path": "SELECT path," in statement,
+                "fail": self._random.random() < settings.get("failure_rate", self.failure_rate),
+                "canceled": False,
+            }
+            info = self.statements[statement_id]
+            if self.tables.is_table_statement(statement) and not info["fail"]:
+                info["table_rows"] = self.tables.execute(statement, self.pages * self.elements_per_page)
+        return self.get_statement(statement_id)
+
+    def _response(self, statement_id, state, result=None, error=None):
+        status = SimpleNamespace(state=state, error=SimpleNamespace(message=error) if error else None)
+        return SimpleNamespace(statement_id=statement_id, status=status, result=result, manifest=None)
+
+    def get_statement(self, statement_id):
+        info = self.statements[statement_id]
+        now = time.monotonic()
+        if info["canceled"]:
+            return self._response(statement_id, StatementState.CANCELED)
+        if now < info["running_at"]:
+            return self._response(statement_id, StatementState.PENDING)
+        if now < info["done_at"]:
+            return self._response(statement_id, StatementState.RUNNING)
+        if info["fail"]:
+            return self._response(statement_id, StatementState.FAILED, error="Injected ai_parse_document failure")
+
+        if "table_rows" in info:
+            result = SimpleNamespace(data_array=info["table_rows"], next_chunk_index=None, external_links=None)
+            return self._response(statement_id, StatementState.SUCCEEDED, result=result)
+        payload = self._payload()
+        rows = [[f"dbfs:{path}", payload] if info["with_path"] else [payload] for path in info["paths"]]
+        result = SimpleNamespace(data_array=rows, next_chunk_index=None, external_links=None)
+        return self._response(statement_id, StatementState.SUCCEEDED, result=result)
+
+    def cancel_execution(self, statement_id):
+        self.statements[statement_id]["canceled"] = True
+
+    def get_statement_result_chunk_n(self, statement_id, chunk_index):
+        raise NotImplementedError("The fake returns every result in the first chunk")
+
+
+class FakeWarehouses:
+    """Warehouses API stand-in reporting a fixed state per warehouse (RUNNING unless told otherwise)"""
+
+    def __init__(self, states=None):
+        self.states = states or {}
+
+    def get(self, id):
+        return SimpleNamespace(id=id, state=SimpleNamespace(value=self.states.get(id, "RUNNING")))
+
+
+class FakeWorkspaceClient:
+    """WorkspaceClient stand-in exposing .files, .statement_execution and .warehouses"""
+
+    def __init__(self, files=None, statement_execution=None, warehouses=None):
+        self.files = files or FakeFiles()
+        self.statement_execution = statement_execution or FakeStatementExecution()
+        self.warehouses = warehouses or FakeWarehouses()
@@ -0,0 +1,218 @@
+"""Benchmark suite for the upload and parse code paths against the local fake backend.
+
+Measures upload throughput and memory across file sizes and concurrency,
+single and bulk parse latency (with the queued / running / decode / convert
+breakdown from the telemetry spans), result-conversion cost and export cost.
+Runs offline; the report can be saved as JSON and compared with a later run.
+
+    python benchmarks/run_suite.py --quick
+    python benchmarks/run_suite.py --output baseline.json
+    python benchmarks/run_suite.py --compare baseline.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_workspace import FakeFiles, FakeStatementExecution, FakeWorkspaceClient, MB, make_document  # noqa: E402
+
+from exports import EXPORT_FORMATS, ExportCache, export_result  # noqa: E402
+from parsing import parse_document_with_ai, parse_documents_bulk, parsed_content_to_dataframe  # noqa: E402
+from telemetry import phase_totals, recording  # noqa: E402
+from uploads import upload_batch  # noqa: E402
+
+PRESETS = {
+    "quick": {
+        "sizes_mb": [1, 8],
+        "concurrency": [1, 4],
+        "parse_pages": [5, 50],
+        "bulk_files": [10],
+        "convert_pages": [10, 100],
+        "repeat": 1,
+    },
+    "full": {
+        "sizes_mb": [1, 16, 64],
+        "concurrency": [1, 4, 8],
+        "parse_pages": [5, 50, 200],
+        "bulk_files": [10, 50],
+        "convert_pages": [10, 100, 500],
+        "repeat": 3,
+    },
+}
+
+
+def _measure(fn, repeat):
+    """Median wall time (s) and the largest tracemalloc peak (bytes) of fn over repeat runs"""
+    timings = []
+    peak = 0
+    result = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return statistics.median(timings), peak, result
+
+
+def bench_uploads(config, report):
+    rng = random.Random(0)
+    for size_mb in config["sizes_mb"]:
+        payload = rng.randbytes(size_mb * MB)
+        for concurrency in config["concurrency"]:
+            files = max(concurrency * 2, 4)
+
+            def run():
+                client = FakeWorkspaceClient(files=FakeFiles(latency=0.02, bandwidth_mb_s=200.0))
+                items = [(f"f{i}.bin", f"/Volumes/c/s/v/f{i}.bin", io.BytesIO(payload)) for i in range(files)]
+                return upload_batch(client, items, max_workers=concurrency)
+
+            seconds, peak, summary = _measure(run, config["repeat"])
+            params = {"size_mb": size_mb, "concurrency": concurrency, "files": files}
+            report.add("upload", params, "throughput", summary.total_bytes / MB / seconds, "MB/s")
+            report.add("upload", params, "peak_memory", peak / MB, "MB")
+
+
+def bench_parse(config, report):
+    for pages in config["parse_pages"]:
+        def run():
+            client = FakeWorkspaceClient(statement_execution=FakeStatementExecution(
+                queue_s=0.2, execution_s=0.3, pages=pages, elements_per_page=20
+            ))
+            spans = []
+            with recording(spans):
+                df, error = parse_document_with_ai("/Volumes/c/s/v/doc.pdf", client)
+            assert error is None, error
+            return spans
+
+        seconds, peak, spans = _measure(run, config["repeat"])
+        totals = phase_totals(spans)
+        params = {"pages": pages}
+        report.add("parse", params, "latency", seconds, "s")
+        report.add("parse", params, "warehouse_queue", totals["Warehouse queue"] / 1000, "s")
+        report.add("parse", params, "warehouse_execution", totals["Warehouse execution"] / 1000, "s")
+        report.add("parse", params, "result_decoding", totals["Result decoding"], "ms")
+        report.add("parse", params, "dataframe_build", totals["DataFrame build"], "ms")
+        report.add("parse", params, "peak_memory", peak / MB, "MB")
+
+
+def bench_bulk_parse(config, report):
+    for files in config["bulk_files"]:
+        paths = [f"/Volumes/c/s/v/invoice_{i}.pdf" for i in range(files)]
+
+        def run():
+            client = FakeWorkspaceClient(statement_execution=FakeStatementExecution(
+                queue_s=0.2, execution_s=0.3, per_file_s=0.01, pages=5, elements_per_page=20
+            ))
+            results = parse_documents_bulk(client, paths)
+            assert all(error is None for _, error in results.values())
+            return client.statement_execution.executed
+
+        seconds, _, statements = _measure(run, config["repeat"])
+        params = {"files": files}
+        report.add("bulk_parse", params, "latency", seconds, "s")
+        report.add("bulk_parse", params, "statements", statements, "count")
+
+
+def bench_conversion(config, report):
+    for pages in config["convert_pages"]:
+        content = make_document(pages, 20)
+        seconds, peak, df = _measure(lambda: parsed_content_to_dataframe(content), config["repeat"])
+        params = {"pages": pages, "rows": len(df)}
+        report.add("convert", params, "time", seconds * 1000, "ms")
+        report.add("convert", params, "peak_memory", peak / MB, "MB")
+
+        for export_format in EXPORT_FORMATS:
+            # A fresh cache each run, so the cost of building the file is measured
+            seconds, peak, data = _measure(lambda: export_result(df, export_format, cache=ExportCache()), config["repeat"])
+            export_params = dict(params, format=export_format)
+            report.add("export", export_params, "time", seconds * 1000, "ms")
+            report.add("export", export_params, "size", len(data) / MB, "MB")
+
+
+class Report:
+    """Benchmark results as (scenario, params, metric, value, unit) rows"""
+
+    def __init__(self):
+        self.results = []
+
+    def add(self, scenario, params, metric, value, unit):
+        self.results.append({"scenario": scenario, "params": params, "metric": metric, "value": round(value, 4), "unit": unit})
+
+    def to_dict(self, args):
+        return {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "preset": args.preset,
+            },
+            "results": self.results,
+        }
+
+    def print(self, baseline=None):
+        previous = {}
+        for row in (baseline or {}).get("results", []):
+            previous[_row_key(row)] = row["value"]
+
+        print(f"{'scenario':<11} {'params':<42} {'metric':<20} {'value':>12} {'unit':<6} {'vs baseline':>11}")
+        for row in self.results:
+            params = ", ".join(f"{k}={v}" for k, v in row["params"].items())
+            before = previous.get(_row_key(row))
+            delta = f"{(row['value'] - before) / before * 100:+.1f}%" if before else ""
+            print(f"{row['scenario']:<11} {params:<42} {row['metric']:<20} {row['value']:>12.3f} {row['unit']:<6} {delta:>11}")
+
+
+def _row_key(row):
+    return row["scenario"], json.dumps(row["params"], sort_keys=True), row["metric"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="full")
+    parser.add_argument("--quick", action="store_const", const="quick", dest="preset", help="Same as --preset quick")
+    parser.add_argument("--only", nargs="+", choices=["upload", "parse", "bulk_parse", "convert"],
+                        help="Run only these scenarios")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--compare", help="Earlier JSON report to show relative changes against")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABRICKS_WAREHOUSE_ID", "fake-warehouse")
+    config = PRESETS[args.preset]
+    report = Report()
+
+    scenarios = {
+        "upload": bench_uploads,
+        "parse": bench_parse,
+        "bulk_parse": bench_bulk_parse,
+        "convert": bench_conversion,
+    }
+    for name, bench in scenarios.items():
+        if not args.only or name in args.only:
+            bench(config, report)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    report.print(baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(args), f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
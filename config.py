@@ -0,0 +1,14 @@
+"""Environment-variable settings shared by the app, the CLIs and the benchmarks"""
+import os
+
+
+def env_int(name, default, scale=1):
+    """Read a positive number from the environment, falling back to default"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        parsed = int(float(value) * scale)
+    except ValueError:
+        return default
+    return parsed if parsed > 0 else default
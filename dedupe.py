@@ -0,0 +1,114 @@
+"""Skip-if-unchanged checks for uploads to Unity Catalog volumes"""
+import json
+import os
+import tempfile
+import threading
+
+from telemetry import span
+
+
+class UploadManifest:
+    """Record of what this app uploaded: {file_path: {sha256, size, last_modified}}.
+
+    The Files API only reports size and modification time, so the manifest
+    supplies the content hash of the bytes we sent. An entry is trusted only
+    while the remote size and last_modified still match what was recorded,
+    i.e. nobody has replaced the file since. Persisted as JSON when path is set.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def get(self, file_path):
+        with self._lock:
+            return self._entries.get(file_path)
+
+    def record(self, file_path, sha256, size, last_modified):
+        with self._lock:
+            self._entries[file_path] = {"sha256": sha256, "size": size, "last_modified": last_modified}
+            if self.path:
+                self._save()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# Manifest file when UPLOAD_MANIFEST_PATH is not set, so hash checks skip files across runs
+DEFAULT_MANIFEST_PATH = "upload_manifest.json"
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_upload_manifest():
+    """Return the process-wide upload manifest, persisted to UPLOAD_MANIFEST_PATH or upload_manifest.json"""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = UploadManifest(os.environ.get("UPLOAD_MANIFEST_PATH") or DEFAULT_MANIFEST_PATH)
+    return _manifest
+
+
+def remote_metadata(workspace_client, file_path):
+    """Return (content_length, last_modified) of a volume file, or None if it does not exist"""
+    from databricks.sdk.errors import NotFound
+
+    try:
+        with span("files.get_metadata", file_path=file_path):
+            metadata = workspace_client.files.get_metadata(file_path)
+    except NotFound:
+        return None
+    return metadata.content_length, metadata.last_modified
+
+
+def is_unchanged(workspace_client, file_path, size, file_hash=None, manifest=None):
+    """Whether the remote file already holds these bytes, so the upload can be skipped.
+
+    With file_hash the remote file must match a manifest entry with the same
+    hash, size and modification time. Without it only sizes are compared,
+    plus the modification time when the manifest has an entry for the file;
+    a local edit that keeps the size is then not detected.
+    """
+    metadata = remote_metadata(workspace_client, file_path)
+    if metadata is None:
+        return False
+
+    remote_size, last_modified = metadata
+    if remote_size != size:
+        return False
+
+    entry = (manifest or get_upload_manifest()).get(file_path)
+    if file_hash is None:
+        # The remote file must not have been replaced since this app last uploaded it
+        return entry is None or (entry["size"] == size and entry["last_modified"] == last_modified)
+    return (
+        entry is not None
+        and entry["sha256"] == file_hash
+        and entry["size"] == size
+        and entry["last_modified"] == last_modified
+    )
+
+
+def record_upload(workspace_client, file_path, size, file_hash, manifest=None):
+    """Remember the hash and remote metadata of a file we just uploaded"""
+    metadata = remote_metadata(workspace_client, file_path)
+    if metadata is not None:
+        (manifest or get_upload_manifest()).record(file_path, file_hash, size, metadata[1])
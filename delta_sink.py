@@ -0,0 +1,350 @@
+"""Write flattened parse results to a Delta table, one idempotent MERGE per micro-batch.
+
+Rows are keyed by (path, content_sha256, element_index). Every MERGE inserts
+the rows it does not find and deletes the rows other versions of the same
+paths left behind, so writing a document twice leaves one copy and a
+changed document replaces its old rows. A version is the content hash plus
+the parser (parsed_by), so re-parsing the same bytes another way replaces
+the rows too. Documents whose version is already complete in the table are
+skipped before any rows are sent.
+
+DeltaSink.add() buffers DataFrames parsed in the app (from the cache, local
+PDF extraction or a warehouse parse) and sends up to
+RESULTS_TABLE_BATCH_ROWS rows per statement. DeltaSink.parse_into_table()
+runs ai_parse_document inside the MERGE, so warehouse-parsed documents go
+straight from the volume to the table without passing through the app.
+"""
+import math
+import numbers
+import os
+import re
+import threading
+import time
+
+from config import env_int
+from flatten import ELEMENT_COLUMNS
+from parsing import BULK_PARSE_BATCH_SIZE, run_statement, sql_string, statement_error, statement_state
+from results import iter_result_rows
+from telemetry import span
+
+# Columns of the results table and their SQL types; element columns follow flatten.ELEMENT_COLUMNS
+SQL_TYPES = {"Int64": "INT", "string": "STRING", "float64": "DOUBLE"}
+KEY_COLUMNS = {"path": "STRING", "content_sha256": "STRING", "element_index": "INT"}
+TABLE_COLUMNS = {
+    **KEY_COLUMNS,
+    **{name: SQL_TYPES[dtype] for name, dtype in ELEMENT_COLUMNS.items()},
+    "parsed_by": "STRING",
+}
+
+# Default number of rows sent in one MERGE statement
+DEFAULT_BATCH_ROWS = 10000
+
+# Statement text budget per MERGE; the Statement Execution API accepts up to 16 MiB
+MAX_STATEMENT_CHARS = 4 * 1024 * 1024
+
+# Paths looked up per query of already written versions
+LOOKUP_BATCH_SIZE = 1000
+
+_NAME_PART = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+
+def get_results_table():
+    """Return the default catalog.schema.table for parse results from RESULTS_TABLE, or None"""
+    return (os.environ.get("RESULTS_TABLE") or "").strip() or None
+
+
+def get_batch_rows():
+    """Return the rows per MERGE statement from RESULTS_TABLE_BATCH_ROWS (default 10000)"""
+    return env_int("RESULTS_TABLE_BATCH_ROWS", DEFAULT_BATCH_ROWS)
+
+
+def table_identifier(table_name):
+    """Quote a catalog.schema.table name for SQL, rejecting anything else"""
+    parts = table_name.strip().split(".")
+    if len(parts) != 3 or not all(_NAME_PART.match(part) for part in parts):
+        raise ValueError("Invalid table name format. Please use: catalog.schema.table_name")
+    return ".".join(f"`{part}`" for part in parts)
+
+
+def sql_literal(value):
+    """Format a Python or NumPy scalar as a SQL literal; None, pandas.NA, NaN and infinities become NULL"""
+    if isinstance(value, str):
+        return sql_string(value)
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    if isinstance(value, numbers.Real) and math.isfinite(value):
+        return repr(float(value))
+    return "NULL"
+
+
+def _document_rows(file_path, file_hash, elements, parsed_by):
+    """SQL value tuples of one document's element rows, in TABLE_COLUMNS order"""
+    if any(name in elements.columns for name in ELEMENT_COLUMNS):
+        columns = {name: elements[name].tolist() for name in ELEMENT_COLUMNS if name in elements.columns}
+    else:
+        # Not the standard element layout (e.g. plain text); keep each row as JSON in content
+        columns = {"content": elements.to_json(orient="records", lines=True).splitlines()}
+    literals = [
+        [sql_literal(value) for value in columns[name]] if name in columns else ["NULL"] * len(elements)
+        for name in ELEMENT_COLUMNS
+    ]
+    prefix = f"({sql_string(file_path)}, {sql_string(file_hash)}, "
+    suffix = f", {sql_string(parsed_by or 'warehouse')})"
+    return [
+        f"{prefix}{index}, {', '.join(values)}{suffix}"
+        for index, values in enumerate(zip(*literals))
+    ]
+
+
+class DeltaSink:
+    """Micro-batching, idempotent writer of parse results into one Delta table"""
+
+    def __init__(self, workspace_client, table_name, batch_rows=None, should_cancel=None):
+        self.workspace_client = workspace_client
+        self.table_name = table_name
+        self.table = table_identifier(table_name)
+        self.batch_rows = batch_rows or get_batch_rows()
+        self.should_cancel = should_cancel
+        self.stats = {"documents": 0, "unchanged": 0, "rows": 0, "statements": 0, "seconds": 0.0}
+        self._pending = []
+        self._pending_rows = 0
+        self._created = False
+        self._lock = threading.Lock()
+
+    def _run(self, query):
+        statement = run_statement(self.workspace_client, query, should_cancel=self.should_cancel)
+        if statement_state(statement) != "SUCCEEDED":
+            raise RuntimeError(f"Writing to {self.table_name} failed: {statement_error(statement)}")
+        return statement
+
+    def ensure_table(self):
+        """Create the results table if it does not exist (once per sink)"""
+        if self._created:
+            return
+        columns = ",\n            ".join(f"{name} {sql_type}" for name, sql_type in TABLE_COLUMNS.items())
+        self._run(f"""
+        CREATE TABLE IF NOT EXISTS {self.table} (
+            {columns},
+            written_at TIMESTAMP
+        ) USING DELTA
+        """)
+        self._created = True
+
+    def written_versions(self, paths):
+        """Return {(path, content_sha256, parsed_by): rows} for the given paths as stored in the table"""
+        versions = {}
+        paths = list(dict.fromkeys(paths))
+        for start in range(0, len(paths), LOOKUP_BATCH_SIZE):
+            in_list = ", ".join(sql_string(path) for path in paths[start:start + LOOKUP_BATCH_SIZE])
+            statement = self._run(f"""
+        SELECT path, content_sha256, parsed_by, count(*) AS element_rows
+        FROM {self.table}
+        WHERE path IN ({in_list})
+        GROUP BY path, content_sha256, parsed_by
+        """)
+            for path, content_sha256, parsed_by, rows in iter_result_rows(self.workspace_client, statement):
+                versions[(path, content_sha256, parsed_by)] = int(rows)
+        return versions
+
+    def _merge_clauses(self, documents):
+        """ON / WHEN clauses shared by both MERGE forms; documents is {path: (content_sha256, parsed_by)}"""
+        key = " AND ".join(f"t.{name} = s.{name}" for name in KEY_COLUMNS)
+        names = list(TABLE_COLUMNS)
+        updates = ", ".join(f"{name} = s.{name}" for name in TABLE_COLUMNS if name not in KEY_COLUMNS)
+        versions = " ".join(f"WHEN {sql_string(path)} THEN {sql_string(sha)}" for path, (sha, _) in documents.items())
+        parsers = " ".join(
+            f"WHEN {sql_string(path)} THEN {sql_string(parsed_by)}" for path, (_, parsed_by) in documents.items()
+        )
+        return f"""
+        ON {key}
+        WHEN MATCHED AND t.parsed_by <> s.parsed_by THEN UPDATE SET {updates}, written_at = current_timestamp()
+        WHEN NOT MATCHED THEN INSERT ({", ".join(names)}, written_at)
+            VALUES ({", ".join(f"s.{name}" for name in names)}, current_timestamp())
+        WHEN NOT MATCHED BY SOURCE
+            AND t.path IN ({", ".join(sql_string(path) for path in documents)})
+            AND (t.content_sha256 <> CASE t.path {versions} END
+                OR t.parsed_by <> CASE t.path {parsers} END)
+            THEN DELETE
+        """
+
+    def _merge_values(self, documents, rows):
+        casts = ", ".join(f"CAST({name} AS {sql_type}) AS {name}" for name, sql_type in TABLE_COLUMNS.items())
+        values = ",\n            ".join(rows)
+        return f"""
+        MERGE INTO {self.table} AS t
+        USING (
+            SELECT {casts}
+            FROM VALUES
+            {values}
+            AS v({", ".join(TABLE_COLUMNS)})
+        ) AS s{self._merge_clauses(documents)}"""
+
+    def add(self, file_path, file_hash, elements, parsed_by=None):
+        """Queue one parsed document; writes a batch once RESULTS_TABLE_BATCH_ROWS rows are queued"""
+        if elements is None or not file_hash:
+            return
+        with self._lock:
+            self._pending.append((file_path, file_hash, elements, parsed_by))
+            self._pending_rows += len(elements)
+            full = self._pending_rows >= self.batch_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every queued document, skipping versions already complete in the table; returns stats.
+
+        If a statement fails, the documents not yet fully written stay queued
+        for the next flush and the error is raised.
+        """
+        with self._lock:
+            pending, self._pending, self._pending_rows = self._pending, [], 0
+        if not pending:
+            return self.stats
+
+        started = time.perf_counter()
+        # Later entries for the same path win, like re-parsing a file in the app
+        latest = {
+            file_path: (file_hash, elements, parsed_by or "warehouse")
+            for file_path, file_hash, elements, parsed_by in pending
+        }
+        written_paths = set()
+        statements = rows_written = 0
+        unchanged = []
+        try:
+            with span("table.write", table=self.table_name, documents=len(pending)) as write_span:
+                self.ensure_table()
+                written = self.written_versions(latest)
+                unchanged = [
+                    path for path, (sha, elements, parsed_by) in latest.items()
+                    if written.get((path, sha, parsed_by)) == len(elements)
+                ]
+                written_paths.update(unchanged)
+
+                documents, rows, chars = {}, [], 0
+                for path, (sha, elements, parsed_by) in latest.items():
+                    if path in written_paths:
+                        continue
+                    for row in _document_rows(path, sha, elements, parsed_by):
+                        if rows and (len(rows) >= self.batch_rows or chars + len(row) > MAX_STATEMENT_CHARS):
+                            self._run(self._merge_values(documents, rows))
+                            statements += 1
+                            rows_written += len(rows)
+                            # The current document continues in the next statement
+                            written_paths.update(documents.keys() - {path})
+                            documents, rows, chars = {}, [], 0
+                        documents[path] = (sha, parsed_by)
+                        rows.append(row)
+                        chars += len(row) + 2
+                    if not len(elements):
+                        # An empty document still replaces the rows of its previous version
+                        documents[path] = (sha, parsed_by)
+                if documents:
+                    if rows:
+                        self._run(self._merge_values(documents, rows))
+                    else:
+                        self._run(f"DELETE FROM {self.table} WHERE path IN "
+                                  f"({', '.join(sql_string(path) for path in documents)})")
+                    statements += 1
+                    rows_written += len(rows)
+                    written_paths.update(documents)
+
+                write_span.set(unchanged=len(unchanged), rows=rows_written, statements=statements)
+        except Exception:
+            # Re-queue what did not make it, ahead of anything added meanwhile
+            unwritten = [
+                (path, sha, elements, parsed_by)
+                for path, (sha, elements, parsed_by) in latest.items() if path not in written_paths
+            ]
+            with self._lock:
+                self._pending[:0] = unwritten
+                self._pending_rows += sum(len(elements) for _, _, elements, _ in unwritten)
+            raise
+        finally:
+            with self._lock:
+                self.stats["documents"] += len(written_paths) - len(unchanged)
+                self.stats["unchanged"] += len(unchanged)
+                self.stats["rows"] += rows_written
+                self.stats["statements"] += statements
+                self.stats["seconds"] += time.perf_counter() - started
+        return self.stats
+
+    def parse_into_table(self, file_hashes, batch_size=BULK_PARSE_BATCH_SIZE):
+        """Parse volume files with ai_parse_document inside the MERGE, so no parsed data reaches the app.
+
+        file_hashes maps each volume path to the SHA-256 of its content.
+        Paths whose warehouse-parsed version is already in the table are
+        skipped. Returns
+        {path: error or None}; a document that produced no rows is reported
+        as an error.
+        """
+        started = time.perf_counter()
+        results = {}
+        with span("table.parse_into", table=self.table_name, documents=len(file_hashes)) as parse_span:
+            self.ensure_table()
+            written = self.written_versions(file_hashes)
+            pending = {}
+            for path, sha in file_hashes.items():
+                if (path, sha, "warehouse") in written:
+                    results[path] = None
+                else:
+                    pending[path] = sha
+            unchanged = len(results)
+
+            statements = rows_written = 0
+            items = list(pending.items())
+            for start in range(0, len(items), batch_size):
+                batch = dict(items[start:start + batch_size])
+                try:
+                    statement = self._run(self._merge_parse(batch))
+                    statements += 1
+                    # MERGE returns num_affected_rows, num_updated_rows, num_deleted_rows, num_inserted_rows
+                    counts = next(iter(iter_result_rows(self.workspace_client, statement)), None)
+                    rows_written += int(counts[3]) if counts else 0
+                    written = self.written_versions(batch)
+                except Exception as e:
+                    results.update({path: str(e) for path in batch})
+                    continue
+                for path, sha in batch.items():
+                    results[path] = None if written.get((path, sha, "warehouse")) else "No elements returned from ai_parse_document"
+            parse_span.set(unchanged=unchanged, rows=rows_written, statements=statements)
+
+        with self._lock:
+            self.stats["documents"] += len(pending)
+            self.stats["unchanged"] += unchanged
+            self.stats["rows"] += rows_written
+            self.stats["statements"] += statements
+            self.stats["seconds"] += time.perf_counter() - started
+        return results
+
+    def _merge_parse(self, documents):
+        sources = "\n                UNION ALL\n".join(
+            f"                SELECT {sql_string(path)} AS path, {sql_string(sha)} AS content_sha256, content "
+            f"FROM read_files({sql_string(path)}, format => 'binaryFile')"
+            for path, sha in documents.items()
+        )
+        box = "e.value:bbox[0]"
+        return f"""
+        MERGE INTO {self.table} AS t
+        USING (
+            SELECT
+                d.path,
+                d.content_sha256,
+                CAST(e.pos AS INT) AS element_index,
+                CAST(e.value:id AS INT) AS element_id,
+                CAST({box}.page_id AS INT) AS page_id,
+                CAST(e.value:type AS STRING) AS type,
+                CAST(e.value:content AS STRING) AS content,
+                CAST(e.value:description AS STRING) AS description,
+                CAST({box}.coord[0] AS DOUBLE) AS x0,
+                CAST({box}.coord[1] AS DOUBLE) AS y0,
+                CAST({box}.coord[2] AS DOUBLE) AS x1,
+                CAST({box}.coord[3] AS DOUBLE) AS y1,
+                'warehouse' AS parsed_by
+            FROM (
+                SELECT path, content_sha256, ai_parse_document(content) AS parsed
+                FROM (
+{sources}
+                )
+            ) AS d,
+            LATERAL variant_explode(d.parsed:document.elements) AS e
+        ) AS s{self._merge_clauses({path: (sha, "warehouse") for path, sha in documents.items()})}"""
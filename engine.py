@@ -0,0 +1,674 @@
+"""Upload and parse pipeline shared by the Streamlit page and the headless ingest CLI.
+
+Functions here take a jobs.Job as their first argument: they report progress
+through job.update() / job.detail, stop at job.check_cancelled(), and never
+touch Streamlit, so the same code runs on the page's background workers and
+from the command line.
+"""
+import fnmatch
+import io
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import env_int
+from dedupe import is_unchanged, record_upload
+from delta_sink import DeltaSink
+from imageprep import is_normalizable, normalize_images
+from jobs import JobCancelled
+from localparse import parse_pdf_locally, parse_pdfs_locally, read_bytes
+from parse_cache import cache_key, content_hash, get_parse_cache
+from parsing import (
+    BULK_PARSE_BATCH_SIZE,
+    build_parse_query,
+    get_warehouse_id,
+    parse_documents_bulk,
+    parsed_content_to_dataframe,
+    run_statement,
+    statement_content,
+)
+from resumable import (
+    FilesMultipartTransport,
+    MultipartNotSupported,
+    ResumableUploadError,
+    get_resumable_min_size,
+    resumable_upload,
+)
+from search_index import document_pages, get_search_index
+from telemetry import span, submit_in_context
+from uploads import get_upload_chunk_size, get_upload_concurrency, upload_batch, upload_to_volume
+
+logger = logging.getLogger(__name__)
+
+# File extensions supported by ai_parse_document
+SUPPORTED_PARSE_FORMATS = ['pdf', 'png', 'jpg', 'jpeg', 'tiff', 'bmp']
+
+# Bulk parse statements the ingest pipeline runs at the same time
+DEFAULT_INGEST_PARSE_WORKERS = 2
+
+
+def get_ingest_parse_workers():
+    """Return the number of concurrent bulk parse statements from INGEST_PARSE_WORKERS (default 2)"""
+    return env_int("INGEST_PARSE_WORKERS", DEFAULT_INGEST_PARSE_WORKERS)
+
+
+def is_parsable(file_name):
+    """Whether ai_parse_document supports the file's extension"""
+    return file_name.lower().split('.')[-1] in SUPPORTED_PARSE_FORMATS
+
+
+def source_size(source):
+    """Size in bytes of an uploaded file (its .size) or of any seekable binary stream"""
+    size = getattr(source, "size", None)
+    if size is not None:
+        return size
+    position = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def get_volume_directory(upload_volume_path, subfolder=""):
+    """Build the /Volumes/... directory for a catalog.schema.volume_name path and optional subfolder"""
+    parts = upload_volume_path.split('.')
+    if len(parts) != 3:
+        raise ValueError("Invalid volume path format. Please use: catalog.schema.volume_name")
+
+    catalog, schema, volume_name = parts
+    volume_directory = f"/Volumes/{catalog}/{schema}/{volume_name}"
+    if subfolder:
+        volume_directory = f"{volume_directory}/{subfolder.strip('/')}"
+    return volume_directory
+
+
+def upload_resumable(job, workspace_client, name, file_path, source, file_hash, resumable_states):
+    """Upload a large file in parts, resuming an interrupted attempt kept in resumable_states"""
+    state_key = f"{file_path}:{file_hash}"
+    job.update(0.0, f"Uploading {name} in parts...")
+
+    def on_part_uploaded(state):
+        resumable_states[state_key] = state
+        job.update(state.bytes_done / max(state.size, 1), f"Uploaded {len(state.etags)}/{state.part_count} parts")
+
+    try:
+        state = resumable_upload(
+            FilesMultipartTransport(workspace_client),
+            source,
+            file_path,
+            fingerprint=file_hash,
+            state=resumable_states.get(state_key),
+            on_progress=on_part_uploaded
+        )
+    except MultipartNotSupported:
+        # Storage without part uploads (e.g. GCP resumable sessions): plain streamed upload
+        return upload_to_volume(workspace_client, file_path, source, chunk_size=get_upload_chunk_size())
+    except ResumableUploadError as e:
+        resumable_states[state_key] = e.state
+        job.detail["resumable"] = {
+            "parts_done": len(e.state.etags),
+            "part_count": e.state.part_count,
+            "bytes_done": e.state.bytes_done,
+        }
+        raise
+
+    resumable_states.pop(state_key, None)
+    return state.size
+
+
+def upload_file(job, workspace_client, name, file_path, source, file_hash, resumable_states=None,
+                skip_unchanged=False, compare_hash=False):
+    """Upload one file, in resumable parts when it is large; returns (size, skipped)"""
+    size = source_size(source)
+    if skip_unchanged and is_unchanged(workspace_client, file_path, size, file_hash if compare_hash else None):
+        return size, True
+
+    if size >= get_resumable_min_size():
+        # Large files go up in parts that survive a dropped connection
+        resumable_states = resumable_states if resumable_states is not None else {}
+        size = upload_resumable(job, workspace_client, name, file_path, source, file_hash, resumable_states)
+    else:
+        # Stream the file to the Unity Catalog volume in bounded chunks
+        # instead of copying it into a second in-memory buffer
+        job.update(0.0, f"Uploading {name}")
+        size = upload_to_volume(workspace_client, file_path, source, chunk_size=get_upload_chunk_size())
+    if skip_unchanged or compare_hash:
+        record_upload(workspace_client, file_path, size, file_hash)
+    return size, False
+
+
+def indexed_dataframe(file_path, name, parsed_content, file_hash=None):
+    """Convert a parse result to its elements DataFrame and add the document to the search index"""
+    elements = parsed_content_to_dataframe(parsed_content)
+    try:
+        get_search_index().add(file_path, name, document_pages(elements), file_hash)
+    except Exception as e:
+        # The parse result stands even when the index cannot be written (e.g. disk full)
+        logger.warning("Could not index %s for search: %s", file_path, e)
+    return elements
+
+
+def write_results(job, workspace_client, table_name, documents):
+    """Write (file_path, file_hash, elements, parsed_by) documents to a Delta table; returns (stats, error)"""
+    documents = [document for document in documents if document[2] is not None]
+    if not documents:
+        return None, None
+    job.update(1.0, f"Writing {len(documents)} documents to {table_name}")
+    try:
+        sink = DeltaSink(workspace_client, table_name, should_cancel=lambda: job.cancel_requested)
+        for file_path, file_hash, elements, parsed_by in documents:
+            sink.add(file_path, file_hash, elements, parsed_by)
+        return sink.flush(), None
+    except JobCancelled:
+        raise
+    except Exception as e:
+        logger.warning("Could not write results to %s: %s", table_name, e)
+        return None, str(e)
+
+
+def parse_without_warehouse(job, name, source, file_hash=None):
+    """Cached or locally extracted parse of a file; returns (parsed_content, parsed_by) or (None, None).
+
+    A cache hit reports the parser that produced the cached content and sets
+    job.detail["from_cache"].
+    """
+    key = cache_key(file_hash) if file_hash else None
+    if key:
+        cached, parsed_by = get_parse_cache().get(key)
+        if cached is not None:
+            job.detail["from_cache"] = True
+            return cached, parsed_by
+
+    if name.lower().endswith(".pdf"):
+        local_content, decision = parse_pdf_locally(source, name, file_hash)
+        job.detail["local_parse"] = decision.reason
+        if local_content is not None:
+            return local_content, "local"
+        job.check_cancelled()
+    return None, None
+
+
+def parse_file(job, workspace_client, name, file_path, source, file_hash=None):
+    """Parse one volume file; returns (DataFrame, error, parsed_by).
+
+    parsed_by is "local" or "warehouse". A cached parse of identical content
+    (same SHA-256 and parser version) is returned without running a statement
+    and keeps the parser that produced it, and PDFs with a text layer are extracted in-process. Otherwise
+    the statement is polled with backoff and cancelled on the warehouse if the
+    job is cancelled.
+    """
+    parsed_content, parsed_by = parse_without_warehouse(job, name, source, file_hash)
+    if parsed_content is not None:
+        return indexed_dataframe(file_path, name, parsed_content, file_hash), None, parsed_by
+
+    if not get_warehouse_id():
+        return None, "SQL Warehouse ID not configured. Please set DATABRICKS_WAREHOUSE_ID environment variable.", "warehouse"
+
+    def on_submitted(statement, warehouse_id):
+        job.detail["statement_id"] = statement.statement_id
+        job.detail["warehouse_id"] = warehouse_id
+
+    # Routed to the best warehouse, waiting for a slot shared fairly with other sessions
+    statement = run_statement(
+        workspace_client,
+        build_parse_query(file_path),
+        should_cancel=lambda: job.cancel_requested,
+        on_submitted=on_submitted
+    )
+    job.check_cancelled()
+
+    parsed_content, error = statement_content(statement, workspace_client)
+    if error:
+        return None, error, "warehouse"
+    if file_hash and isinstance(parsed_content, str):
+        get_parse_cache().put(cache_key(file_hash), parsed_content, "warehouse")
+    return indexed_dataframe(file_path, name, parsed_content, file_hash), None, "warehouse"
+
+
+def normalize_items(job, items, target_dpi=None):
+    """Normalize the image files among (name, file_path, source) items; returns (items, report).
+
+    Multi-page TIFFs become one item per page next to the original path and
+    oversized scans are replaced by their downscaled copies; every other item
+    is returned unchanged.
+    """
+    image_items = [(position, item) for position, item in enumerate(items) if is_normalizable(item[0])]
+    report = {"images": len(image_items), "changed": 0, "split": 0, "pages": 0, "bytes_before": 0, "bytes_after": 0,
+              "seconds": 0.0}
+    if not image_items:
+        return list(items), report
+
+    job.update(0.0, f"Normalizing {len(image_items)} images")
+    started = time.perf_counter()
+    normalized = normalize_images([(name, read_bytes(source)) for _, (name, _, source) in image_items], target_dpi)
+    report["seconds"] = time.perf_counter() - started
+    job.check_cancelled()
+
+    replacements = {}
+    for (position, (name, file_path, source)), image in zip(image_items, normalized):
+        report["bytes_before"] += image.original_bytes
+        report["bytes_after"] += image.normalized_bytes
+        report["pages"] += len(image.pages)
+        if not image.changed:
+            continue
+        report["changed"] += 1
+        report["split"] += len(image.pages) > 1
+        directory = file_path.rsplit("/", 1)[0]
+        replacements[position] = [
+            (page.name, f"{directory}/{page.name}", io.BytesIO(page.data)) for page in image.pages
+        ]
+
+    normalized_items = []
+    for position, item in enumerate(items):
+        normalized_items.extend(replacements.get(position, [item]))
+    job.detail["normalize"] = report
+    return normalized_items, report
+
+
+def ingest_pages(job, workspace_client, name, page_items, resumable_states=None, skip_unchanged=False,
+                 compare_hash=False):
+    """Upload the pages a multi-page image was split into and parse them together.
+
+    Returns (size, skipped, parsed, error, documents) where parsed merges the
+    pages into one DataFrame and documents lists each page as parse_files does.
+    """
+    import pandas as pd
+
+    size = 0
+    skipped = True
+    for page_name, page_path, page_source in page_items:
+        job.check_cancelled()
+        page_size, page_skipped = upload_file(
+            job,
+            workspace_client,
+            page_name,
+            page_path,
+            page_source,
+            content_hash(page_source),
+            resumable_states,
+            skip_unchanged=skip_unchanged,
+            compare_hash=compare_hash
+        )
+        size += page_size
+        skipped = skipped and page_skipped
+
+    job.update(1.0, f"Parsing {len(page_items)} pages of {name} with Databricks AI")
+    sources_by_path = {page_path: (page_name, page_source) for page_name, page_path, page_source in page_items}
+    parse_result = parse_files(job, workspace_client, list(sources_by_path), sources_by_path)
+    errors = [row["Status"] for row in parse_result["parse_rows"] if row["File"] not in parse_result["parsed"]]
+    if errors:
+        message = f"{len(errors)} of {len(page_items)} pages failed: {errors[0].lstrip('❌ ')}"
+        return size, skipped, None, message, parse_result["documents"]
+
+    frames = []
+    for page_index, (page_name, _, _) in enumerate(page_items):
+        frame = parse_result["parsed"][page_name]
+        if "page_id" in frame.columns:
+            frame = frame.assign(page_id=page_index)
+        frames.append(frame)
+    return size, skipped, pd.concat(frames, ignore_index=True), None, parse_result["documents"]
+
+
+def ingest_file(job, workspace_client, name, file_path, source, volume, resumable_states=None,
+                skip_unchanged=False, compare_hash=False, normalize=False, results_table=None):
+    """Job: upload one file, then parse it if it is a PDF or image (and write the result to results_table)"""
+    original_name = name
+    normalize_report = None
+    page_items = None
+    if normalize:
+        normalized_items, normalize_report = normalize_items(job, [(name, file_path, source)])
+        if len(normalized_items) > 1:
+            page_items = normalized_items
+        else:
+            name, file_path, source = normalized_items[0]
+
+    if page_items:
+        size, skipped, parsed, parse_error, documents = ingest_pages(
+            job, workspace_client, original_name, page_items, resumable_states, skip_unchanged, compare_hash
+        )
+        # Any page parsed on the warehouse makes the document a warehouse parse
+        parsers = {parsed_by for _, _, _, parsed_by in documents}
+        result = {
+            "file_name": original_name,
+            "size": size,
+            # Only the pages were uploaded; the original path does not exist in the volume
+            "file_path": None,
+            "volume": volume,
+            "skipped": skipped,
+            "parsable": True,
+            "parsed": parsed,
+            "parse_error": parse_error,
+            "parsed_by": "warehouse" if "warehouse" in parsers else next(iter(parsers), None),
+            "normalize": normalize_report,
+            "page_paths": [page_path for _, page_path, _ in page_items],
+            "table": None,
+            "table_error": None,
+        }
+        job.detail["upload"] = result
+        if results_table:
+            result["table"], result["table_error"] = write_results(job, workspace_client, results_table, documents)
+        return result
+
+    job.update(0.0, "Hashing file contents")
+    with span("file.hash", bytes=source_size(source)):
+        file_hash = content_hash(source)
+
+    size, skipped = upload_file(
+        job,
+        workspace_client,
+        name,
+        file_path,
+        source,
+        file_hash,
+        resumable_states,
+        skip_unchanged=skip_unchanged,
+        compare_hash=compare_hash
+    )
+
+    result = {
+        "file_name": name,
+        "size": size,
+        "file_path": file_path,
+        "volume": volume,
+        "skipped": skipped,
+        "parsable": is_parsable(name),
+        "parsed": None,
+        "parse_error": None,
+        "parsed_by": None,
+        "normalize": normalize_report,
+        "page_paths": None,
+        "table": None,
+        "table_error": None,
+    }
+    job.detail["upload"] = result
+    job.check_cancelled()
+
+    if result["parsable"]:
+        job.update(1.0, f"Parsing {name} with Databricks AI")
+        result["parsed"], result["parse_error"], result["parsed_by"] = parse_file(
+            job, workspace_client, name, file_path, source, file_hash
+        )
+        if results_table:
+            result["table"], result["table_error"] = write_results(
+                job, workspace_client, results_table, [(file_path, file_hash, result["parsed"], result["parsed_by"])]
+            )
+    return result
+
+
+def parse_files(job, workspace_client, file_paths, sources_by_path):
+    """Parse uploaded batch files, text-native PDFs locally (side by side) and the rest in bulk statements.
+
+    sources_by_path maps each volume path to its (name, source). Returns
+    per-file status rows and DataFrames, and the parsed documents as
+    (file_path, file_hash, elements, parsed_by) for write_results.
+    """
+    file_hashes = {file_path: content_hash(sources_by_path[file_path][1]) for file_path in file_paths}
+    started = time.perf_counter()
+
+    # Same order as parse_without_warehouse, so both paths report the same parser for the same bytes
+    results = {}
+    parsed_by = {}
+    for file_path in file_paths:
+        cached, cached_by = get_parse_cache().get(cache_key(file_hashes[file_path]))
+        if cached is not None:
+            results[file_path] = (cached, None)
+            parsed_by[file_path] = cached_by
+    pdf_paths = [
+        file_path for file_path in file_paths
+        if file_path not in results and sources_by_path[file_path][0].lower().endswith(".pdf")
+    ]
+    local_results = parse_pdfs_locally([
+        (sources_by_path[file_path][1], sources_by_path[file_path][0], file_hashes[file_path])
+        for file_path in pdf_paths
+    ])
+    for file_path, (local_content, _) in zip(pdf_paths, local_results):
+        if local_content is not None:
+            results[file_path] = (local_content, None)
+            parsed_by[file_path] = "local"
+    job.check_cancelled()
+
+    warehouse_paths = [file_path for file_path in file_paths if file_path not in results]
+    if warehouse_paths:
+        results.update(parse_documents_bulk(
+            workspace_client,
+            warehouse_paths,
+            file_hashes=file_hashes,
+            should_cancel=lambda: job.cancel_requested
+        ))
+    elapsed = time.perf_counter() - started
+
+    parsed = {}
+    parse_rows = []
+    documents = []
+    for file_path in file_paths:
+        parsed_content, error = results[file_path]
+        file_name = sources_by_path[file_path][0]
+        if error:
+            parse_rows.append({"File": file_name, "Status": f"❌ {error}", "Rows": None})
+        else:
+            parsed[file_name] = indexed_dataframe(file_path, file_name, parsed_content, file_hashes[file_path])
+            documents.append((file_path, file_hashes[file_path], parsed[file_name], parsed_by.get(file_path, "warehouse")))
+            status = "✅ Parsed locally" if parsed_by.get(file_path) == "local" else "✅ Parsed"
+            parse_rows.append({"File": file_name, "Status": status, "Rows": parsed[file_name].shape[0]})
+
+    return {"parsed": parsed, "parse_rows": parse_rows, "parse_elapsed": elapsed, "parse_count": len(file_paths),
+            "documents": documents}
+
+
+def ingest_batch(job, workspace_client, items, concurrency, parse_batch, skip_unchanged=False, compare_hash=False,
+                 normalize=False, results_table=None):
+    """Job: upload (name, file_path, source) items through the upload pool, then parse supported files in bulk.
+
+    With results_table, the parsed documents are written to that Delta table
+    in micro-batched MERGE statements.
+    """
+    normalize_report = None
+    if normalize:
+        items, normalize_report = normalize_items(job, items)
+
+    status_rows = {
+        file_path: {"File": name, "Size (KB)": round(source_size(source) / 1024, 2), "Status": "⏳ Queued", "Seconds": None}
+        for name, file_path, source in items
+    }
+    job.detail["status_rows"] = status_rows
+    job.update(0.0, f"Uploading {len(items)} files")
+
+    def on_upload_complete(result, done, total):
+        row = status_rows[result.file_path]
+        if not result.ok:
+            row["Status"] = f"❌ {result.error}"
+        else:
+            row["Status"] = "⏭️ Unchanged" if result.skipped else "✅ Uploaded"
+        row["Seconds"] = round(result.elapsed, 2)
+        job.update(done / total, f"Uploaded {done}/{total} files")
+
+    summary = upload_batch(
+        workspace_client,
+        items,
+        max_workers=concurrency,
+        on_complete=on_upload_complete,
+        skip_unchanged=skip_unchanged,
+        compare_hash=compare_hash
+    )
+    result = {"summary": summary, "parsed": {}, "parse_rows": [], "parse_elapsed": None, "parse_count": 0,
+              "normalize": normalize_report, "table": None, "table_error": None}
+    job.check_cancelled()
+
+    sources_by_path = {file_path: (name, source) for name, file_path, source in items}
+    parse_paths = [r.file_path for r in summary.succeeded if is_parsable(r.name)]
+    if parse_batch and parse_paths:
+        job.update(1.0, f"Parsing {len(parse_paths)} documents with Databricks AI in bulk")
+        result.update(parse_files(job, workspace_client, parse_paths, sources_by_path))
+        documents = result.pop("documents")
+        if results_table:
+            result["table"], result["table_error"] = write_results(job, workspace_client, results_table, documents)
+    return result
+
+
+def iter_local_files(root, pattern=None):
+    """Yield (relative_path, local_path) for files under root, walking directories lazily in name order"""
+    for directory, subdirectories, file_names in os.walk(root):
+        subdirectories.sort()
+        for file_name in sorted(file_names):
+            if pattern and not fnmatch.fnmatch(file_name, pattern):
+                continue
+            local_path = os.path.join(directory, file_name)
+            yield os.path.relpath(local_path, root).replace(os.sep, "/"), local_path
+
+
+def _ingest_local_file(job, workspace_client, relative_path, local_path, file_path, parse, skip_unchanged, compare_hash):
+    """Upload stage of the ingest pipeline; parses from cache or locally when it can.
+
+    Returns the file's record; records with "pending_parse" set still need
+    the warehouse.
+    """
+    record = {
+        "file": relative_path,
+        "file_path": file_path,
+        "size": None,
+        "sha256": None,
+        "skipped": False,
+        "upload_error": None,
+        "parsed_by": None,
+        "parse_error": None,
+        "elements": None,
+    }
+    name = os.path.basename(relative_path)
+    with span("ingest.file", file_path=file_path), open(local_path, "rb") as source:
+        try:
+            record["sha256"] = content_hash(source)
+            record["size"], record["skipped"] = upload_file(
+                job,
+                workspace_client,
+                name,
+                file_path,
+                source,
+                record["sha256"],
+                skip_unchanged=skip_unchanged,
+                compare_hash=compare_hash
+            )
+        except JobCancelled:
+            raise
+        except Exception as e:
+            record["upload_error"] = str(e)
+            return record
+
+        if parse and is_parsable(name):
+            parsed_content, record["parsed_by"] = parse_without_warehouse(job, name, source, record["sha256"])
+            if parsed_content is None:
+                record["pending_parse"] = True
+            else:
+                record["elements"] = indexed_dataframe(file_path, name, parsed_content, record["sha256"])
+    return record
+
+
+def parse_pending_records(job, workspace_client, records):
+    """Parse stage of the ingest pipeline and the watcher: one bulk statement for a batch of file records"""
+    results = parse_documents_bulk(
+        workspace_client,
+        [record["file_path"] for record in records],
+        batch_size=len(records),
+        file_hashes={record["file_path"]: record["sha256"] for record in records},
+        should_cancel=lambda: job.cancel_requested
+    )
+    for record in records:
+        parsed_content, error = results[record["file_path"]]
+        record["parsed_by"] = "warehouse"
+        if error:
+            record["parse_error"] = error
+        else:
+            record["elements"] = indexed_dataframe(
+                record["file_path"], os.path.basename(record["file"]), parsed_content, record["sha256"]
+            )
+    return records
+
+
+def parse_pending_into_table(job, table_sink, records):
+    """Parse stage of the ingest pipeline when results go straight to a Delta table (see DeltaSink.parse_into_table)"""
+    try:
+        errors = table_sink.parse_into_table({record["file_path"]: record["sha256"] for record in records})
+    except JobCancelled:
+        raise
+    except Exception as e:
+        errors = {record["file_path"]: str(e) for record in records}
+    for record in records:
+        record["parsed_by"] = "warehouse"
+        record["parse_error"] = errors[record["file_path"]]
+    return records
+
+
+def ingest_files(job, workspace_client, files, volume_directory, concurrency=None, parse=True,
+                 parse_batch_size=BULK_PARSE_BATCH_SIZE, skip_unchanged=False, compare_hash=False, table_sink=None):
+    """Upload and parse (relative_path, local_path) pairs, yielding one record per file as it finishes.
+
+    files is consumed lazily: at most two uploads per worker are in flight, so
+    a directory walk never gets ahead of the pool. Files that cannot be parsed
+    from the cache or locally are collected into bulk parse statements of up
+    to parse_batch_size paths, which run alongside the remaining uploads.
+    Records come back in completion order with "elements" as a DataFrame (or
+    None) and per-file upload_error / parse_error instead of raised errors.
+    With table_sink (a delta_sink.DeltaSink), the bulk statements parse
+    straight into its table and those records carry no elements.
+    """
+    concurrency = concurrency or get_upload_concurrency()
+    upload_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest-upload")
+    parse_pool = ThreadPoolExecutor(max_workers=get_ingest_parse_workers(), thread_name_prefix="ingest-parse")
+    in_flight = set()
+    pending_parse = []
+    uploading = 0
+    finished = 0
+
+    def flush_parse_batch():
+        if pending_parse:
+            if table_sink is not None:
+                future = submit_in_context(parse_pool, parse_pending_into_table, job, table_sink, list(pending_parse))
+            else:
+                future = submit_in_context(parse_pool, parse_pending_records, job, workspace_client, list(pending_parse))
+            in_flight.add(future)
+            pending_parse.clear()
+
+    def drain(limit):
+        # Wait until no more than limit uploads are in flight, collecting finished records
+        nonlocal uploading, finished
+        while in_flight and uploading > limit:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                result = future.result()
+                if isinstance(result, list):
+                    finished += len(result)
+                    yield from result
+                    continue
+                uploading -= 1
+                if result.pop("pending_parse", False):
+                    pending_parse.append(result)
+                    if len(pending_parse) >= parse_batch_size:
+                        flush_parse_batch()
+                else:
+                    finished += 1
+                    yield result
+            job.update(message=f"{finished} files done, {uploading} uploading, {len(pending_parse)} waiting to parse")
+
+    try:
+        for relative_path, local_path in files:
+            job.check_cancelled()
+            in_flight.add(submit_in_context(
+                upload_pool, _ingest_local_file, job, workspace_client, relative_path, local_path,
+                f"{volume_directory}/{relative_path}", parse, skip_unchanged, compare_hash
+            ))
+            uploading += 1
+            yield from drain(concurrency * 2 - 1)
+
+        yield from drain(0)
+        flush_parse_batch()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                yield from future.result()
+    finally:
+        if job.cancel_requested:
+            for future in in_flight:
+                future.cancel()
+        upload_pool.shutdown(wait=True)
+        parse_pool.shutdown(wait=True)
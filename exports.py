@@ -0,0 +1,138 @@
+"""On-demand CSV / Parquet / JSONL exports of parsed results, cached by result hash"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from config import env_int
+
+# Label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "JSONL": ("jsonl", "application/x-ndjson"),
+}
+
+# Rows serialised per step, so text exports never hold a second full copy as str
+EXPORT_CHUNK_ROWS = 50_000
+
+# Default memory budget of the export cache
+DEFAULT_EXPORT_CACHE_SIZE = 128 * 1024 * 1024
+
+
+def get_export_cache_size():
+    """Return the export cache budget in bytes from EXPORT_CACHE_MAX_MB (default 128)"""
+    return env_int("EXPORT_CACHE_MAX_MB", DEFAULT_EXPORT_CACHE_SIZE, scale=1024 * 1024)
+
+
+def result_hash(df):
+    """Stable SHA-256 of a result DataFrame's columns and values, memoised in df.attrs"""
+    import pandas as pd
+
+    cached = df.attrs.get("result_hash")
+    if cached:
+        return cached
+
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:
+        # Unhashable cell values (lists/dicts from the legacy JSON layout)
+        digest.update(df.to_json(orient="values", default_handler=str).encode("utf-8"))
+    df.attrs["result_hash"] = digest.hexdigest()
+    return df.attrs["result_hash"]
+
+
+def _write_text_chunks(df, out, to_text):
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        out.write(to_text(df.iloc[start:start + EXPORT_CHUNK_ROWS], start == 0).encode("utf-8"))
+
+
+def _jsonl(chunk):
+    text = chunk.to_json(orient="records", lines=True, default_handler=str)
+    return text if text.endswith("\n") else text + "\n"
+
+
+def _parquet_safe(df):
+    """Object columns of mixed Python values as strings, which Arrow always accepts"""
+    object_columns = [name for name, dtype in df.dtypes.items() if dtype == object]
+    return df.astype({name: "string" for name in object_columns}) if object_columns else df
+
+
+def write_export(df, fmt, out):
+    """Serialise df to the binary file object out as CSV, Parquet or JSONL"""
+    if fmt == "CSV":
+        if df.empty:
+            out.write(df.to_csv(index=False).encode("utf-8"))
+        else:
+            _write_text_chunks(df, out, lambda chunk, first: chunk.to_csv(index=False, header=first))
+    elif fmt == "JSONL":
+        _write_text_chunks(df, out, lambda chunk, first: _jsonl(chunk))
+    elif fmt == "Parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            table = pa.Table.from_pandas(_parquet_safe(df), preserve_index=False)
+        pq.write_table(table, out)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+class ExportCache:
+    """LRU of generated export files keyed by (result hash, format), bounded by total bytes"""
+
+    def __init__(self, max_bytes=DEFAULT_EXPORT_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if len(data) > self.max_bytes:
+                return
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_export_cache():
+    """Return the process-wide export cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExportCache(get_export_cache_size())
+    return _cache
+
+
+def export_result(df, fmt, cache=None):
+    """Return the bytes of df exported as fmt, generating them only on a cache miss"""
+    cache = cache or get_export_cache()
+    key = (result_hash(df), fmt)
+    data = cache.get(key)
+    if data is None:
+        out = io.BytesIO()
+        write_export(df, fmt, out)
+        data = out.getvalue()
+        cache.put(key, data)
+    return data
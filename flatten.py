@@ -0,0 +1,209 @@
+"""Columnar flattening of ai_parse_document output into typed element, page and table frames"""
+import json
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Column order and dtypes of the flattened element table
+ELEMENT_COLUMNS = {
+    "element_id": "Int64",
+    "page_id": "Int64",
+    "type": "string",
+    "content": "string",
+    "description": "string",
+    "x0": "float64",
+    "y0": "float64",
+    "x1": "float64",
+    "y1": "float64",
+}
+
+PAGE_COLUMNS = {
+    "page_id": "Int64",
+    "element_count": "Int64",
+    "table_count": "Int64",
+    "image_uri": "string",
+}
+
+
+@dataclass
+class ParsedDocument:
+    """Flattened ai_parse_document result"""
+    elements: "pd.DataFrame"
+    pages: "pd.DataFrame"
+    tables: "pd.DataFrame"
+
+
+def _empty(columns):
+    import pandas as pd
+
+    return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in columns.items()})
+
+
+def _typed(df, columns):
+    """Add missing columns and cast every column to its declared dtype, in declared order"""
+    import pandas as pd
+
+    for name, dtype in columns.items():
+        if name not in df:
+            df[name] = pd.Series(pd.NA, index=df.index, dtype=dtype)
+        else:
+            df[name] = df[name].astype(dtype)
+    return df[list(columns)]
+
+
+def _struct_field(array, name):
+    """Field of an Arrow struct array, or None if the struct has no such field"""
+    import pyarrow.compute as pc
+
+    if array.type.get_field_index(name) < 0:
+        return None
+    return pc.struct_field(array, name)
+
+
+def _read_document_arrow(parsed_content):
+    """Parse the JSON text with Arrow's native JSON reader into a one-row table"""
+    import pyarrow as pa
+    import pyarrow.json as paj
+
+    raw = parsed_content.encode("utf-8") if isinstance(parsed_content, str) else json.dumps(parsed_content).encode("utf-8")
+    return paj.read_json(
+        pa.BufferReader(raw),
+        read_options=paj.ReadOptions(block_size=max(len(raw) + 1, 1 << 20)),
+        parse_options=paj.ParseOptions(newlines_in_values=True),
+    )
+
+
+def _flatten_arrow(parsed_content):
+    """Vectorized flatten using Arrow list/struct kernels; raises if the layout is not recognised"""
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = _read_document_arrow(parsed_content)
+    document = table.column("document").combine_chunks()
+
+    elements = pc.list_flatten(_struct_field(document, "elements"))
+    if not pa.types.is_struct(elements.type):
+        raise ValueError("Unexpected element layout")
+
+    columns = {}
+    for source, target in (("id", "element_id"), ("type", "type"), ("content", "content"), ("description", "description")):
+        field = _struct_field(elements, source)
+        if field is not None:
+            columns[target] = field.to_pandas()
+
+    bbox = _struct_field(elements, "bbox")
+    if bbox is not None and len(elements):
+        # First bounding box of every element, located through the list offsets (no per-row Python)
+        bbox = bbox.combine_chunks() if isinstance(bbox, pa.ChunkedArray) else bbox
+        lengths = pc.fill_null(pc.list_value_length(bbox), 0).to_numpy(zero_copy_only=False)
+        has_box = lengths > 0
+        first = bbox.offsets.to_numpy()[:-1][has_box] - bbox.offsets[0].as_py()
+        boxes = pc.take(pc.list_flatten(bbox), pa.array(first))
+
+        page_id = np.full(len(elements), np.nan)
+        page_field = _struct_field(boxes, "page_id")
+        if page_field is not None:
+            page_id[has_box] = page_field.to_numpy(zero_copy_only=False)
+        columns["page_id"] = page_id
+
+        coord = _struct_field(boxes, "coord")
+        if coord is not None:
+            coord_lengths = pc.fill_null(pc.list_value_length(coord), 0).to_numpy(zero_copy_only=False)
+            full = coord_lengths >= 4
+            starts = coord.offsets.to_numpy()[:-1][full] - coord.offsets[0].as_py()
+            values = pc.list_flatten(coord).to_numpy(zero_copy_only=False)
+            box_rows = np.flatnonzero(has_box)[full]
+            for i, name in enumerate(("x0", "y0", "x1", "y1")):
+                column = np.full(len(elements), np.nan)
+                column[box_rows] = values[starts + i]
+                columns[name] = column
+
+    element_df = _typed(pd.DataFrame(columns), ELEMENT_COLUMNS)
+
+    page_df = pd.DataFrame()
+    pages = _struct_field(document, "pages")
+    if pages is not None:
+        pages = pc.list_flatten(pages)
+        for source, target in (("id", "page_id"), ("image_uri", "image_uri")):
+            field = _struct_field(pages, source)
+            if field is not None:
+                page_df[target] = field.to_pandas()
+    return element_df, page_df
+
+
+def _flatten_pandas(parsed_json):
+    """pd.json_normalize fallback for layouts Arrow cannot infer a single schema for"""
+    import pandas as pd
+
+    document = parsed_json.get("document", {})
+    # Entries that are not objects carry no element fields; skip them as the Arrow path would fail on them
+    elements = [element for element in document.get("elements") or [] if isinstance(element, dict)]
+    element_df = pd.json_normalize(elements)
+    element_df = element_df.rename(columns={"id": "element_id"})
+
+    if "bbox" in element_df:
+        first_box = element_df["bbox"].str[0]
+        element_df["page_id"] = first_box.str.get("page_id")
+        coords = first_box.str.get("coord")
+        # Like the Arrow path, only complete [x0, y0, x1, y1] boxes set coordinates
+        coords = coords.where(coords.str.len() >= 4)
+        for i, name in enumerate(("x0", "y0", "x1", "y1")):
+            element_df[name] = pd.to_numeric(coords.str[i], errors="coerce")
+
+    page_df = pd.json_normalize(document.get("pages") or []).rename(columns={"id": "page_id"})
+    return _typed(element_df, ELEMENT_COLUMNS), page_df
+
+
+def _summarise_pages(element_df, page_df):
+    """Per-page element and table counts joined onto the page list"""
+    import pandas as pd
+
+    page_ids = element_df["page_id"]
+    is_table = element_df["type"].eq("table").fillna(False).to_numpy(dtype=bool)
+    counts = pd.DataFrame({
+        "element_count": page_ids.value_counts(),
+        "table_count": page_ids[is_table].value_counts(),
+    }).fillna(0).sort_index().rename_axis("page_id").reset_index()
+    if page_df.empty or "page_id" not in page_df:
+        page_df = counts
+    else:
+        page_df = page_df.astype({"page_id": "Int64"}).merge(counts.astype({"page_id": "Int64"}), on="page_id", how="left")
+    page_df[["element_count", "table_count"]] = page_df[["element_count", "table_count"]].fillna(0)
+    return _typed(page_df, PAGE_COLUMNS)
+
+
+def is_parsed_document(parsed_json):
+    """Whether decoded JSON has the ai_parse_document {"document": {"elements": [...]}} layout"""
+    return (
+        isinstance(parsed_json, dict)
+        and isinstance(parsed_json.get("document"), dict)
+        and isinstance(parsed_json["document"].get("elements"), list)
+    )
+
+
+def flatten_parsed_document(parsed_content, parsed_json=None):
+    """Flatten ai_parse_document output into typed element, page and table DataFrames.
+
+    The Arrow path decodes the JSON and extracts every element field with
+    columnar kernels in one pass; documents whose values do not fit a single
+    Arrow schema fall back to pd.json_normalize. Returns None when the content
+    does not have the ai_parse_document layout.
+    """
+    try:
+        element_df, page_df = _flatten_arrow(parsed_content)
+    except Exception:
+        if parsed_json is None:
+            try:
+                parsed_json = json.loads(parsed_content) if isinstance(parsed_content, str) else parsed_content
+            except json.JSONDecodeError:
+                return None
+        if not is_parsed_document(parsed_json):
+            return None
+        element_df, page_df = _flatten_pandas(parsed_json)
+
+    tables = element_df[element_df["type"].eq("table").fillna(False)].reset_index(drop=True)
+    return ParsedDocument(element_df, _summarise_pages(element_df, page_df), tables)
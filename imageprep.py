@@ -0,0 +1,258 @@
+"""Optional client-side normalization of scanned images before upload and ai_parse_document.
+
+Multi-page TIFFs are split into one PNG per page, images scanned above the
+target DPI are downscaled to it, and lossless formats (TIFF, BMP, PNG) are
+recompressed as PNG. JPEGs are only re-encoded when they have to be
+downscaled. Work is spread over a process pool by file and, for long
+TIFFs, by page range.
+"""
+import importlib.util
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import List
+
+from config import env_int
+from telemetry import span
+
+# Pillow does the decoding and resampling; it is imported on first use to keep app startup fast
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+logger = logging.getLogger(__name__)
+
+# Image formats the stage rewrites (the image types ai_parse_document accepts)
+NORMALIZE_FORMATS = ["png", "jpg", "jpeg", "tiff", "tif", "bmp"]
+
+# Resolution scans are reduced to; ai_parse_document reads printed text well at this DPI
+DEFAULT_TARGET_DPI = 200
+
+# Without DPI metadata a page is assumed to be letter-size: longest side at most 11in at the target DPI
+ASSUMED_PAGE_INCHES = 11
+
+# Only downscale when the image exceeds the target by more than this factor
+DOWNSCALE_TOLERANCE = 1.1
+
+# TIFFs with at least this many pages are split across several workers
+POOL_MIN_FRAMES = 4
+
+
+def image_normalize_enabled():
+    """Whether uploads are normalized by default (IMAGE_NORMALIZE, default off) and Pillow is installed"""
+    return PIL_AVAILABLE and os.environ.get("IMAGE_NORMALIZE", "0").lower() in ("1", "true", "yes")
+
+
+def get_target_dpi():
+    """Return the resolution images are reduced to from IMAGE_TARGET_DPI (default 200)"""
+    return env_int("IMAGE_TARGET_DPI", DEFAULT_TARGET_DPI)
+
+
+def get_normalize_workers():
+    """Return the number of normalizer processes from IMAGE_NORMALIZE_WORKERS (default: CPU count, at most 4)"""
+    return env_int("IMAGE_NORMALIZE_WORKERS", min(os.cpu_count() or 1, 4))
+
+
+def is_normalizable(file_name):
+    return file_name.lower().rsplit(".", 1)[-1] in NORMALIZE_FORMATS
+
+
+@dataclass
+class NormalizedPage:
+    """One output image: its file name, bytes and pixel size"""
+    name: str
+    data: bytes
+    width: int
+    height: int
+
+
+@dataclass
+class NormalizedImage:
+    """Outcome for one input file; pages is [the original] when normalizing would not help"""
+    name: str
+    original_bytes: int
+    pages: List[NormalizedPage] = field(default_factory=list)
+    changed: bool = False
+    downscaled: bool = False
+    error: str = None
+
+    @property
+    def normalized_bytes(self):
+        return sum(len(page.data) for page in self.pages)
+
+
+def _scale_factor(image, target_dpi):
+    """Resize factor (< 1) that brings the image down to target_dpi, or 1.0"""
+    dpi = image.info.get("dpi")
+    try:
+        dpi = max(float(dpi[0]), float(dpi[1])) if dpi else 0.0
+    except (TypeError, ValueError, IndexError):
+        dpi = 0.0
+    if dpi >= 30:
+        factor = target_dpi / dpi
+    else:
+        factor = target_dpi * ASSUMED_PAGE_INCHES / max(image.size)
+    return factor if factor * DOWNSCALE_TOLERANCE < 1 else 1.0
+
+
+def _page_name(name, index, page_count):
+    stem = name.rsplit(".", 1)[0]
+    return f"{stem}_p{index + 1:03d}.png" if page_count > 1 else f"{stem}.png"
+
+
+def _normalize_frames(data, name, start, end, target_dpi):
+    """Worker: normalize frames [start, end) of an image given as bytes into (index, PNG/JPEG bytes, size, downscaled)"""
+    from PIL import Image, ImageSequence
+
+    results = []
+    with Image.open(io.BytesIO(data)) as image:
+        is_jpeg = image.format == "JPEG"
+        page_count = getattr(image, "n_frames", 1)
+        for index, frame in enumerate(ImageSequence.Iterator(image)):
+            if index < start:
+                continue
+            if index >= end:
+                break
+            factor = _scale_factor(frame, target_dpi)
+            if is_jpeg and factor == 1.0:
+                # Re-encoding a JPEG at its own size only loses quality; keep the original
+                results.append((index, name, None, frame.width, frame.height, False))
+                continue
+            page = frame.copy()
+            if page.mode not in ("1", "L", "LA", "RGB", "RGBA", "P"):
+                page = page.convert("RGB")
+            dpi = (target_dpi, target_dpi) if factor < 1 else frame.info.get("dpi")
+            if factor < 1:
+                size = (max(1, round(page.width * factor)), max(1, round(page.height * factor)))
+                # Bilevel scans resample badly; go through grayscale so text edges stay smooth
+                page = (page.convert("L") if page.mode == "1" else page).resize(size, Image.LANCZOS)
+
+            out = io.BytesIO()
+            save_options = {"dpi": tuple(round(d) for d in dpi)} if dpi else {}
+            if is_jpeg:
+                page.save(out, format="JPEG", quality=90, **save_options)
+            else:
+                page.save(out, format="PNG", compress_level=6, **save_options)
+            page_name = name.rsplit(".", 1)[0] + ".jpg" if is_jpeg else _page_name(name, index, page_count)
+            results.append((index, page_name, out.getvalue(), page.width, page.height, factor < 1))
+    return results
+
+
+def _frame_count(data):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        return getattr(image, "n_frames", 1)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_normalize_pool():
+    """Return the process-wide normalizer pool (spawned, so it is safe next to the app's threads)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=get_normalize_workers(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def _reset_normalize_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _tasks(data, name, target_dpi, workers):
+    """Split one file into (data, name, start, end, target_dpi) tasks"""
+    frames = _frame_count(data)
+    if frames < POOL_MIN_FRAMES or workers <= 1:
+        return [(data, name, 0, frames, target_dpi)]
+    step = -(-frames // workers)
+    return [(data, name, start, start + step, target_dpi) for start in range(0, frames, step)]
+
+
+def _collect(name, data, frames):
+    """Build the NormalizedImage of one file from its frame results, keeping the original when it is smaller"""
+    result = NormalizedImage(name, len(data))
+    frames.sort(key=lambda frame: frame[0])
+    if any(frame[2] is None for frame in frames):
+        result.pages = [NormalizedPage(name, data, frames[0][3], frames[0][4])]
+        return result
+    pages = [NormalizedPage(page_name, page_data, width, height) for _, page_name, page_data, width, height, _ in frames]
+    result.downscaled = any(frame[5] for frame in frames)
+    if len(pages) > 1 or result.downscaled or sum(len(page.data) for page in pages) < len(data):
+        result.pages = pages
+        result.changed = True
+    else:
+        width, height = (pages[0].width, pages[0].height) if pages else (0, 0)
+        result.pages = [NormalizedPage(name, data, width, height)]
+    return result
+
+
+def normalize_images(files, target_dpi=None, workers=None):
+    """Normalize (name, bytes) pairs; returns one NormalizedImage per input, in order.
+
+    Files are decoded and re-encoded in the process pool; a file that cannot
+    be read is passed through unchanged with its error recorded.
+    """
+    target_dpi = target_dpi or get_target_dpi()
+    workers = workers or get_normalize_workers()
+    with span("image.normalize", files=len(files), target_dpi=target_dpi) as normalize_span:
+        tasks = {}
+        results = [None] * len(files)
+        for position, (name, data) in enumerate(files):
+            try:
+                tasks[position] = _tasks(data, name, target_dpi, workers)
+            except Exception as e:
+                results[position] = NormalizedImage(name, len(data), [NormalizedPage(name, data, 0, 0)], error=str(e))
+
+        in_process = workers <= 1 or sum(len(file_tasks) for file_tasks in tasks.values()) <= 1
+        if not in_process:
+            try:
+                futures = {
+                    position: [get_normalize_pool().submit(_normalize_frames, *task) for task in file_tasks]
+                    for position, file_tasks in tasks.items()
+                }
+            except BrokenProcessPool:
+                logger.warning("Image normalizer pool broke; normalizing in-process")
+                _reset_normalize_pool()
+                in_process = True
+
+        for position, file_tasks in tasks.items():
+            name, data = files[position]
+            try:
+                if in_process:
+                    frames = [frame for task in file_tasks for frame in _normalize_frames(*task)]
+                else:
+                    frames = [frame for future in futures[position] for frame in future.result()]
+                results[position] = _collect(name, data, frames)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); rebuild the pool next time and finish in-process
+                logger.warning("Image normalizer pool broke; normalizing %s in-process", name)
+                _reset_normalize_pool()
+                in_process = True
+                results[position] = _collect(name, data, [f for task in file_tasks for f in _normalize_frames(*task)])
+            except Exception as e:
+                logger.info("Uploading %s unchanged: could not normalize it (%s)", name, e)
+                results[position] = NormalizedImage(name, len(data), [NormalizedPage(name, data, 0, 0)], error=str(e))
+
+        bytes_before = sum(result.original_bytes for result in results)
+        bytes_after = sum(result.normalized_bytes for result in results)
+        normalize_span.set(
+            bytes_before=bytes_before,
+            bytes_after=bytes_after,
+            pages=sum(len(result.pages) for result in results),
+            changed=sum(result.changed for result in results)
+        )
+        return results
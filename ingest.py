@@ -0,0 +1,151 @@
+"""Headless bulk ingestion: upload a local directory to a Unity Catalog volume, parse it and write JSONL.
+
+Runs the same engine as the Streamlit page. Each line of output describes one
+file (volume path, size, upload and parse outcome) with its parsed elements.
+
+    python ingest.py ./invoices main.default.raw_files --subfolder 2024 --output parsed.jsonl
+    python ingest.py ./scans main.default.raw_files --glob "*.pdf" --skip-unchanged > parsed.jsonl
+    python ingest.py ./scans main.default.raw_files --table main.default.parsed_elements --parse-in-table
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+
+from delta_sink import DeltaSink, get_results_table, table_identifier
+from engine import get_volume_directory, ingest_files, iter_local_files
+from jobs import Job, JobCancelled
+from parsing import BULK_PARSE_BATCH_SIZE
+from uploads import get_upload_concurrency
+from workspace import get_workspace_client
+
+logger = logging.getLogger("ingest")
+
+
+def record_line(record):
+    """One JSONL line for a file record; the elements DataFrame is serialised by pandas"""
+    elements = record.pop("elements")
+    line = json.dumps(record)
+    if elements is None:
+        return line[:-1] + ', "elements": null}\n'
+    # Splice pandas' JSON in directly rather than round-tripping every element through dicts
+    return line[:-1] + ', "elements": ' + elements.to_json(orient="records") + "}\n"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="Local directory to ingest (walked recursively)")
+    parser.add_argument("volume", help="Destination volume as catalog.schema.volume_name")
+    parser.add_argument("--subfolder", default="", help="Folder inside the volume to upload into")
+    parser.add_argument("--glob", help="Only ingest file names matching this pattern, e.g. '*.pdf'")
+    parser.add_argument("--output", help="Write JSONL here instead of stdout")
+    parser.add_argument("--concurrency", type=int, default=get_upload_concurrency(),
+                        help="Files uploaded at the same time (default: UPLOAD_CONCURRENCY)")
+    parser.add_argument("--parse-batch-size", type=int, default=BULK_PARSE_BATCH_SIZE,
+                        help="Files per bulk ai_parse_document statement")
+    parser.add_argument("--no-parse", action="store_true", help="Upload only")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="Skip files whose SHA-256 matches the one recorded when they were last uploaded "
+                             "(UPLOAD_MANIFEST_PATH or upload_manifest.json) and whose remote copy is unchanged since")
+    parser.add_argument("--size-only", action="store_true",
+                        help="With --skip-unchanged, compare sizes only instead of also requiring the recorded "
+                             "SHA-256 to match; an edited file of the same size is then skipped")
+    parser.add_argument("--table", default=get_results_table(),
+                        help="Also write parsed elements to this catalog.schema.table (default: RESULTS_TABLE)")
+    parser.add_argument("--parse-in-table", action="store_true",
+                        help="With --table, parse on the warehouse straight into the table instead of fetching results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING").upper(), stream=sys.stderr)
+
+    if not os.path.isdir(args.directory):
+        sys.exit(f"Not a directory: {args.directory}")
+    try:
+        volume_directory = get_volume_directory(args.volume, args.subfolder)
+        if args.table:
+            table_identifier(args.table)
+    except ValueError as e:
+        sys.exit(str(e))
+    if args.parse_in_table and not args.table:
+        sys.exit("--parse-in-table needs --table or RESULTS_TABLE")
+
+    workspace_client = get_workspace_client()
+    job = Job(job_id=uuid.uuid4().hex, kind="ingest", label=f"Ingest {args.directory} into {volume_directory}/")
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started = time.perf_counter()
+    counts = {"files": 0, "bytes": 0, "skipped": 0, "upload_errors": 0, "parse_errors": 0, "table_errors": 0}
+    sink = DeltaSink(workspace_client, args.table, should_cancel=lambda: job.cancel_requested) if args.table else None
+    records = ingest_files(
+        job,
+        workspace_client,
+        iter_local_files(args.directory, args.glob),
+        volume_directory,
+        concurrency=args.concurrency,
+        parse=not args.no_parse,
+        parse_batch_size=args.parse_batch_size,
+        skip_unchanged=args.skip_unchanged,
+        compare_hash=args.skip_unchanged and not args.size_only,
+        table_sink=sink if args.parse_in_table else None
+    )
+    try:
+        for record in records:
+            counts["files"] += 1
+            counts["skipped"] += record["skipped"]
+            counts["bytes"] += 0 if record["skipped"] else record["size"] or 0
+            counts["upload_errors"] += record["upload_error"] is not None
+            counts["parse_errors"] += record["parse_error"] is not None
+            if record["upload_error"] or record["parse_error"]:
+                logger.warning("%s: %s", record["file"], record["upload_error"] or record["parse_error"])
+            if sink is not None and record["elements"] is not None:
+                try:
+                    sink.add(record["file_path"], record["sha256"], record["elements"], record["parsed_by"])
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    counts["table_errors"] += 1
+                    logger.warning("Writing a batch to %s failed: %s", args.table, e)
+            out.write(record_line(record))
+            out.flush()
+        if sink is not None:
+            try:
+                sink.flush()
+            except Exception as e:
+                counts["table_errors"] += 1
+                logger.warning("Writing a batch to %s failed: %s", args.table, e)
+    except KeyboardInterrupt:
+        # Stop new uploads and cancel running statements, then let the workers wind down
+        job.cancel()
+        records.close()
+        print("Interrupted; in-flight work was cancelled", file=sys.stderr)
+        return 130
+    except JobCancelled:
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Ingested {counts['files']} files ({counts['bytes'] / (1024 * 1024):.1f} MB uploaded, "
+        f"{counts['skipped']} unchanged) in {elapsed:.1f}s; "
+        f"{counts['upload_errors']} upload errors, {counts['parse_errors']} parse errors",
+        file=sys.stderr
+    )
+    if sink is not None:
+        print(
+            f"Wrote {sink.stats['documents']} documents ({sink.stats['rows']} rows, "
+            f"{sink.stats['unchanged']} already up to date) to {args.table} in {sink.stats['statements']} statements; "
+            f"{counts['table_errors']} failed batches",
+            file=sys.stderr
+        )
+    return 1 if counts["upload_errors"] or counts["parse_errors"] or counts["table_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
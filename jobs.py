@@ -0,0 +1,231 @@
+"""Background job queue that keeps uploads and parses running across Streamlit reruns"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from admission import AdmissionCancelled, admission_scope
+from config import env_int
+from telemetry import recording, span
+
+# Jobs run at the same time across all sessions of the process
+DEFAULT_JOB_WORKERS = 4
+
+# Seconds a finished job stays in the registry for its session to render it
+DEFAULT_JOB_RETENTION = 60 * 60
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+SUCCEEDED = "SUCCEEDED"
+FAILED = "FAILED"
+CANCELED = "CANCELED"
+
+JOB_TERMINAL_STATES = {SUCCEEDED, FAILED, CANCELED}
+
+
+def get_job_workers():
+    """Return the size of the background worker pool from JOB_WORKERS (default 4)"""
+    return env_int("JOB_WORKERS", DEFAULT_JOB_WORKERS)
+
+
+def get_job_retention():
+    """Return how long (seconds) finished jobs are kept from JOB_RETENTION_MINUTES (default 60)"""
+    return env_int("JOB_RETENTION_MINUTES", DEFAULT_JOB_RETENTION, scale=60)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when its job has been cancelled"""
+
+
+@dataclass
+class Job:
+    """One unit of background work and everything the UI needs to render it"""
+    job_id: str
+    kind: str
+    label: str
+    owner: Optional[str] = None
+    state: str = QUEUED
+    progress: float = 0.0
+    message: str = ""
+    detail: Dict[str, Any] = field(default_factory=dict)
+    spans: List[Dict[str, Any]] = field(default_factory=list)
+    result: Any = None
+    error: Optional[str] = None
+    error_type: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def done(self):
+        return self.state in JOB_TERMINAL_STATES
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def update(self, progress=None, message=None):
+        """Report progress (0..1) and a status line from inside the job function"""
+        if progress is not None:
+            self.progress = max(0.0, min(float(progress), 1.0))
+        if message is not None:
+            self.message = message
+
+    def cancel(self):
+        """Ask the job function to stop at its next check"""
+        self._cancel_event.set()
+
+    def report_queue_position(self, position):
+        """Record the job's place in a warehouse admission queue (None once admitted)"""
+        self.detail["queue_position"] = position
+        if position is not None:
+            self.update(message=f"Waiting for a SQL warehouse slot (position {position} in queue)")
+
+    def check_cancelled(self):
+        """Stop the job function at a safe point if cancellation was requested"""
+        if self.cancel_requested:
+            raise JobCancelled(f"{self.label} was cancelled")
+
+
+class JobRegistry:
+    """Thread pool plus a registry of jobs keyed by job id.
+
+    Job functions are called as fn(job, *args, **kwargs) on a worker thread and
+    must not touch Streamlit; they report through job.update() and job.detail
+    and return their result. The registry outlives script reruns, so a page
+    only needs to remember job ids (or its owner id) and poll job.state.
+    """
+
+    def __init__(self, max_workers=None, retention=None):
+        self.retention = retention if retention is not None else get_job_retention()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or get_job_workers(), thread_name_prefix="job")
+        self._jobs = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, kind="job", label="", owner=None, **kwargs):
+        """Queue fn(job, *args, **kwargs) and return its Job immediately"""
+        job = Job(job_id=uuid.uuid4().hex, kind=kind, label=label or kind, owner=owner)
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+            self._futures[job.job_id] = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job.state = CANCELED
+            job.finished_at = time.time()
+            return
+        job.state = RUNNING
+        job.started_at = time.time()
+        try:
+            # Every timing span of the job, including its pool threads, lands in job.spans;
+            # its statements queue for warehouse slots as its owner
+            with recording(job.spans), admission_scope(job.owner, job.report_queue_position), \
+                    span(f"job.{job.kind}", job_id=job.job_id, label=job.label):
+                job.result = fn(job, *args, **kwargs)
+            job.progress = 1.0
+            job.state = SUCCEEDED
+        except (JobCancelled, AdmissionCancelled) as e:
+            job.error = str(e)
+            job.state = CANCELED
+        except Exception as e:
+            job.error = str(e)
+            job.error_type = type(e).__name__
+            job.state = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, owner):
+        """Jobs submitted by one owner (e.g. a browser session), oldest first"""
+        with self._lock:
+            return sorted(
+                (job for job in self._jobs.values() if job.owner == owner),
+                key=lambda job: job.submitted_at
+            )
+
+    def active(self, owner=None):
+        """Jobs that are still queued or running, optionally for one owner"""
+        with self._lock:
+            return [
+                job for job in self._jobs.values()
+                if not job.done and (owner is None or job.owner == owner)
+            ]
+
+    def cancel(self, job_id):
+        """Request cancellation; a queued job never starts, a running one stops at its next check"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            future = self._futures.get(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel()
+        if future is not None and future.cancel():
+            job.state = CANCELED
+            job.finished_at = time.time()
+        return True
+
+    def forget(self, job_id):
+        """Drop a finished job from the registry"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.done:
+                del self._jobs[job_id]
+                self._futures.pop(job_id, None)
+                return True
+        return False
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job finishes (for scripts and headless use) and return it"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+        return self.get(job_id)
+
+    def _prune(self):
+        """Forget jobs that finished more than `retention` seconds ago (caller holds the lock)"""
+        cutoff = time.time() - self.retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._futures.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        for job in self.active():
+            self.cancel(job.job_id)
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_job_registry():
+    """Return the process-wide job registry shared by every session"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = JobRegistry()
+    return _registry
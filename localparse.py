@@ -0,0 +1,346 @@
+"""Offline fast path for text-native PDFs, with ai_parse_document as the fallback for scanned documents"""
+import importlib.util
+import io
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from config import env_int
+from parse_cache import cache_key, get_parse_cache
+from telemetry import span
+
+# pypdf powers the local text-layer extractor; it is imported on first use to keep app startup fast
+PYPDF_AVAILABLE = importlib.util.find_spec("pypdf") is not None
+
+logger = logging.getLogger(__name__)
+
+# Cache namespace of locally extracted results, separate from warehouse parses
+LOCAL_PARSER_VERSION = "local-pypdf-v2"
+
+# A page with fewer extracted characters than this is treated as image-only
+DEFAULT_MIN_PAGE_CHARS = 32
+
+# Share of pages that must have a text layer for the whole document to stay local
+DEFAULT_MIN_TEXT_PAGE_RATIO = 0.9
+
+# Documents with fewer pages are extracted in-process; the pool only pays off above this
+POOL_MIN_PAGES = 8
+
+
+def local_parse_enabled():
+    """Whether the local PDF fast path is on (LOCAL_PDF_PARSE, default on) and pypdf is installed"""
+    return PYPDF_AVAILABLE and os.environ.get("LOCAL_PDF_PARSE", "1").lower() not in ("0", "false", "no")
+
+
+def get_local_parse_workers():
+    """Return the number of extractor processes from LOCAL_PARSE_WORKERS (default: CPU count, at most 4)"""
+    return env_int("LOCAL_PARSE_WORKERS", min(os.cpu_count() or 1, 4))
+
+
+@dataclass
+class LocalParseDecision:
+    """Why a document was (or was not) parsed locally"""
+    local: bool
+    reason: str
+    page_count: int = 0
+    text_pages: int = 0
+
+
+def _fragment_position(cm, tm, font_size):
+    """Device-space origin and effective size of a text fragment from its text and transform matrices"""
+    x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+    y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+    scale = (abs(tm[3]) or 1.0) * (abs(cm[3]) or 1.0)
+    return x, y, max(font_size * scale, 1.0)
+
+
+def _page_lines(page):
+    """Text fragments of one page grouped into (text, x0, y0, x1, y1, size) lines, top-left origin"""
+    fragments = []
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        if text and text.strip():
+            x, y, size = _fragment_position(cm, tm, font_size)
+            fragments.append((x, y, size, text))
+
+    page.extract_text(visitor_text=visitor)
+    height = float(page.mediabox.height)
+
+    lines = []
+    for x, y, size, text in sorted(fragments, key=lambda f: (-f[1], f[0])):
+        if lines and abs(lines[-1]["y"] - y) <= lines[-1]["size"] * 0.5:
+            line = lines[-1]
+            separator = "" if line["text"].endswith(" ") or text.startswith(" ") else " "
+            line["text"] += separator + text
+            line["x1"] = max(line["x1"], x + len(text) * size * 0.5)
+            continue
+        lines.append({"text": text, "x0": x, "x1": x + len(text) * size * 0.5, "y": y, "size": size})
+
+    return [
+        (line["text"].strip(), line["x0"], height - line["y"] - line["size"], line["x1"], height - line["y"], line["size"])
+        for line in lines
+    ]
+
+
+def _extract_page_range(data, start, end):
+    """Worker: extract lines and page sizes for pages [start, end) of a PDF given as bytes"""
+    import pypdf
+
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    pages = []
+    for index in range(start, min(end, len(reader.pages))):
+        page = reader.pages[index]
+        pages.append({
+            "page_id": index,
+            "width": float(page.mediabox.width),
+            "height": float(page.mediabox.height),
+            "lines": _page_lines(page),
+        })
+    return pages
+
+
+def _page_elements(page, title_size):
+    """Merge a page's lines into text blocks separated by vertical gaps; large lines become titles"""
+    blocks = []
+    for text, x0, y0, x1, y1, size in page["lines"]:
+        kind = "title" if size >= title_size else "text"
+        block = blocks[-1] if blocks else None
+        if block and block["type"] == kind == "text" and y0 - block["y1"] <= size * 0.8:
+            block["content"] += "\n" + text
+            block["x0"], block["x1"], block["y1"] = min(block["x0"], x0), max(block["x1"], x1), y1
+            continue
+        blocks.append({"type": kind, "content": text, "x0": x0, "y0": y0, "x1": x1, "y1": y1})
+    return blocks
+
+
+def build_parsed_document(pages):
+    """Lay extracted pages out like ai_parse_document output so the usual flattening applies"""
+    sizes = [line[5] for page in pages for line in page["lines"]]
+    title_size = statistics.median(sizes) * 1.3 if sizes else float("inf")
+
+    elements = []
+    for page in pages:
+        for block in _page_elements(page, title_size):
+            elements.append({
+                "id": len(elements),
+                "type": block["type"],
+                "content": block["content"],
+                "bbox": [{
+                    "page_id": page["page_id"],
+                    "coord": [round(block["x0"], 2), round(block["y0"], 2), round(block["x1"], 2), round(block["y1"], 2)],
+                }],
+            })
+
+    return {
+        "document": {
+            "pages": [{"id": page["page_id"], "width": page["width"], "height": page["height"]} for page in pages],
+            "elements": elements,
+        },
+        "metadata": {"parser": LOCAL_PARSER_VERSION},
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_extract_pool():
+    """Return the process-wide extractor pool (spawned, so it is safe next to the app's threads)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=get_local_parse_workers(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def _reset_extract_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pages(data, workers=None):
+    """Extract every page of a PDF, spreading page ranges over the process pool for long documents"""
+    import pypdf
+
+    page_count = len(pypdf.PdfReader(io.BytesIO(data)).pages)
+    workers = workers or get_local_parse_workers()
+    if page_count < POOL_MIN_PAGES or workers <= 1:
+        return _extract_page_range(data, 0, page_count), page_count
+
+    step = -(-page_count // workers)
+    try:
+        futures = [
+            get_extract_pool().submit(_extract_page_range, data, start, start + step)
+            for start in range(0, page_count, step)
+        ]
+        return [page for future in futures for page in future.result()], page_count
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); rebuild the pool next time and finish in-process
+        logger.warning("Local PDF extractor pool broke; extracting in-process")
+        _reset_extract_pool()
+        return _extract_page_range(data, 0, page_count), page_count
+
+
+def read_bytes(source):
+    """Whole contents of bytes or a binary file object, leaving its position unchanged"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    position = source.tell()
+    source.seek(0)
+    data = source.read()
+    source.seek(position)
+    return data
+
+
+def parse_pdf_locally(source, file_name="", file_hash=None, min_page_chars=DEFAULT_MIN_PAGE_CHARS,
+                      min_text_ratio=DEFAULT_MIN_TEXT_PAGE_RATIO, workers=None):
+    """Extract a text-native PDF in-process; returns (parsed_content, LocalParseDecision).
+
+    parsed_content is JSON text in the ai_parse_document layout, or None when
+    the document should go to the warehouse instead (scanned or image-only
+    pages, unreadable file, pypdf missing). Every decision is logged.
+    """
+    with span("parse.local_pdf", file_name=file_name) as local_span:
+        parsed_content, decision = _parse_pdf_locally(source, file_name, file_hash, min_page_chars, min_text_ratio, workers)
+        local_span.set(
+            local=decision.local,
+            pages=decision.page_count,
+            text_pages=decision.text_pages,
+            reason=decision.reason
+        )
+        return parsed_content, decision
+
+
+def parse_pdfs_locally(documents, min_page_chars=DEFAULT_MIN_PAGE_CHARS, min_text_ratio=DEFAULT_MIN_TEXT_PAGE_RATIO,
+                       workers=None):
+    """Extract a batch of PDFs at once; documents is a list of (source, file_name, file_hash).
+
+    Returns a (parsed_content, LocalParseDecision) pair per document, in
+    order, as parse_pdf_locally would. The page ranges of every document are
+    submitted to the extractor pool together, so short PDFs are extracted
+    side by side instead of one after another in the calling thread.
+    """
+    workers = workers or get_local_parse_workers()
+    if len(documents) <= 1 or workers <= 1 or not local_parse_enabled():
+        return [
+            parse_pdf_locally(source, file_name, file_hash, min_page_chars, min_text_ratio, workers)
+            for source, file_name, file_hash in documents
+        ]
+
+    import pypdf
+
+    with span("parse.local_pdf", documents=len(documents)) as local_span:
+        results = [None] * len(documents)
+        extracting = {}
+        for index, (source, file_name, file_hash) in enumerate(documents):
+            key, results[index] = _cached_local_parse(file_name, file_hash)
+            if results[index] is not None:
+                continue
+            try:
+                data = read_bytes(source)
+                page_count = len(pypdf.PdfReader(io.BytesIO(data)).pages)
+                step = page_count if page_count < POOL_MIN_PAGES else -(-page_count // workers)
+                futures = [
+                    get_extract_pool().submit(_extract_page_range, data, start, start + step)
+                    for start in range(0, page_count, max(step, 1))
+                ]
+            except BrokenProcessPool:
+                _reset_extract_pool()
+                futures = None
+            except Exception as e:
+                results[index] = _unreadable(file_name, e)
+                continue
+            extracting[index] = (key, data, page_count, futures)
+
+        for index, (key, data, page_count, futures) in extracting.items():
+            file_name = documents[index][1]
+            try:
+                if futures is not None:
+                    try:
+                        pages = [page for future in futures for page in future.result()]
+                    except BrokenProcessPool:
+                        # A worker died (e.g. killed for memory); rebuild the pool next time and finish in-process
+                        logger.warning("Local PDF extractor pool broke; extracting %s in-process", file_name)
+                        _reset_extract_pool()
+                        futures = None
+                if futures is None:
+                    pages = _extract_page_range(data, 0, page_count)
+            except Exception as e:
+                results[index] = _unreadable(file_name, e)
+                continue
+            results[index] = _decide(file_name, key, pages, page_count, min_page_chars, min_text_ratio)
+
+        local_span.set(local=sum(1 for _, decision in results if decision.local))
+        return results
+
+
+def _cached_local_parse(file_name, file_hash):
+    """Return (cache key, result) where result is set when no extraction is needed (disabled or cached)"""
+    if not local_parse_enabled():
+        decision = LocalParseDecision(False, "local PDF parsing disabled or pypdf not installed")
+        logger.info("Parse %s on the warehouse: %s", file_name, decision.reason)
+        return None, (None, decision)
+
+    key = cache_key(file_hash, LOCAL_PARSER_VERSION) if file_hash else None
+    if key:
+        cached, _ = get_parse_cache().get(key)
+        if cached is not None:
+            decision = LocalParseDecision(True, "local parse cached for this content")
+            logger.info("Parse %s locally: %s", file_name, decision.reason)
+            return key, (cached, decision)
+    return key, None
+
+
+def _unreadable(file_name, error):
+    decision = LocalParseDecision(False, f"could not read PDF locally ({error})")
+    logger.info("Parse %s on the warehouse: %s", file_name, decision.reason)
+    return None, decision
+
+
+def _parse_pdf_locally(source, file_name, file_hash, min_page_chars, min_text_ratio, workers):
+    key, result = _cached_local_parse(file_name, file_hash)
+    if result is not None:
+        return result
+
+    try:
+        pages, page_count = extract_pages(read_bytes(source), workers=workers)
+    except Exception as e:
+        return _unreadable(file_name, e)
+    return _decide(file_name, key, pages, page_count, min_page_chars, min_text_ratio)
+
+
+def _decide(file_name, key, pages, page_count, min_page_chars, min_text_ratio):
+    """Keep a document local when enough pages have a text layer, caching the built result"""
+    text_pages = sum(1 for page in pages if sum(len(line[0]) for line in page["lines"]) >= min_page_chars)
+    if page_count == 0 or text_pages / page_count < min_text_ratio:
+        decision = LocalParseDecision(
+            False,
+            f"only {text_pages} of {page_count} pages have a text layer (scanned or image-only)",
+            page_count,
+            text_pages
+        )
+        logger.info("Parse %s on the warehouse: %s", file_name, decision.reason)
+        return None, decision
+
+    decision = LocalParseDecision(True, f"text layer on {text_pages} of {page_count} pages", page_count, text_pages)
+    logger.info("Parse %s locally: %s", file_name, decision.reason)
+
+    parsed_content = json.dumps(build_parsed_document(pages))
+    if key:
+        get_parse_cache().put(key, parsed_content, "local")
+    return parsed_content, decision
@@ -0,0 +1,165 @@
+"""Content-hash keyed cache for ai_parse_document results"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from config import env_int
+
+# Bump when the parse query or result handling changes so stale entries are ignored
+PARSER_VERSION = "ai_parse_document-v2"
+
+# Default size of the in-memory tier
+DEFAULT_CACHE_MAX_MB = 256
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def content_hash(source):
+    """SHA-256 hex digest of a binary file object or bytes, without copying the whole file"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+        return digest.hexdigest()
+
+    if hasattr(source, "getbuffer"):
+        with source.getbuffer() as view:
+            for offset in range(0, len(view), _HASH_BLOCK_SIZE):
+                digest.update(view[offset:offset + _HASH_BLOCK_SIZE])
+        return digest.hexdigest()
+
+    position = source.tell()
+    source.seek(0)
+    for block in iter(lambda: source.read(_HASH_BLOCK_SIZE), b""):
+        digest.update(block)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+def cache_key(file_hash, parser_version=PARSER_VERSION):
+    """Cache key for a file hash under a parser version"""
+    return f"{file_hash}-{parser_version}"
+
+
+class ParseCache:
+    """Two-tier cache of raw parse output keyed by cache_key().
+
+    Each entry records the parser that produced it ("warehouse" or "local"),
+    so a hit reports the same parsed_by as the original parse. The memory
+    tier is an LRU bounded by the total size of the cached strings; the
+    optional directory tier keeps every entry on disk (parser on the first
+    line, content after it) so results survive restarts and are shared
+    between app processes on the same host.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def memory_bytes(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key, content, parsed_by):
+        """Insert into the memory tier and evict least recently used entries over budget"""
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+        self._entries[key] = (content, size, parsed_by)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+    def get(self, key):
+        """Return (parse output, parsed_by) cached for key, or (None, None) on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[2]
+
+        content = parsed_by = None
+        if self.directory:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    parsed_by = f.readline().rstrip("\n")
+                    content = f.read()
+            except OSError:
+                content = parsed_by = None
+
+        with self._lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, content, parsed_by)
+        return content, parsed_by
+
+    def put(self, key, content, parsed_by):
+        """Store parse output for key, produced by parsed_by, in memory and, if configured, on disk"""
+        with self._lock:
+            self._remember(key, content, parsed_by)
+
+        if self.directory:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write atomically so concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(f"{parsed_by}\n")
+                    f.write(content)
+                os.replace(tmp_path, path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def stats(self):
+        """Hit/miss counters and memory usage"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "memory_bytes": self._size,
+            }
+
+
+def get_parse_cache_size():
+    """Return the memory tier budget in bytes from PARSE_CACHE_MAX_MB (default 256)"""
+    return env_int("PARSE_CACHE_MAX_MB", DEFAULT_CACHE_MAX_MB * 1024 * 1024, scale=1024 * 1024)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_parse_cache():
+    """Return the process-wide parse cache configured from PARSE_CACHE_MAX_MB / PARSE_CACHE_DIR"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ParseCache(
+                    max_bytes=get_parse_cache_size(),
+                    directory=os.environ.get("PARSE_CACHE_DIR") or None
+                )
+    return _cache
@@ -0,0 +1,394 @@
+"""Databricks ai_parse_document execution helpers"""
+import json
+import os
+import time
+
+from admission import AdmissionCancelled, admit
+from flatten import flatten_parsed_document
+from parse_cache import cache_key, get_parse_cache
+from results import iter_result_rows, result_request_options
+from routing import get_pending_timeout, get_router, get_warehouse_ids
+from telemetry import span
+
+# Polling backoff for running parse statements (seconds)
+POLL_INITIAL_DELAY = 0.5
+POLL_MAX_DELAY = 5.0
+
+# Statement states that will not change any more
+TERMINAL_STATES = ("SUCCEEDED", "FAILED", "CANCELED", "CLOSED")
+
+# Maximum number of files parsed by one bulk statement
+BULK_PARSE_BATCH_SIZE = 100
+
+
+def get_warehouse_id():
+    """Return the first configured SQL Warehouse ID, or None when none is set (see routing.get_warehouse_ids)"""
+    warehouse_ids = get_warehouse_ids()
+    return warehouse_ids[0] if warehouse_ids else None
+
+
+def sql_string(value):
+    """Quote a Python string as a Databricks SQL string literal"""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def build_parse_query(file_path):
+    """Build the ai_parse_document query for one file in a Unity Catalog volume"""
+    # Use read_files to read the binary content directly from Unity Catalog volume
+    return f"""
+        SELECT ai_parse_document(content) as parsed_content
+        FROM read_files({sql_string(file_path)})
+        """
+
+
+def build_bulk_parse_query(file_paths):
+    """Build one ai_parse_document query over a list of volume files, returning a row per file"""
+    sources = "\n            UNION ALL\n".join(
+        f"            SELECT path, content FROM read_files({sql_string(file_path)}, format => 'binaryFile')"
+        for file_path in file_paths
+    )
+    return f"""
+        SELECT path, ai_parse_document(content) as parsed_content
+        FROM (
+{sources}
+        )
+        """
+
+
+def normalize_volume_path(path):
+    """Strip the dbfs: scheme read_files adds to paths so they match /Volumes/... upload paths"""
+    if path and path.startswith("dbfs:"):
+        return path[len("dbfs:"):]
+    return path
+
+
+def statement_state(statement):
+    """Return the state name (e.g. 'RUNNING') of a statement response"""
+    if statement is None or statement.status is None or statement.status.state is None:
+        return None
+    return statement.status.state.value
+
+
+def statement_error(statement):
+    """Return the error message of a failed statement response"""
+    if statement.status and statement.status.error and statement.status.error.message:
+        return statement.status.error.message
+    return "Unknown error"
+
+
+def next_poll_delay(attempt, initial_delay=POLL_INITIAL_DELAY, max_delay=POLL_MAX_DELAY):
+    """Exponential backoff delay before poll number `attempt` (0-based)"""
+    return min(initial_delay * (2 ** attempt), max_delay)
+
+
+def submit_statement(workspace_client, query, warehouse_id):
+    """Start a SQL statement without waiting and return the statement response"""
+    from databricks.sdk.service.sql import ExecuteStatementRequestOnWaitTimeout
+
+    with span("sql.execute_statement", warehouse_id=warehouse_id) as submit_span:
+        statement = workspace_client.statement_execution.execute_statement(
+            warehouse_id=warehouse_id,
+            statement=query,
+            wait_timeout="0s",
+            on_wait_timeout=ExecuteStatementRequestOnWaitTimeout.CONTINUE,
+            **result_request_options()
+        )
+        submit_span.set(statement_id=statement.statement_id)
+        return statement
+
+
+def poll_statement(workspace_client, statement_id):
+    """Fetch the current status (and result, once finished) of a statement"""
+    return workspace_client.statement_execution.get_statement(statement_id)
+
+
+def cancel_statement(workspace_client, statement_id):
+    """Ask the warehouse to cancel a running statement"""
+    workspace_client.statement_execution.cancel_execution(statement_id)
+
+
+def wait_for_statement(workspace_client, statement, timeout=None,
+                       initial_delay=POLL_INITIAL_DELAY, max_delay=POLL_MAX_DELAY, should_cancel=None,
+                       pending_timeout=None):
+    """Poll a submitted statement with backoff until it reaches a terminal state.
+
+    If timeout (seconds) elapses first, the statement is still PENDING after
+    pending_timeout, or should_cancel() returns True, the statement is
+    cancelled and the last response is returned. The sql.wait span splits
+    the wait into time seen PENDING (queued) and RUNNING.
+    """
+    started = time.monotonic()
+    attempt = 0
+    state_ms = {}
+    with span("sql.wait", statement_id=statement.statement_id) as wait_span:
+        observed_state, observed_at = statement_state(statement), started
+        while statement_state(statement) not in TERMINAL_STATES:
+            waited = time.monotonic() - started
+            timed_out = timeout is not None and waited >= timeout
+            if pending_timeout is not None and statement_state(statement) == "PENDING" and waited >= pending_timeout:
+                timed_out = True
+            if timed_out or (should_cancel is not None and should_cancel()):
+                cancel_statement(workspace_client, statement.statement_id)
+                statement = poll_statement(workspace_client, statement.statement_id)
+                break
+            time.sleep(next_poll_delay(attempt, initial_delay, max_delay))
+            attempt += 1
+            statement = poll_statement(workspace_client, statement.statement_id)
+
+            now = time.monotonic()
+            state_ms[observed_state] = state_ms.get(observed_state, 0.0) + (now - observed_at) * 1000
+            observed_state, observed_at = statement_state(statement), now
+
+        wait_span.set(
+            state=statement_state(statement),
+            polls=attempt,
+            pending_ms=round(state_ms.get("PENDING", 0.0), 3),
+            running_ms=round(state_ms.get("RUNNING", 0.0), 3)
+        )
+    return statement
+
+
+def run_statement(workspace_client, query, timeout=None, should_cancel=None, on_submitted=None):
+    """Run a statement on the best configured warehouse and wait for it, failing over on errors and timeouts.
+
+    routing.WarehouseRouter picks the warehouse; each attempt holds one of
+    its admission slots. A submit error, a timeout or a statement stuck
+    PENDING for WAREHOUSE_PENDING_TIMEOUT_SECONDS (only while another
+    warehouse is left to try) moves on to the next warehouse; a FAILED
+    statement is returned as is. Each attempt is an sql.route span recording the choice and
+    the candidates it was picked from. on_submitted(statement, warehouse_id)
+    is called after each submit. Returns the last statement response;
+    raises the last error if no attempt got as far as a statement.
+    """
+    router = get_router()
+    warehouse_ids = get_warehouse_ids()
+    tried = []
+    statement = None
+    error = None
+    while True:
+        warehouse_id, candidates = router.choose(workspace_client, warehouse_ids, exclude=tried)
+        if warehouse_id is None:
+            break
+        with span(
+            "sql.route",
+            warehouse_id=warehouse_id,
+            attempt=len(tried) + 1,
+            failed_over_from=tried[-1] if tried else None,
+            candidates=candidates
+        ) as route_span:
+            tried.append(warehouse_id)
+            pending_timeout = get_pending_timeout() if len(tried) < len(warehouse_ids) else None
+            try:
+                with admit(warehouse_id, should_cancel=should_cancel):
+                    started = time.monotonic()
+                    statement = submit_statement(workspace_client, query, warehouse_id)
+                    if on_submitted is not None:
+                        on_submitted(statement, warehouse_id)
+                    statement = wait_for_statement(
+                        workspace_client,
+                        statement,
+                        timeout=timeout,
+                        should_cancel=should_cancel,
+                        pending_timeout=pending_timeout
+                    )
+            except AdmissionCancelled:
+                raise
+            except Exception as e:
+                error, statement = e, None
+                router.record_failure(warehouse_id, str(e), cooldown=True)
+                route_span.set(outcome="error", error=str(e))
+                continue
+
+            state = statement_state(statement)
+            if state == "SUCCEEDED":
+                router.record_success(warehouse_id, time.monotonic() - started)
+                route_span.set(outcome=state)
+                return statement
+            if should_cancel is not None and should_cancel():
+                route_span.set(outcome="cancelled")
+                return statement
+
+            if state == "FAILED":
+                # The statement ran and failed, most likely on the document itself; another warehouse would fail it too
+                router.record_failure(warehouse_id, statement_error(statement))
+                route_span.set(outcome=state)
+                return statement
+
+            router.record_failure(warehouse_id, "timed out", cooldown=True)
+            route_span.set(outcome="timeout")
+
+    if statement is not None:
+        return statement
+    raise error or RuntimeError("SQL Warehouse ID not configured. Please set DATABRICKS_WAREHOUSE_ID environment variable.")
+
+
+def parsed_content_to_dataframe(parsed_content):
+    """Convert one ai_parse_document value into a DataFrame for display.
+
+    Standard ai_parse_document output becomes the typed, one-row-per-element
+    table from flatten.flatten_parsed_document; anything else keeps the
+    generic JSON / plain text handling.
+    """
+    content_chars = len(parsed_content) if isinstance(parsed_content, str) else None
+    with span("parse.to_dataframe", content_chars=content_chars) as convert_span:
+        df = _content_to_dataframe(parsed_content)
+        convert_span.set(rows=len(df))
+        return df
+
+
+def _content_to_dataframe(parsed_content):
+    import pandas as pd
+
+    try:
+        document = flatten_parsed_document(parsed_content)
+        if document is not None:
+            return document.elements
+
+        if isinstance(parsed_content, str):
+            # Try to parse as JSON first
+            try:
+                parsed_json = json.loads(parsed_content)
+                # If it's a list of dicts, create dataframe
+                if isinstance(parsed_json, list):
+                    return pd.DataFrame(parsed_json)
+                elif isinstance(parsed_json, dict):
+                    return pd.DataFrame([parsed_json])
+                else:
+                    # Plain text - split by lines
+                    lines = parsed_content.split('\n')
+                    return pd.DataFrame({'Content': lines})
+            except json.JSONDecodeError:
+                # Not JSON, treat as plain text
+                lines = parsed_content.split('\n')
+                return pd.DataFrame({'Content': lines})
+        else:
+            # If it's already structured, convert to dataframe
+            return pd.DataFrame([parsed_content])
+    except Exception:
+        # Fallback: return as single column dataframe
+        return pd.DataFrame({'Parsed_Text': [str(parsed_content)]})
+
+
+def statement_content(statement, workspace_client):
+    """Return (parsed_content, error) from a finished single-file parse statement"""
+    state = statement_state(statement)
+    if state != "SUCCEEDED":
+        if state == "CANCELED":
+            return None, "Document parsing was cancelled"
+        return None, f"SQL execution failed: {statement_error(statement)}"
+
+    # Extract parsed content from first row (inline or downloaded from external links)
+    with span("sql.fetch_result", statement_id=statement.statement_id):
+        first_row = next(iter(iter_result_rows(workspace_client, statement)), None)
+    if first_row is None:
+        return None, "Query returned no results"
+
+    parsed_content = first_row[0] if first_row else None
+    if not parsed_content:
+        return None, "No content returned from ai_parse_document"
+
+    return parsed_content, None
+
+
+def parse_document_with_ai(file_path, workspace_client, timeout=None, file_hash=None, should_cancel=None):
+    """Parse document using Databricks AI parse_document function via SQL Execution API.
+
+    Blocks until the statement finishes (or timeout seconds pass) and returns
+    (DataFrame, error). When file_hash (see parse_cache.content_hash) is given,
+    a cached result for the same content is returned without touching the
+    warehouse. should_cancel() is checked between polls so a background job
+    can stop the statement.
+    """
+    with span("parse_document_with_ai", file_path=file_path):
+        try:
+            cache = get_parse_cache()
+            key = cache_key(file_hash) if file_hash else None
+            if key:
+                cached, _ = cache.get(key)
+                if cached is not None:
+                    return parsed_content_to_dataframe(cached), None
+
+            if not get_warehouse_id():
+                return None, "SQL Warehouse ID not configured. Please set DATABRICKS_WAREHOUSE_ID environment variable."
+
+            statement = run_statement(
+                workspace_client,
+                build_parse_query(file_path),
+                timeout=timeout,
+                should_cancel=should_cancel
+            )
+            parsed_content, error = statement_content(statement, workspace_client)
+            if error:
+                return None, error
+
+            if key and isinstance(parsed_content, str):
+                cache.put(key, parsed_content, "warehouse")
+            return parsed_content_to_dataframe(parsed_content), None
+
+        except Exception as e:
+            return None, str(e)
+
+
+def _run_bulk_parse(workspace_client, query, timeout, should_cancel=None):
+    """Run one bulk parse statement and return {path: parsed_content}"""
+    statement = run_statement(workspace_client, query, timeout=timeout, should_cancel=should_cancel)
+    if statement_state(statement) != "SUCCEEDED":
+        raise RuntimeError(statement_content(statement, workspace_client)[1])
+    with span("sql.fetch_result", statement_id=statement.statement_id) as fetch_span:
+        rows = {
+            normalize_volume_path(row[0]): row[1]
+            for row in iter_result_rows(workspace_client, statement)
+        }
+        fetch_span.set(rows=len(rows))
+        return rows
+
+
+def parse_documents_bulk(workspace_client, file_paths, batch_size=BULK_PARSE_BATCH_SIZE, timeout=None,
+                         file_hashes=None, should_cancel=None):
+    """Parse many volume files with one ai_parse_document statement per batch of paths.
+
+    Returns {file_path: (parsed_content, error)} for every requested path, so
+    results can be fanned back out to the individual uploads. file_hashes
+    ({file_path: sha256}) lets cached documents skip the warehouse entirely
+    and stores fresh results in the parse cache.
+    """
+    file_hashes = file_hashes or {}
+    cache = get_parse_cache()
+    results = {}
+
+    pending = []
+    for file_path in dict.fromkeys(file_paths):
+        file_hash = file_hashes.get(file_path)
+        cached, _ = cache.get(cache_key(file_hash)) if file_hash else (None, None)
+        if cached is not None:
+            results[file_path] = (cached, None)
+        else:
+            pending.append(file_path)
+
+    if not pending:
+        return results
+
+    if not get_warehouse_id():
+        error = "SQL Warehouse ID not configured. Please set DATABRICKS_WAREHOUSE_ID environment variable."
+        results.update({file_path: (None, error) for file_path in pending})
+        return results
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        try:
+            rows = _run_bulk_parse(workspace_client, build_bulk_parse_query(batch), timeout, should_cancel)
+        except Exception as e:
+            results.update({file_path: (None, str(e)) for file_path in batch})
+            continue
+
+        for file_path in batch:
+            parsed_content = rows.get(file_path)
+            if not parsed_content:
+                results[file_path] = (None, "No content returned from ai_parse_document")
+                continue
+            results[file_path] = (parsed_content, None)
+            file_hash = file_hashes.get(file_path)
+            if file_hash and isinstance(parsed_content, str):
+                cache.put(cache_key(file_hash), parsed_content, "warehouse")
+
+    return results
@@ -0,0 +1,148 @@
+"""Statement result retrieval for inline and external-link (Arrow) result dispositions"""
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import env_int
+from telemetry import span, submit_in_context
+
+# Number of result chunks downloaded ahead of the one being consumed
+DEFAULT_FETCH_WORKERS = 4
+
+# Seconds to wait for one presigned chunk download
+CHUNK_DOWNLOAD_TIMEOUT = 300
+
+
+def get_result_disposition():
+    """Return INLINE or EXTERNAL_LINKS from PARSE_RESULT_DISPOSITION (default EXTERNAL_LINKS)"""
+    disposition = (os.environ.get("PARSE_RESULT_DISPOSITION") or "EXTERNAL_LINKS").upper()
+    return disposition if disposition in ("INLINE", "EXTERNAL_LINKS") else "EXTERNAL_LINKS"
+
+
+def get_fetch_workers():
+    """Return how many result chunks are fetched in parallel from PARSE_RESULT_FETCH_WORKERS (default 4)"""
+    return env_int("PARSE_RESULT_FETCH_WORKERS", DEFAULT_FETCH_WORKERS)
+
+
+def result_request_options():
+    """execute_statement keyword arguments for the configured result disposition.
+
+    EXTERNAL_LINKS with ARROW_STREAM lifts the 25 MiB inline result limit, so
+    large documents come back complete instead of being truncated or failing.
+    """
+    from databricks.sdk.service.sql import Disposition, Format
+
+    if get_result_disposition() == "INLINE":
+        return {"disposition": Disposition.INLINE, "format": Format.JSON_ARRAY}
+    return {"disposition": Disposition.EXTERNAL_LINKS, "format": Format.ARROW_STREAM}
+
+
+def _is_external(statement):
+    result = statement.result
+    manifest = getattr(statement, "manifest", None)
+    if manifest is not None and manifest.format is not None and manifest.format.value == "ARROW_STREAM":
+        return True
+    return result is not None and bool(getattr(result, "external_links", None))
+
+
+def _chunk_link(workspace_client, statement_id, chunk_index):
+    """Ask for a fresh presigned link for one result chunk"""
+    chunk = workspace_client.statement_execution.get_statement_result_chunk_n(statement_id, chunk_index)
+    return chunk.external_links[0] if chunk.external_links else None
+
+
+def _download_chunk(workspace_client, statement_id, chunk_index, link):
+    """Download one Arrow IPC result chunk into a pyarrow Table, refreshing an expired link once"""
+    import pyarrow as pa
+    import requests
+
+    with span("sql.download_chunk", statement_id=statement_id, chunk_index=chunk_index) as chunk_span:
+        for attempt in range(2):
+            if link is None or attempt > 0:
+                link = _chunk_link(workspace_client, statement_id, chunk_index)
+            if link is None:
+                return None
+            # Presigned cloud storage URL: must not carry the Databricks Authorization header
+            response = requests.get(link.external_link, headers=link.http_headers or {}, timeout=CHUNK_DOWNLOAD_TIMEOUT)
+            if response.status_code in (403, 404) and attempt == 0:
+                continue
+            response.raise_for_status()
+            chunk_span.set(bytes=len(response.content), refreshed_link=attempt > 0)
+            return pa.ipc.open_stream(pa.py_buffer(response.content)).read_all()
+        return None
+
+
+def iter_arrow_tables(workspace_client, statement, max_workers=None):
+    """Yield result chunks of an EXTERNAL_LINKS statement as pyarrow Tables, in order.
+
+    Up to max_workers chunks are downloaded in parallel ahead of the consumer,
+    so memory stays proportional to that window rather than to the result.
+    """
+    max_workers = max_workers or get_fetch_workers()
+    manifest = getattr(statement, "manifest", None)
+    total_chunks = manifest.total_chunk_count if manifest and manifest.total_chunk_count is not None else None
+
+    first_links = {}
+    if statement.result and getattr(statement.result, "external_links", None):
+        for link in statement.result.external_links:
+            first_links[link.chunk_index] = link
+
+    if total_chunks is None:
+        # No manifest: walk the chain of links one chunk at a time
+        link = statement.result.external_links[0] if first_links else None
+        while link is not None:
+            table = _download_chunk(workspace_client, statement.statement_id, link.chunk_index, link)
+            if table is not None:
+                yield table
+            if link.next_chunk_index is None:
+                break
+            link = _chunk_link(workspace_client, statement.statement_id, link.next_chunk_index)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="result-chunk") as pool:
+        pending = deque()
+        next_index = 0
+        while next_index < total_chunks or pending:
+            while next_index < total_chunks and len(pending) < max_workers:
+                pending.append(submit_in_context(
+                    pool,
+                    _download_chunk,
+                    workspace_client,
+                    statement.statement_id,
+                    next_index,
+                    first_links.get(next_index)
+                ))
+                next_index += 1
+            table = pending.popleft().result()
+            if table is not None:
+                yield table
+
+
+def _arrow_value(value):
+    """Arrow struct/map/list values (e.g. a VARIANT decoded as struct) back to JSON text"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def iter_result_rows(workspace_client, statement, max_workers=None):
+    """Yield every row of a succeeded statement as a list, for inline or external-link results"""
+    if _is_external(statement):
+        for table in iter_arrow_tables(workspace_client, statement, max_workers=max_workers):
+            for batch in table.to_batches():
+                columns = [column.to_pylist() for column in batch.columns]
+                for row in zip(*columns):
+                    yield [_arrow_value(value) for value in row]
+        return
+
+    result = statement.result
+    while result is not None:
+        for row in result.data_array or []:
+            yield row
+        if result.next_chunk_index is None:
+            break
+        result = workspace_client.statement_execution.get_statement_result_chunk_n(
+            statement.statement_id,
+            result.next_chunk_index
+        )
@@ -0,0 +1,225 @@
+"""Resumable multipart uploads to Unity Catalog volumes"""
+import datetime
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from config import env_int
+from telemetry import span
+
+# Files at least this large use the resumable multipart path
+DEFAULT_RESUMABLE_MIN_SIZE = 100 * 1024 * 1024
+
+# Size of each part; cloud object stores require at least 5 MB for all but the last part
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+
+# Parts sent concurrently and retries per part
+DEFAULT_PART_PARALLELISM = 4
+DEFAULT_PART_RETRIES = 5
+
+# Presigned part URLs stay valid this long
+PART_URL_EXPIRATION = datetime.timedelta(hours=1)
+
+
+def get_resumable_min_size():
+    """Return the size (bytes) above which uploads are resumable, from RESUMABLE_UPLOAD_MIN_MB (default 100)"""
+    return env_int("RESUMABLE_UPLOAD_MIN_MB", DEFAULT_RESUMABLE_MIN_SIZE, scale=1024 * 1024)
+
+
+def get_part_size():
+    """Return the multipart part size in bytes from RESUMABLE_PART_SIZE_MB (default 16, minimum 5)"""
+    return max(env_int("RESUMABLE_PART_SIZE_MB", DEFAULT_PART_SIZE, scale=1024 * 1024), 5 * 1024 * 1024)
+
+
+def get_part_parallelism():
+    """Return how many parts are sent at once from RESUMABLE_PART_PARALLELISM (default 4)"""
+    return env_int("RESUMABLE_PART_PARALLELISM", DEFAULT_PART_PARALLELISM)
+
+
+class MultipartNotSupported(Exception):
+    """The workspace storage does not offer part-based multipart uploads for this path"""
+
+
+class ResumableUploadError(Exception):
+    """Some parts still failed after retries; the state records every part that made it"""
+
+    def __init__(self, message, state):
+        super().__init__(message)
+        self.state = state
+
+
+@dataclass
+class MultipartUploadState:
+    """Progress of one multipart upload, kept between attempts (e.g. in st.session_state)"""
+    file_path: str
+    size: int
+    part_size: int
+    fingerprint: str
+    session_token: Optional[str] = None
+    etags: Dict[int, str] = field(default_factory=dict)
+    completed: bool = False
+
+    @property
+    def part_count(self):
+        return max(1, -(-self.size // self.part_size))
+
+    @property
+    def bytes_done(self):
+        return sum(self.part_length(n) for n in self.etags)
+
+    def part_length(self, part_number):
+        start = (part_number - 1) * self.part_size
+        return max(0, min(self.part_size, self.size - start))
+
+    def missing_parts(self):
+        return [n for n in range(1, self.part_count + 1) if n not in self.etags]
+
+    def matches(self, file_path, size, fingerprint):
+        """Whether this state can resume an upload of the same content to the same path"""
+        return (
+            not self.completed
+            and self.session_token is not None
+            and self.file_path == file_path
+            and self.size == size
+            and self.fingerprint == fingerprint
+        )
+
+
+class FilesMultipartTransport:
+    """Multipart upload calls against the Databricks Files API.
+
+    Uses the same initiate / presigned part URL / complete endpoints as the
+    SDK's own multipart upload, but exposes each step so an upload can be
+    resumed part by part with the session token from an earlier attempt.
+    """
+
+    def __init__(self, workspace_client):
+        import requests
+
+        self._api = workspace_client.api_client
+        # Presigned cloud storage URLs must not receive the Databricks auth header
+        self._storage = requests.Session()
+
+    def _files_path(self, file_path):
+        return f"/api/2.0/fs/files{urllib.parse.quote(file_path)}"
+
+    def initiate(self, file_path, overwrite=True):
+        response = self._api.do(
+            "POST",
+            self._files_path(file_path),
+            query={"action": "initiate-upload", "overwrite": overwrite}
+        )
+        multipart = response.get("multipart_upload") if isinstance(response, dict) else None
+        if not multipart or not multipart.get("session_token"):
+            raise MultipartNotSupported(f"Multipart upload not offered for {file_path}")
+        return multipart["session_token"]
+
+    def upload_part(self, file_path, session_token, part_number, data):
+        expire_time = (datetime.datetime.now(datetime.timezone.utc) + PART_URL_EXPIRATION).strftime("%Y-%m-%dT%H:%M:%SZ")
+        response = self._api.do(
+            "POST",
+            "/api/2.0/fs/create-upload-part-urls",
+            headers={"Content-Type": "application/json"},
+            body={
+                "path": file_path,
+                "session_token": session_token,
+                "start_part_number": part_number,
+                "count": 1,
+                "expire_time": expire_time,
+            }
+        )
+        part_url = response["upload_part_urls"][0]
+        headers = {"Content-Type": "application/octet-stream"}
+        headers.update({h["name"]: h["value"] for h in part_url.get("headers", [])})
+
+        upload = self._storage.put(part_url["url"], data=data, headers=headers, timeout=600)
+        upload.raise_for_status()
+        return upload.headers.get("ETag", "")
+
+    def complete(self, file_path, session_token, etags):
+        self._api.do(
+            "POST",
+            self._files_path(file_path),
+            query={"action": "complete-upload", "upload_type": "multipart", "session_token": session_token},
+            headers={"Content-Type": "application/json"},
+            body={"parts": [{"part_number": n, "etag": etags[n]} for n in sorted(etags)]}
+        )
+
+
+def _read_part(source, lock, state, part_number):
+    """Copy one part out of the source; in-memory sources are sliced without reading the rest"""
+    start = (part_number - 1) * state.part_size
+    length = state.part_length(part_number)
+    if hasattr(source, "getbuffer"):
+        with source.getbuffer() as view:
+            return bytes(view[start:start + length])
+    with lock:
+        source.seek(start)
+        return source.read(length)
+
+
+def _send_part(transport, source, lock, state, part_number, max_retries):
+    """Upload one part, retrying with exponential backoff and jitter"""
+    data = _read_part(source, lock, state, part_number)
+    for attempt in range(max_retries + 1):
+        try:
+            return transport.upload_part(state.file_path, state.session_token, part_number, data)
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(min(0.5 * (2 ** attempt), 30) * (0.5 + random.random()))
+
+
+def resumable_upload(transport, source, file_path, fingerprint, state=None, part_size=None,
+                     parallelism=None, max_retries=DEFAULT_PART_RETRIES, overwrite=True, on_progress=None):
+    """Upload source to file_path in parts, resuming from state when it belongs to the same content.
+
+    Only parts missing from state.etags are sent. Each part is retried with
+    backoff; if any part still fails, ResumableUploadError carries the updated
+    state so the next call resumes from the last good part instead of zero.
+    on_progress(state) runs in the calling thread after each part.
+    """
+    source.seek(0, 2)
+    size = source.tell()
+    source.seek(0)
+
+    with span("files.multipart_upload", file_path=file_path, bytes=size) as upload_span:
+        if state is None or not state.matches(file_path, size, fingerprint):
+            state = MultipartUploadState(
+                file_path=file_path,
+                size=size,
+                part_size=part_size or get_part_size(),
+                fingerprint=fingerprint
+            )
+            state.session_token = transport.initiate(file_path, overwrite=overwrite)
+        upload_span.set(part_size=state.part_size, parts=state.part_count, parts_already_stored=len(state.etags))
+
+        lock = threading.Lock()
+        failures = []
+        with ThreadPoolExecutor(max_workers=parallelism or get_part_parallelism(), thread_name_prefix="upload-part") as pool:
+            futures = {
+                pool.submit(_send_part, transport, source, lock, state, n, max_retries): n
+                for n in state.missing_parts()
+            }
+            for future in as_completed(futures):
+                part_number = futures[future]
+                try:
+                    state.etags[part_number] = future.result()
+                except Exception as e:
+                    failures.append(f"part {part_number}: {e}")
+                if on_progress:
+                    on_progress(state)
+
+        if failures:
+            raise ResumableUploadError(
+                f"{len(failures)} of {state.part_count} parts failed ({failures[0]})",
+                state
+            )
+
+        transport.complete(file_path, state.session_token, state.etags)
+        state.completed = True
+        return state
@@ -0,0 +1,190 @@
+"""Choose the SQL warehouse for each statement from a list, tracking health, warmth and latency"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from admission import get_admission
+from config import env_int
+
+logger = logging.getLogger(__name__)
+
+# Seconds a warehouse is passed over after it errors or times out
+DEFAULT_WAREHOUSE_COOLDOWN = 60
+
+# Seconds a statement may stay PENDING (warehouse starting or saturated) before failing over
+DEFAULT_PENDING_TIMEOUT = 60
+
+# Seconds a warehouse's reported state (RUNNING, STOPPED, ...) is reused before asking again
+WAREHOUSE_STATE_TTL = 30
+
+# A warehouse that finished a statement this recently is assumed to still be running
+WARM_WINDOW = 10 * 60
+
+# Weight of the newest statement in the latency moving average
+LATENCY_EWMA_ALPHA = 0.3
+
+
+def get_warehouse_ids():
+    """Configured warehouses in preference order.
+
+    DATABRICKS_WAREHOUSE_IDS is a comma-separated list; without it the single
+    DATABRICKS_WAREHOUSE_ID is used. Placeholder values are ignored.
+    """
+    configured = os.environ.get("DATABRICKS_WAREHOUSE_IDS") or os.environ.get("DATABRICKS_WAREHOUSE_ID") or ""
+    warehouse_ids = []
+    for warehouse_id in configured.split(","):
+        warehouse_id = warehouse_id.strip()
+        if warehouse_id and warehouse_id != "YOUR_WAREHOUSE_ID_HERE" and warehouse_id not in warehouse_ids:
+            warehouse_ids.append(warehouse_id)
+    return warehouse_ids
+
+
+def get_warehouse_cooldown():
+    """Return how long (seconds) a failing warehouse is avoided from WAREHOUSE_COOLDOWN_SECONDS (default 60)"""
+    return env_int("WAREHOUSE_COOLDOWN_SECONDS", DEFAULT_WAREHOUSE_COOLDOWN)
+
+
+def get_pending_timeout():
+    """Return the PENDING time (seconds) that triggers failover from WAREHOUSE_PENDING_TIMEOUT_SECONDS (default 60)"""
+    return env_int("WAREHOUSE_PENDING_TIMEOUT_SECONDS", DEFAULT_PENDING_TIMEOUT)
+
+
+@dataclass
+class WarehouseHealth:
+    """What the router has learned about one warehouse"""
+    warehouse_id: str
+    latency_s: Optional[float] = None
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    last_success: Optional[float] = None
+    last_error: Optional[str] = None
+    cooldown_until: float = 0.0
+    state: Optional[str] = None
+    state_checked_at: float = 0.0
+
+    def cooling_down(self, now):
+        return now < self.cooldown_until
+
+    def warm(self, now):
+        """Running according to the API, or recently finished a statement when the state is unknown"""
+        if self.state is not None:
+            return self.state == "RUNNING"
+        return self.last_success is not None and now - self.last_success < WARM_WINDOW
+
+    def describe(self, now, load, max_concurrent):
+        parts = [f"load={load}/{max_concurrent}", "warm" if self.warm(now) else "cold"]
+        if self.latency_s is not None:
+            parts.append(f"latency~{self.latency_s:.1f}s")
+        if self.cooling_down(now):
+            parts.append(f"cooling down {self.cooldown_until - now:.0f}s")
+        return " ".join(parts)
+
+
+class WarehouseRouter:
+    """Routes statements to the healthiest, least-loaded, warmest and fastest warehouse.
+
+    Candidates are ranked by: not cooling down after a timeout or error, a
+    free admission slot, warm (running), fewer failures since its last
+    success, lower average latency, fewer statements running or queued,
+    then configuration order.
+    """
+
+    def __init__(self):
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def health(self, warehouse_id):
+        with self._lock:
+            health = self._health.get(warehouse_id)
+            if health is None:
+                health = self._health[warehouse_id] = WarehouseHealth(warehouse_id)
+            return health
+
+    def _refresh_state(self, workspace_client, health, now):
+        """Ask the Warehouses API whether the warehouse is running, at most every WAREHOUSE_STATE_TTL"""
+        if now - health.state_checked_at < WAREHOUSE_STATE_TTL:
+            return
+        health.state_checked_at = now
+        try:
+            state = workspace_client.warehouses.get(health.warehouse_id).state
+            health.state = getattr(state, "value", state)
+        except Exception as e:
+            # No permission to read warehouses (or an older client): fall back to recent successes
+            logger.debug("Could not read state of warehouse %s: %s", health.warehouse_id, e)
+            health.state = None
+
+    def choose(self, workspace_client, warehouse_ids, exclude=()):
+        """Return (warehouse_id, candidates) for the best warehouse not in exclude, or (None, candidates).
+
+        candidates maps each considered warehouse to a short description of
+        its load, warmth, latency and cooldown, for telemetry.
+        """
+        now = time.monotonic()
+        ranked = []
+        candidates = {}
+        for order, warehouse_id in enumerate(warehouse_ids):
+            if warehouse_id in exclude:
+                continue
+            health = self.health(warehouse_id)
+            self._refresh_state(workspace_client, health, now)
+            stats = get_admission(warehouse_id).stats()
+            load = stats["active"] + stats["queued"]
+            candidates[warehouse_id] = health.describe(now, load, stats["max_concurrent"])
+            ranked.append(((
+                health.cooling_down(now),
+                load >= stats["max_concurrent"],
+                not health.warm(now),
+                health.consecutive_failures,
+                health.latency_s or 0.0,
+                load,
+                order,
+            ), warehouse_id))
+        if not ranked:
+            return None, candidates
+        return min(ranked)[1], candidates
+
+    def record_success(self, warehouse_id, latency_s):
+        health = self.health(warehouse_id)
+        with self._lock:
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.last_success = time.monotonic()
+            health.cooldown_until = 0.0
+            if health.latency_s is None:
+                health.latency_s = latency_s
+            else:
+                health.latency_s += LATENCY_EWMA_ALPHA * (latency_s - health.latency_s)
+
+    def record_failure(self, warehouse_id, error, cooldown=False):
+        """Count a failed statement; cooldown also keeps the warehouse out of rotation for a while"""
+        health = self.health(warehouse_id)
+        with self._lock:
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_error = error
+            if cooldown:
+                health.cooldown_until = time.monotonic() + get_warehouse_cooldown()
+        logger.info("Warehouse %s failed a statement%s: %s", warehouse_id, " (cooling down)" if cooldown else "", error)
+
+    def snapshot(self):
+        """Copy of every warehouse's health, for the UI"""
+        with self._lock:
+            return {warehouse_id: WarehouseHealth(**vars(health)) for warehouse_id, health in self._health.items()}
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Return the process-wide warehouse router"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = WarehouseRouter()
+    return _router
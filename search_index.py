@@ -0,0 +1,405 @@
+"""Local full-text index over parsed documents, searched without the warehouse.
+
+Each parsed document is tokenized once, when its parse completes. Postings
+(term -> document ids and term frequencies) are held in memory as compact
+arrays sorted by document id, so a query is an intersection of a few
+arrays plus BM25 scoring. Documents with their terms' frequencies and page
+offsets, and page text for snippets, live in SQLite: in memory by default,
+or in the SEARCH_INDEX_PATH file so the index survives restarts. SQLite is
+only read at startup and for the pages and snippets of the top results.
+
+At startup the postings are read from a snapshot of the arrays, and only
+documents indexed after it are replayed from their term lists.
+"""
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import List
+
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+# Shorter and longer tokens are not indexed (single letters, base64 blobs)
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+
+# BM25 term frequency saturation and document length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Default number of results a search returns
+DEFAULT_SEARCH_LIMIT = 20
+
+# Characters of page text shown around the first match
+SNIPPET_CHARS = 200
+
+# Rebuild the in-memory postings once this share of their entries belongs to replaced documents
+COMPACT_DELETED_RATIO = 0.25
+
+# Rewrite the postings snapshot at startup once this many documents had to be replayed
+SNAPSHOT_MIN_REPLAY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id INTEGER PRIMARY KEY,
+    file_path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    sha256 TEXT,
+    length INTEGER NOT NULL,
+    pages INTEGER NOT NULL,
+    indexed_at REAL NOT NULL,
+    terms TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS page_text (
+    doc_id INTEGER NOT NULL,
+    page_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (doc_id, page_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings_snapshot (
+    term TEXT PRIMARY KEY,
+    doc_ids BLOB NOT NULL,
+    tfs BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def get_search_index_path():
+    """Return the SQLite file of the search index from SEARCH_INDEX_PATH, or None to keep it in memory"""
+    return os.environ.get("SEARCH_INDEX_PATH") or None
+
+
+def tokenize(text):
+    """Lower-cased word tokens of text that are worth indexing"""
+    return [token for token in _TOKEN.findall(text.lower()) if MIN_TERM_LENGTH <= len(token) <= MAX_TERM_LENGTH]
+
+
+def document_pages(elements):
+    """Page text of a parsed-elements DataFrame: {page_id: text}.
+
+    Element content and figure descriptions are joined per page; results
+    without a page_id column (plain text, generic JSON) become page 0.
+    """
+    if elements is None or len(elements) == 0:
+        return {}
+    if "page_id" not in elements.columns or "content" not in elements.columns:
+        text = " ".join(str(value) for row in elements.itertuples(index=False) for value in row if isinstance(value, str))
+        return {0: text} if text else {}
+
+    descriptions = elements["description"] if "description" in elements.columns else [None] * len(elements)
+    pages = {}
+    page_ids = elements["page_id"].fillna(0).astype(int).tolist()
+    for page_id, content, description in zip(page_ids, elements["content"].tolist(), descriptions):
+        parts = pages.setdefault(page_id, [])
+        for text in (content, description):
+            if isinstance(text, str) and text:
+                parts.append(text)
+    return {page_id: "\n".join(parts) for page_id, parts in pages.items() if parts}
+
+
+@dataclass
+class SearchHit:
+    """One matching document"""
+    file_path: str
+    name: str
+    score: float
+    pages: List[int]
+    snippet: str
+
+
+class SearchIndex:
+    """Incrementally updated inverted index with BM25 ranking.
+
+    Every query term must match (AND). Re-indexing a path replaces its
+    previous version; identical content (same SHA-256) is skipped.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        if path:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._postings = {}
+        self._documents = {}
+        self._paths = {}
+        self._stale = 0
+        self._lengths = array("I", [0])
+        self._total_length = 0
+        self._next_doc_id = 1
+        self._load()
+
+    def _meta(self, key):
+        row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _load(self):
+        """Rebuild the in-memory postings from the snapshot plus the documents indexed after it"""
+        with span("search.load", path=self.path) as load_span:
+            snapshot_doc_id = self._meta("snapshot_doc_id")
+            for term, doc_ids, tfs in self._connection.execute("SELECT term, doc_ids, tfs FROM postings_snapshot"):
+                posting = self._postings[term] = (array("I"), array("I"))
+                posting[0].frombytes(doc_ids)
+                posting[1].frombytes(tfs)
+
+            # In doc_id order, so every posting list stays sorted
+            replayed = 0
+            in_snapshot = 0
+            self._next_doc_id = max(self._next_doc_id, snapshot_doc_id + 1)
+            for doc_id, file_path, name, sha256, length, terms in self._connection.execute(
+                "SELECT doc_id, file_path, name, sha256, length, CASE WHEN doc_id > ? THEN terms END "
+                "FROM documents ORDER BY doc_id",
+                (snapshot_doc_id,)
+            ):
+                self._documents[doc_id] = (file_path, name, sha256, length)
+                self._paths[file_path] = doc_id
+                self._set_length(doc_id, length)
+                self._next_doc_id = doc_id + 1
+                if terms is None:
+                    in_snapshot += 1
+                    continue
+                replayed += 1
+                for term, pages in json.loads(terms).items():
+                    self._append(term, doc_id, pages[0])
+            # Documents removed since the snapshot are still in its postings, with length 0
+            if len(self._lengths) <= snapshot_doc_id:
+                self._lengths.extend([0] * (snapshot_doc_id + 1 - len(self._lengths)))
+            self._stale = self._meta("snapshot_documents") - in_snapshot
+            if self.path and replayed >= SNAPSHOT_MIN_REPLAY:
+                self._save_snapshot()
+            load_span.set(documents=len(self._documents), terms=len(self._postings), replayed=replayed)
+
+    def _save_snapshot(self):
+        """Store the in-memory posting arrays so the next start does not replay every document"""
+        self._maybe_compact(force=True)
+        with self._connection:
+            self._connection.execute("DELETE FROM postings_snapshot")
+            self._connection.executemany(
+                "INSERT INTO postings_snapshot VALUES (?, ?, ?)",
+                ((term, doc_ids.tobytes(), tfs.tobytes()) for term, (doc_ids, tfs) in self._postings.items())
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("snapshot_doc_id", self._next_doc_id - 1), ("snapshot_documents", len(self._documents))]
+            )
+        # Fold the rewritten snapshot back into the database file instead of leaving it in the WAL
+        self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _append(self, term, doc_id, tf):
+        posting = self._postings.get(term)
+        if posting is None:
+            posting = self._postings[term] = (array("I"), array("I"))
+        posting[0].append(doc_id)
+        posting[1].append(tf)
+
+    def _set_length(self, doc_id, length):
+        """Record a document's token count in the array indexed by doc_id"""
+        if doc_id >= len(self._lengths):
+            self._lengths.extend([0] * (doc_id + 1 - len(self._lengths)))
+        self._lengths[doc_id] = length
+        self._total_length += length
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, file_path, name, pages, sha256=None):
+        """Index a document's {page_id: text}; returns False if this exact content is already indexed"""
+        with span("search.index", file_path=file_path) as index_span:
+            term_pages = {}
+            term_counts = Counter()
+            for page_id, text in pages.items():
+                tokens = tokenize(text)
+                term_counts.update(tokens)
+                for term in set(tokens):
+                    term_pages.setdefault(term, []).append(page_id)
+            length = sum(term_counts.values())
+            index_span.set(pages=len(pages), tokens=length, terms=len(term_counts))
+
+            with self._lock:
+                previous = self._paths.get(file_path)
+                if previous is not None:
+                    if sha256 and self._documents[previous][2] == sha256:
+                        index_span.set(unchanged=True)
+                        return False
+                    self._remove(previous)
+
+                doc_id = self._next_doc_id
+                self._next_doc_id += 1
+                # Each term's frequency followed by the pages it occurs on
+                terms = json.dumps({term: [tf, *term_pages[term]] for term, tf in term_counts.items()},
+                                   separators=(",", ":"))
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (doc_id, file_path, name, sha256, length, len(pages), time.time(), terms)
+                    )
+                    self._connection.executemany(
+                        "INSERT INTO page_text VALUES (?, ?, ?)",
+                        ((doc_id, page_id, text) for page_id, text in pages.items())
+                    )
+                # Document ids only grow, so appending keeps every posting list sorted
+                for term, tf in term_counts.items():
+                    self._append(term, doc_id, tf)
+                self._documents[doc_id] = (file_path, name, sha256, length)
+                self._paths[file_path] = doc_id
+                self._set_length(doc_id, length)
+                self._maybe_compact()
+            return True
+
+    def remove(self, file_path):
+        """Drop a document from the index; returns whether it was indexed"""
+        with self._lock:
+            doc_id = self._paths.get(file_path)
+            if doc_id is None:
+                return False
+            self._remove(doc_id)
+            self._maybe_compact()
+            return True
+
+    def _remove(self, doc_id):
+        # Caller holds the lock. Postings keep the id until the next compaction.
+        file_path, _, _, length = self._documents.pop(doc_id)
+        del self._paths[file_path]
+        self._total_length -= length
+        self._lengths[doc_id] = 0
+        self._stale += 1
+        with self._connection:
+            for table in ("documents", "page_text"):
+                self._connection.execute(f"DELETE FROM {table} WHERE doc_id = ?", (doc_id,))
+
+    def _maybe_compact(self, force=False):
+        """Drop removed documents from the posting arrays"""
+        # Caller holds the lock (or is the constructor)
+        if not self._stale or (not force and self._stale <= COMPACT_DELETED_RATIO * max(len(self._documents), 1)):
+            return
+        lengths = self._lengths
+        for term in list(self._postings):
+            doc_ids, tfs = self._postings[term]
+            kept = [(doc_id, tf) for doc_id, tf in zip(doc_ids, tfs) if doc_id < len(lengths) and lengths[doc_id]]
+            if kept:
+                self._postings[term] = (array("I", (d for d, _ in kept)), array("I", (tf for _, tf in kept)))
+            else:
+                del self._postings[term]
+        self._stale = 0
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """Return (hits, total_matches) for documents containing every term of query, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with span("search.query", terms=len(terms)) as query_span:
+            if not terms:
+                return [], 0
+            with self._lock:
+                doc_ids, scores = self._score(terms)
+                total = len(doc_ids)
+                if total > limit:
+                    top = scores.argpartition(-limit)[-limit:]
+                    doc_ids, scores = doc_ids[top], scores[top]
+                order = scores.argsort()[::-1]
+                hits = self._hits(doc_ids[order].tolist(), scores[order].tolist(), terms) if total else []
+            query_span.set(matches=total, returned=len(hits))
+            return hits, total
+
+    def _score(self, terms):
+        """Document ids containing every term and their BM25 scores, as numpy arrays"""
+        # Caller holds the lock
+        import numpy as np
+
+        postings = [self._postings.get(term) for term in terms]
+        if any(posting is None for posting in postings):
+            return np.empty(0, dtype=np.uint32), np.empty(0)
+        # Zero-copy views of the posting arrays; intersect starting from the rarest term
+        postings = sorted(
+            ((np.frombuffer(doc_ids, dtype=np.uint32), np.frombuffer(tfs, dtype=np.uint32)) for doc_ids, tfs in postings),
+            key=lambda posting: len(posting[0])
+        )
+        doc_ids, tfs = postings[0]
+        frequencies = [tfs]
+        for other_ids, other_tfs in postings[1:]:
+            doc_ids, keep, positions = np.intersect1d(doc_ids, other_ids, assume_unique=True, return_indices=True)
+            frequencies = [f[keep] for f in frequencies] + [other_tfs[positions]]
+
+        # Replaced documents have length 0 until the next compaction
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)[doc_ids].astype(float)
+        live = lengths > 0
+        doc_ids, lengths = doc_ids[live], lengths[live]
+
+        document_count = len(self._documents)
+        average_length = self._total_length / max(document_count, 1)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+        scores = np.zeros(len(doc_ids))
+        for (term_ids, _), frequency in zip(postings, frequencies):
+            idf = math.log(1 + (document_count - len(term_ids) + 0.5) / (len(term_ids) + 0.5))
+            frequency = frequency[live].astype(float)
+            scores += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return doc_ids, scores
+
+    def _hits(self, doc_ids, scores, terms):
+        """SearchHits with matching pages and a snippet, read from SQLite in two queries"""
+        # Caller holds the lock
+        id_placeholders = ", ".join("?" * len(doc_ids))
+        pages_by_doc = {}
+        for doc_id, *term_pages in self._connection.execute(
+            "SELECT doc_id, " + ", ".join("json_extract(terms, ?)" for _ in terms)
+            + f" FROM documents WHERE doc_id IN ({id_placeholders})",
+            (*(f'$."{term}"' for term in terms), *doc_ids)
+        ):
+            pages_by_doc[doc_id] = sorted({page for pages in term_pages if pages for page in json.loads(pages)[1:]})
+
+        first_pages = [(doc_id, pages[0]) for doc_id, pages in pages_by_doc.items() if pages]
+        snippets = {}
+        if first_pages:
+            for doc_id, text in self._connection.execute(
+                "SELECT doc_id, text FROM page_text WHERE " + " OR ".join("(doc_id = ? AND page_id = ?)" for _ in first_pages),
+                [value for pair in first_pages for value in pair]
+            ):
+                snippets[doc_id] = _snippet(text, terms)
+
+        hits = []
+        for doc_id, score in zip(doc_ids, scores):
+            file_path, name, _, _ = self._documents[doc_id]
+            hits.append(SearchHit(file_path, name, round(score, 3), pages_by_doc.get(doc_id, []), snippets.get(doc_id, "")))
+        return hits
+
+    def stats(self):
+        with self._lock:
+            return {"documents": len(self._documents), "terms": len(self._postings), "path": self.path}
+
+
+def _snippet(text, terms):
+    """Text around the first occurrence of any term, on one line"""
+    match = re.search(r"\b(" + "|".join(map(re.escape, terms)) + r")\b", text, re.IGNORECASE)
+    center = match.start() if match else 0
+    start = max(0, center - SNIPPET_CHARS // 2)
+    snippet = " ".join(text[start:start + SNIPPET_CHARS].split())
+    return ("…" if start else "") + snippet + ("…" if start + SNIPPET_CHARS < len(text) else "")
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Return the process-wide search index, persisted to SEARCH_INDEX_PATH when set"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex(get_search_index_path())
+    return _index
@@ -0,0 +1,178 @@
+"""Lightweight timing spans for the upload and parse hot paths, logged as structured JSON"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger("telemetry")
+
+_current_span = contextvars.ContextVar("telemetry_span", default=None)
+_recorder = contextvars.ContextVar("telemetry_recorder", default=None)
+_setup_lock = threading.Lock()
+_log_file_configured = False
+
+# Span names of each phase shown in the metrics panel
+PHASES = {
+    "Image prep": ("image.normalize",),
+    "Upload": ("files.upload", "files.multipart_upload"),
+    "Local parse": ("parse.local_pdf",),
+    "Slot wait": ("sql.admission",),
+    "Submit": ("sql.execute_statement",),
+    "Result decoding": ("sql.fetch_result",),
+    "DataFrame build": ("parse.to_dataframe",),
+    "Table write": ("table.write",),
+}
+
+
+def tracemalloc_enabled():
+    """Whether spans record Python memory peaks (TELEMETRY_TRACEMALLOC, default off; adds overhead)"""
+    return os.environ.get("TELEMETRY_TRACEMALLOC", "").lower() in ("1", "true", "yes")
+
+
+def _configure_log_file():
+    """Also append span records to TELEMETRY_LOG_PATH as JSON lines, if set"""
+    global _log_file_configured
+    if _log_file_configured:
+        return
+    with _setup_lock:
+        if not _log_file_configured:
+            path = os.environ.get("TELEMETRY_LOG_PATH")
+            if path:
+                handler = logging.FileHandler(path, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+            _log_file_configured = True
+
+
+class Span:
+    """One timed operation; attributes can be added while it runs"""
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.error = None
+        self.start_time = time.time()
+        self.end_time = None
+        self.duration_ms = None
+        self.memory_peak_bytes = None
+        self._memory_base = None
+        self._memory_peak = 0
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        record = {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+        if self.error:
+            record["error"] = self.error
+        if self.memory_peak_bytes is not None:
+            record["memory_peak_bytes"] = self.memory_peak_bytes
+        return record
+
+
+def _start_memory(current, parent):
+    if not tracemalloc_enabled():
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    used, peak = tracemalloc.get_traced_memory()
+    if parent is not None:
+        # Keep the parent's peak so far before the global peak is reset for this span
+        parent._memory_peak = max(parent._memory_peak, peak)
+    tracemalloc.reset_peak()
+    current._memory_base = used
+
+
+def _stop_memory(current, parent):
+    if current._memory_base is None or not tracemalloc.is_tracing():
+        return
+    peak = max(tracemalloc.get_traced_memory()[1], current._memory_peak)
+    current.memory_peak_bytes = max(peak - current._memory_base, 0)
+    if parent is not None:
+        parent._memory_peak = max(parent._memory_peak, peak)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block as a span nested under the current one; the record is logged and collected.
+
+    The memory peak (with TELEMETRY_TRACEMALLOC) is process-wide, so spans
+    running concurrently on other threads contribute to it.
+    """
+    _configure_log_file()
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    _start_memory(current, parent)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "ERROR"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        current.end_time = time.time()
+        _stop_memory(current, parent)
+        _current_span.reset(token)
+        _emit(current)
+
+
+def _emit(current):
+    record = current.to_dict()
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.append(record)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record, default=str))
+
+
+@contextmanager
+def recording(spans):
+    """Collect every span finished in this context (and contexts copied from it) into the list spans"""
+    token = _recorder.set(spans)
+    try:
+        yield spans
+    finally:
+        _recorder.reset(token)
+
+
+def submit_in_context(pool, fn, *args, **kwargs):
+    """pool.submit() that runs fn in a copy of the caller's context, so its spans nest and are collected"""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def phase_totals(spans):
+    """Total milliseconds per panel phase, plus warehouse queue and execution time from sql.wait spans"""
+    totals = {phase: 0.0 for phase in PHASES}
+    totals["Warehouse queue"] = 0.0
+    totals["Warehouse execution"] = 0.0
+    for record in spans:
+        for phase, names in PHASES.items():
+            if record["name"] in names:
+                totals[phase] += record["duration_ms"] or 0.0
+        if record["name"] == "sql.wait":
+            totals["Warehouse queue"] += record["attributes"].get("pending_ms", 0.0)
+            totals["Warehouse execution"] += record["attributes"].get("running_ms", 0.0)
+    return totals
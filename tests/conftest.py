@@ -0,0 +1,9 @@
+"""Shared setup for the test suite: import the app modules and the fake workspace from the repo"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("DATABRICKS_WAREHOUSE_ID", "fake-warehouse")
@@ -0,0 +1,179 @@
+"""WarehouseAdmission: per-warehouse cap, round-robin grants, queue positions and cancellation"""
+import threading
+import time
+import uuid
+
+import pytest
+from databricks.sdk.service.sql import StatementState
+from fake_workspace import FakeStatementExecution, FakeWorkspaceClient
+
+from admission import AdmissionCancelled, WarehouseAdmission, admission_scope
+from parsing import parse_document_with_ai
+
+TERMINAL = {StatementState.SUCCEEDED, StatementState.FAILED, StatementState.CANCELED}
+
+
+class CountingStatementExecution(FakeStatementExecution):
+    """Tracks how many statements are submitted and not yet seen finished"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._finished = set()
+        self._count_lock = threading.Lock()
+
+    def execute_statement(self, warehouse_id, statement, **kwargs):
+        with self._count_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return super().execute_statement(warehouse_id, statement, **kwargs)
+
+    def get_statement(self, statement_id):
+        response = super().get_statement(statement_id)
+        with self._count_lock:
+            if response.status.state in TERMINAL and statement_id not in self._finished:
+                self._finished.add(statement_id)
+                self.in_flight -= 1
+        return response
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class Waiter(threading.Thread):
+    """Thread that queues on an admission controller, records its positions and holds its slot until released"""
+
+    def __init__(self, admission, owner, granted, cancel=None):
+        super().__init__(daemon=True)
+        self.admission = admission
+        self.owner = owner
+        self.granted = granted
+        self.cancel = cancel or threading.Event()
+        self.release = threading.Event()
+        self.positions = []
+        self.error = None
+
+    def run(self):
+        try:
+            self.admission.acquire(self.owner, should_cancel=self.cancel.is_set, on_wait=self.positions.append)
+        except AdmissionCancelled as e:
+            self.error = e
+            return
+        self.granted.append(self.owner)
+        self.release.wait(5)
+        self.admission.release()
+
+
+def queue_waiters(admission, owners, granted):
+    """Start one waiter per owner, each only after the previous one is queued"""
+    waiters = []
+    for owner in owners:
+        queued = admission.stats()["queued"]
+        waiter = Waiter(admission, owner, granted)
+        waiter.start()
+        wait_until(lambda: admission.stats()["queued"] == queued + 1)
+        waiters.append(waiter)
+    return waiters
+
+
+@pytest.fixture
+def saturated():
+    """An admission controller with its single slot held by the test"""
+    admission = WarehouseAdmission("wh", max_concurrent=1)
+    admission.acquire("holder")
+    return admission
+
+
+def test_burst_never_exceeds_cap(monkeypatch):
+    warehouse_id = f"wh-{uuid.uuid4().hex}"
+    monkeypatch.setenv("DATABRICKS_WAREHOUSE_ID", warehouse_id)
+    monkeypatch.setenv("PARSE_MAX_CONCURRENT_STATEMENTS", "2")
+    statements = CountingStatementExecution(queue_s=0.0, execution_s=0.05, per_file_s=0.0, pages=1,
+                                            elements_per_page=2)
+    client = FakeWorkspaceClient(statement_execution=statements)
+    errors = []
+
+    def parse(owner, index):
+        with admission_scope(owner):
+            _, error = parse_document_with_ai(f"/Volumes/c/s/v/{owner}_{index}.pdf", client, timeout=30)
+        if error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=parse, args=(f"session{i % 3}", i)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert statements.executed == 12
+    assert statements.max_in_flight == 2
+    assert statements.in_flight == 0
+
+
+def test_grants_rotate_round_robin_by_owner(saturated):
+    granted = []
+    waiters = queue_waiters(saturated, ["a", "a", "a", "b", "c"], granted)
+
+    saturated.release()
+    for count in range(1, len(waiters) + 1):
+        wait_until(lambda: len(granted) == count)
+        assert saturated.stats()["active"] == 1
+        next(waiter for waiter in waiters if waiter.owner == granted[-1] and not waiter.release.is_set()).release.set()
+    for waiter in waiters:
+        waiter.join(5)
+
+    assert granted == ["a", "b", "c", "a", "a"]
+    assert saturated.stats() == {"active": 0, "queued": 0, "owners_waiting": 0, "max_concurrent": 1}
+
+
+def test_position_counts_rounds_across_owners(saturated):
+    granted = []
+    a1, a2, a3, b1, c1 = queue_waiters(saturated, ["a", "a", "a", "b", "c"], granted)
+
+    expected = {a1: 1, b1: 2, c1: 3, a2: 4, a3: 5}
+    wait_until(lambda: all(waiter.positions[-1:] == [position] for waiter, position in expected.items()))
+
+    # Once a1 is admitted everyone moves up one place, and a1 is told it left the queue
+    saturated.release()
+    wait_until(lambda: granted == ["a"])
+    expected = {b1: 1, c1: 2, a2: 3, a3: 4}
+    wait_until(lambda: all(waiter.positions[-1:] == [position] for waiter, position in expected.items()))
+    assert a1.positions[-1] is None
+
+    for count, waiter in enumerate((a1, b1, c1, a2, a3), start=1):
+        wait_until(lambda: len(granted) == count)
+        waiter.release.set()
+        waiter.join(5)
+    assert granted == ["a", "b", "c", "a", "a"]
+
+
+def test_cancel_while_queued_releases_waiter(saturated):
+    granted = []
+    first, = queue_waiters(saturated, ["a"], granted)
+    cancelled = Waiter(saturated, "b", granted)
+    cancelled.start()
+    wait_until(lambda: saturated.stats()["queued"] == 2)
+    last, = queue_waiters(saturated, ["c"], granted)
+    wait_until(lambda: last.positions[-1:] == [3])
+
+    cancelled.cancel.set()
+    cancelled.join(5)
+    assert not cancelled.is_alive()
+    assert isinstance(cancelled.error, AdmissionCancelled)
+    assert saturated.stats()["queued"] == 2
+    wait_until(lambda: last.positions[-1:] == [2])
+
+    saturated.release()
+    wait_until(lambda: granted == ["a"])
+    first.release.set()
+    wait_until(lambda: granted == ["a", "c"])
+    last.release.set()
+    last.join(5)
+    assert granted == ["a", "c"]
+    assert saturated.stats()["active"] == 0
@@ -0,0 +1,133 @@
+"""DeltaSink.flush: failed statements keep documents queued, and a new parser replaces a version's rows"""
+import io
+import os
+import uuid
+
+import pandas as pd
+import pytest
+from fake_workspace import FakeFiles, FakeStatementExecution, FakeWorkspaceClient
+
+from delta_sink import TABLE_COLUMNS, DeltaSink
+from engine import ingest_batch, ingest_file
+from jobs import Job
+
+TABLE = "main.default.parsed_elements"
+CONTENT = list(TABLE_COLUMNS).index("content")
+
+
+class FlakyStatementExecution(FakeStatementExecution):
+    """Rejects the MERGE statements whose (1-based) numbers are in fail_merges"""
+
+    def __init__(self, fail_merges=(), **kwargs):
+        super().__init__(queue_s=0.0, execution_s=0.0, per_file_s=0.0, **kwargs)
+        self.fail_merges = set(fail_merges)
+        self.merges = 0
+
+    def execute_statement(self, warehouse_id, statement, **kwargs):
+        if statement.lstrip().startswith("MERGE INTO"):
+            self.merges += 1
+            if self.merges in self.fail_merges:
+                raise ConnectionError("warehouse unavailable")
+        return super().execute_statement(warehouse_id, statement, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def warehouse(monkeypatch):
+    # A warehouse of its own keeps other tests' failures out of its routing health
+    monkeypatch.setenv("DATABRICKS_WAREHOUSE_ID", f"wh-{uuid.uuid4().hex}")
+
+
+def elements(count, text="text"):
+    return pd.DataFrame({
+        "element_id": list(range(count)),
+        "page_id": [0] * count,
+        "type": ["text"] * count,
+        "content": [f"{text} {i}" for i in range(count)],
+    })
+
+
+def stored(statements):
+    return statements.tables.tables["`main`.`default`.`parsed_elements`"]
+
+
+def test_failed_merge_keeps_unwritten_documents_queued():
+    statements = FlakyStatementExecution(fail_merges={2})
+    sink = DeltaSink(FakeWorkspaceClient(statement_execution=statements), TABLE, batch_rows=4)
+    sink.add("/Volumes/c/s/v/doc0.pdf", "sha0", elements(3), "local")
+
+    # The batch is full: doc0 and the first row of doc1 go out, the rest of doc1 fails
+    with pytest.raises(ConnectionError, match="warehouse unavailable"):
+        sink.add("/Volumes/c/s/v/doc1.pdf", "sha1", elements(3), "local")
+    assert {key[0] for key in stored(statements)} == {"/Volumes/c/s/v/doc0.pdf", "/Volumes/c/s/v/doc1.pdf"}
+    assert [document[0] for document in sink._pending] == ["/Volumes/c/s/v/doc1.pdf"]
+    assert sink._pending_rows == 3
+    assert sink.stats["documents"] == 1
+
+    sink.add("/Volumes/c/s/v/doc2.pdf", "sha2", elements(3), "local")
+    assert sink._pending == []
+    assert len(stored(statements)) == 9
+    assert sink.stats["documents"] == 3
+
+
+def test_failed_lookup_requeues_every_document():
+    statements = FlakyStatementExecution()
+    client = FakeWorkspaceClient(statement_execution=statements)
+    sink = DeltaSink(client, TABLE)
+    sink.add("/Volumes/c/s/v/doc0.pdf", "sha0", elements(2), "local")
+    sink.written_versions = lambda paths: (_ for _ in ()).throw(ConnectionError("lookup failed"))
+
+    with pytest.raises(ConnectionError):
+        sink.flush()
+    assert [document[0] for document in sink._pending] == ["/Volumes/c/s/v/doc0.pdf"]
+    assert statements.merges == 0
+
+
+def test_other_parser_replaces_rows_of_same_content():
+    statements = FlakyStatementExecution()
+    sink = DeltaSink(FakeWorkspaceClient(statement_execution=statements), TABLE)
+    sink.add("/Volumes/c/s/v/doc.pdf", "sha", elements(3, "local"), "local")
+    sink.flush()
+
+    sink.add("/Volumes/c/s/v/doc.pdf", "sha", elements(3, "warehouse"), "warehouse")
+    stats = sink.flush()
+    rows = stored(statements)
+    assert stats["unchanged"] == 0
+    assert sorted(row[CONTENT] for row in rows.values()) == ["warehouse 0", "warehouse 1", "warehouse 2"]
+    assert {row[-1] for row in rows.values()} == {"warehouse"}
+
+    # A parser that finds fewer elements drops the extra rows
+    sink.add("/Volumes/c/s/v/doc.pdf", "sha", elements(2, "local"), "local")
+    sink.flush()
+    assert sorted(row[CONTENT] for row in stored(statements).values()) == ["local 0", "local 1"]
+
+    merges = statements.merges
+    sink.add("/Volumes/c/s/v/doc.pdf", "sha", elements(2, "local"), "local")
+    assert sink.flush()["unchanged"] == 1
+    assert statements.merges == merges
+
+
+def test_reingesting_identical_file_leaves_table_unchanged():
+    statements = FlakyStatementExecution()
+    client = FakeWorkspaceClient(files=FakeFiles(latency=0.0), statement_execution=statements)
+    data = os.urandom(2048)
+    path = "/Volumes/c/s/v/scan.png"
+
+    # Parsed on the warehouse, then from the parse cache on the single-file and bulk paths
+    first = ingest_file(Job("1", "upload", "scan.png"), client, "scan.png", path, io.BytesIO(data), "c.s.v",
+                        results_table=TABLE)
+    assert first["parsed_by"] == "warehouse"
+    assert first["table"]["documents"] == 1
+    merges = statements.merges
+    rows = dict(stored(statements))
+
+    job = Job("2", "upload", "scan.png")
+    again = ingest_file(job, client, "scan.png", path, io.BytesIO(data), "c.s.v", results_table=TABLE)
+    assert job.detail["from_cache"]
+    assert again["parsed_by"] == "warehouse"
+    assert again["table"]["unchanged"] == 1
+
+    batch = ingest_batch(Job("3", "upload", "batch"), client, [("scan.png", path, io.BytesIO(data))], 1, True,
+                         results_table=TABLE)
+    assert batch["table"]["unchanged"] == 1
+    assert statements.merges == merges
+    assert stored(statements) == rows
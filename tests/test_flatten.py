@@ -0,0 +1,45 @@
+"""flatten_parsed_document: the Arrow and json_normalize paths produce the same typed frames"""
+import json
+
+import pandas as pd
+from fake_workspace import make_document
+
+import flatten
+from flatten import ELEMENT_COLUMNS, PAGE_COLUMNS, flatten_parsed_document
+
+
+def test_arrow_and_json_normalize_agree():
+    payload = make_document(pages=3, elements_per_page=5)
+    arrow = flatten._flatten_arrow(payload)[0]
+    normalized = flatten._flatten_pandas(json.loads(payload))[0]
+    pd.testing.assert_frame_equal(arrow, normalized)
+    assert list(arrow.columns) == list(ELEMENT_COLUMNS)
+    assert arrow["page_id"].tolist() == [page for page in range(3) for _ in range(5)]
+
+
+def test_pages_and_tables():
+    payload = make_document(pages=3, elements_per_page=5)
+    document = flatten_parsed_document(payload)
+    elements = document.elements
+    assert list(document.pages.columns) == list(PAGE_COLUMNS)
+    assert document.pages["page_id"].tolist() == [0, 1, 2]
+    assert document.pages["element_count"].tolist() == [5, 5, 5]
+    assert document.pages["table_count"].tolist() == elements.groupby("page_id")["type"].apply(
+        lambda types: int(types.eq("table").sum())
+    ).tolist()
+    assert document.pages["image_uri"].tolist() == [f"/tmp/page_{i}.png" for i in range(3)]
+    pd.testing.assert_frame_equal(document.tables, elements[elements["type"] == "table"].reset_index(drop=True))
+
+
+def test_missing_boxes_and_other_layouts():
+    # The stray entry makes Arrow fail, so this goes through the json_normalize fallback
+    document = {"document": {"elements": [{"id": 0, "type": "text", "content": "a"}, "stray",
+                                          {"id": 1, "bbox": [{"page_id": 2, "coord": [1, 2]}]}]}}
+    parsed = flatten_parsed_document(json.dumps(document))
+    assert parsed.elements["element_id"].tolist() == [0, 1]
+    assert parsed.elements["page_id"].isna().tolist() == [True, False]
+    assert parsed.elements["x0"].isna().all()
+    assert parsed.pages["page_id"].tolist() == [2]
+    assert parsed.tables.empty
+    assert flatten_parsed_document('{"pages": []}') is None
+    assert flatten_parsed_document("plain text") is None
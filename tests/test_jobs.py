@@ -0,0 +1,127 @@
+"""JobRegistry: running, cancelling, failing, pruning and shutting down background jobs"""
+import threading
+import time
+
+import pytest
+
+from jobs import CANCELED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobRegistry
+
+
+@pytest.fixture
+def registry():
+    registry = JobRegistry(max_workers=1, retention=60)
+    yield registry
+    registry.shutdown(wait=True)
+
+
+def blocking_job(started, release):
+    """Job function that signals it started and then polls for cancellation until released"""
+    def run(job):
+        started.set()
+        while not release.wait(0.01):
+            job.check_cancelled()
+        return "released"
+    return run
+
+
+def test_submit_and_wait_returns_result(registry):
+    def add(job, a, b, scale=1):
+        job.update(progress=0.5, message="adding")
+        return (a + b) * scale
+
+    job = registry.submit(add, 2, 3, kind="sum", label="add", owner="alice", scale=10)
+    assert registry.wait(job.job_id, timeout=5) is job
+    assert job.state == SUCCEEDED
+    assert job.result == 50
+    assert job.progress == 1.0
+    assert job.message == "adding"
+    assert job.error is None
+    assert job.started_at is not None and job.finished_at >= job.started_at
+    assert registry.jobs_for("alice") == [job]
+    assert registry.active() == []
+
+
+def test_failed_job_captures_error(registry):
+    def fail(job):
+        raise ValueError("bad input")
+
+    job = registry.submit(fail, kind="upload")
+    registry.wait(job.job_id, timeout=5)
+    assert job.state == FAILED
+    assert job.error == "bad input"
+    assert job.error_type == "ValueError"
+    assert job.result is None
+
+
+def test_cancel_queued_job_never_starts(registry):
+    started, release = threading.Event(), threading.Event()
+    blocker = registry.submit(blocking_job(started, release))
+    assert started.wait(5)
+
+    calls = []
+    queued = registry.submit(lambda job: calls.append(job))
+    assert queued.state == QUEUED
+    assert registry.cancel(queued.job_id)
+    assert queued.state == CANCELED
+
+    release.set()
+    registry.wait(blocker.job_id, timeout=5)
+    registry.wait(queued.job_id, timeout=5)
+    assert blocker.state == SUCCEEDED
+    assert queued.state == CANCELED
+    assert calls == []
+
+
+def test_cancel_running_job_raises_job_cancelled(registry):
+    started, release = threading.Event(), threading.Event()
+    job = registry.submit(blocking_job(started, release), label="long parse")
+    assert started.wait(5)
+    assert job.state == RUNNING
+
+    assert registry.cancel(job.job_id)
+    registry.wait(job.job_id, timeout=5)
+    assert job.state == CANCELED
+    assert job.error == "long parse was cancelled"
+    assert not registry.cancel(job.job_id)
+
+
+def test_forget_only_drops_finished_jobs(registry):
+    started, release = threading.Event(), threading.Event()
+    job = registry.submit(blocking_job(started, release))
+    assert started.wait(5)
+    assert not registry.forget(job.job_id)
+    assert registry.get(job.job_id) is job
+
+    release.set()
+    registry.wait(job.job_id, timeout=5)
+    assert registry.forget(job.job_id)
+    assert registry.get(job.job_id) is None
+    assert not registry.forget(job.job_id)
+
+
+def test_submit_prunes_jobs_past_retention():
+    registry = JobRegistry(max_workers=1, retention=0.05)
+    try:
+        old = registry.submit(lambda job: "old")
+        registry.wait(old.job_id, timeout=5)
+        time.sleep(0.1)
+        running = registry.submit(lambda job: time.sleep(0.2))
+        assert registry.get(old.job_id) is None
+        # Jobs that have not finished are never pruned
+        registry.submit(lambda job: "new")
+        assert registry.get(running.job_id) is running
+    finally:
+        registry.shutdown(wait=True)
+
+
+def test_shutdown_cancels_active_jobs():
+    registry = JobRegistry(max_workers=1, retention=60)
+    started, release = threading.Event(), threading.Event()
+    running = registry.submit(blocking_job(started, release))
+    assert started.wait(5)
+    queued = registry.submit(lambda job: "never")
+
+    registry.shutdown(wait=True)
+    assert running.state == CANCELED
+    assert queued.state == CANCELED
+    assert queued.result is None
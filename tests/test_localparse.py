@@ -0,0 +1,24 @@
+"""parse_pdfs_locally: a batch extracted in the pool matches parsing each PDF on its own"""
+import io
+
+import pytest
+from bench_local_parse import make_scanned_pdf, make_text_pdf
+
+import localparse
+from localparse import parse_pdf_locally, parse_pdfs_locally
+
+pytestmark = pytest.mark.skipif(not localparse.PYPDF_AVAILABLE, reason="pypdf is not installed")
+
+
+def test_batch_matches_one_at_a_time():
+    documents = [(io.BytesIO(make_text_pdf(pages)), f"report{pages}.pdf", None) for pages in (1, 3, 12)]
+    documents.append((io.BytesIO(make_scanned_pdf(2)), "scan.pdf", None))
+    documents.append((io.BytesIO(b"not a pdf"), "broken.pdf", None))
+
+    batch = parse_pdfs_locally(documents, workers=2)
+    single = [parse_pdf_locally(source, name, file_hash, workers=1) for source, name, file_hash in documents]
+
+    assert [content for content, _ in batch] == [content for content, _ in single]
+    assert [decision.local for _, decision in batch] == [True, True, True, False, False]
+    assert batch[2][1].page_count == 12
+    assert batch[4][1].reason.startswith("could not read PDF locally")
@@ -0,0 +1,125 @@
+"""resumable_upload: resuming from saved state, per-part retries and the state carried by failures"""
+import io
+import threading
+
+import pytest
+
+import resumable
+from resumable import MultipartUploadState, ResumableUploadError, resumable_upload
+
+PART_SIZE = 10
+DATA = b"".join(bytes([n]) * PART_SIZE for n in range(1, 5)) + b"tail"
+
+
+class ScriptedTransport:
+    """Multipart transport that fails chosen parts a set number of times and records every call"""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.attempts = {}
+        self.stored = {}
+        self.initiated = []
+        self.completed = None
+        self._lock = threading.Lock()
+
+    def initiate(self, file_path, overwrite=True):
+        self.initiated.append(file_path)
+        return f"session-{len(self.initiated)}"
+
+    def upload_part(self, file_path, session_token, part_number, data):
+        with self._lock:
+            self.attempts[part_number] = self.attempts.get(part_number, 0) + 1
+            if self.failures.get(part_number, 0):
+                self.failures[part_number] -= 1
+                raise ConnectionError(f"part {part_number} dropped")
+            self.stored[part_number] = data
+        return f"etag-{part_number}"
+
+    def complete(self, file_path, session_token, etags):
+        self.completed = (session_token, dict(etags))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resumable.time, "sleep", lambda seconds: None)
+
+
+def upload(transport, state=None, max_retries=2, fingerprint="sha"):
+    return resumable_upload(transport, io.BytesIO(DATA), "/Volumes/c/s/v/scan.tiff", fingerprint, state=state,
+                            part_size=PART_SIZE, parallelism=2, max_retries=max_retries)
+
+
+def test_uploads_every_part_and_completes():
+    transport = ScriptedTransport()
+    state = upload(transport)
+    assert state.completed
+    assert state.part_count == 5
+    assert state.bytes_done == len(DATA)
+    assert b"".join(transport.stored[n] for n in sorted(transport.stored)) == DATA
+    assert transport.completed == ("session-1", {n: f"etag-{n}" for n in range(1, 6)})
+
+
+def test_send_part_retries_until_success():
+    transport = ScriptedTransport(failures={3: 2})
+    state = upload(transport, max_retries=2)
+    assert state.completed
+    assert transport.attempts[3] == 3
+    assert transport.stored[3] == DATA[20:30]
+
+
+def test_failure_carries_state_with_stored_parts():
+    transport = ScriptedTransport(failures={2: 10, 4: 10})
+    with pytest.raises(ResumableUploadError) as raised:
+        upload(transport, max_retries=1)
+
+    state = raised.value.state
+    assert "2 of 5 parts failed" in str(raised.value)
+    assert transport.attempts[2] == transport.attempts[4] == 2
+    assert not state.completed
+    assert state.session_token == "session-1"
+    assert sorted(state.etags) == [1, 3, 5]
+    assert state.missing_parts() == [2, 4]
+    assert state.bytes_done == PART_SIZE * 2 + len(b"tail")
+    assert transport.completed is None
+
+
+def test_resume_sends_only_missing_parts():
+    state = MultipartUploadState(
+        file_path="/Volumes/c/s/v/scan.tiff", size=len(DATA), part_size=PART_SIZE, fingerprint="sha",
+        session_token="session-saved", etags={1: "etag-1", 3: "etag-3", 5: "etag-5"}
+    )
+    transport = ScriptedTransport()
+    resumed = upload(transport, state=state)
+
+    assert resumed is state and state.completed
+    assert transport.initiated == []
+    assert sorted(transport.attempts) == [2, 4]
+    assert transport.stored == {2: DATA[10:20], 4: DATA[30:40]}
+    assert transport.completed == ("session-saved", {n: f"etag-{n}" for n in range(1, 6)})
+
+
+def test_state_for_other_content_starts_over():
+    state = MultipartUploadState(
+        file_path="/Volumes/c/s/v/scan.tiff", size=len(DATA), part_size=PART_SIZE, fingerprint="old-sha",
+        session_token="session-saved", etags={1: "etag-1"}
+    )
+    transport = ScriptedTransport()
+    resumed = upload(transport, state=state, fingerprint="new-sha")
+
+    assert resumed is not state
+    assert transport.initiated == ["/Volumes/c/s/v/scan.tiff"]
+    assert sorted(transport.attempts) == [1, 2, 3, 4, 5]
+    assert resumed.completed
+
+
+def test_resume_after_failure_completes_the_same_session():
+    transport = ScriptedTransport(failures={4: 2})
+    with pytest.raises(ResumableUploadError) as raised:
+        upload(transport, max_retries=1)
+
+    transport.attempts.clear()
+    state = upload(transport, state=raised.value.state)
+    assert state.completed
+    assert transport.attempts == {4: 1}
+    assert transport.initiated == ["/Volumes/c/s/v/scan.tiff"]
+    assert transport.completed[0] == "session-1"
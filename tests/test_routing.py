@@ -0,0 +1,41 @@
+"""run_statement: fail over on submit errors, but return a statement that ran and FAILED"""
+import uuid
+
+import pytest
+from fake_workspace import FakeStatementExecution, FakeWorkspaceClient
+
+import routing
+from parsing import run_statement, statement_state
+
+QUERY = "SELECT ai_parse_document(content) FROM read_files('/Volumes/c/s/v/doc.pdf', format => 'binaryFile')"
+
+
+@pytest.fixture
+def warehouses(monkeypatch):
+    # Fresh router health and warehouses of their own, so other tests' admissions do not interfere
+    warehouse_ids = [f"wh-{uuid.uuid4().hex}" for _ in range(2)]
+    monkeypatch.setenv("DATABRICKS_WAREHOUSE_IDS", ",".join(warehouse_ids))
+    monkeypatch.setattr(routing, "_router", None)
+    return warehouse_ids
+
+
+def statements(first_warehouse_settings):
+    return FakeStatementExecution(queue_s=0.0, execution_s=0.0, per_file_s=0.0, warehouses=first_warehouse_settings)
+
+
+def test_submit_error_fails_over(warehouses):
+    execution = statements({warehouses[0]: {"submit_failure_rate": 1.0}})
+    statement = run_statement(FakeWorkspaceClient(statement_execution=execution), QUERY)
+    assert statement_state(statement) == "SUCCEEDED"
+    assert [info["warehouse_id"] for info in execution.statements.values()] == [warehouses[1]]
+    assert routing.get_router().snapshot()[warehouses[0]].cooldown_until > 0
+
+
+def test_failed_statement_is_not_retried(warehouses):
+    execution = statements({warehouses[0]: {"failure_rate": 1.0}})
+    statement = run_statement(FakeWorkspaceClient(statement_execution=execution), QUERY)
+    assert statement_state(statement) == "FAILED"
+    assert [info["warehouse_id"] for info in execution.statements.values()] == [warehouses[0]]
+    health = routing.get_router().snapshot()[warehouses[0]]
+    assert health.failures == 1
+    assert health.cooldown_until == 0.0
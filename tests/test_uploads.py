@@ -0,0 +1,113 @@
+"""upload_batch: failure isolation, bounded concurrency, the batch summary and skipping across runs"""
+import io
+import threading
+import time
+
+import pytest
+from fake_workspace import FakeFiles, FakeWorkspaceClient
+
+import dedupe
+from dedupe import UploadManifest
+from uploads import upload_batch
+
+
+class TrackingFiles(FakeFiles):
+    """FakeFiles that fails chosen paths and records peak concurrent uploads and the options passed"""
+
+    def __init__(self, fail_paths=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_paths = set(fail_paths)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.options = []
+        self._track_lock = threading.Lock()
+
+    def upload(self, file_path, contents, overwrite=True, part_size=None, use_parallel=None, parallelism=None):
+        with self._track_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.options.append((part_size, use_parallel, parallelism))
+        try:
+            if file_path in self.fail_paths:
+                time.sleep(self.latency)
+                raise IOError(f"Injected failure uploading {file_path}")
+            return super().upload(file_path, contents, overwrite, part_size, use_parallel, parallelism)
+        finally:
+            with self._track_lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def fresh_manifest(monkeypatch):
+    monkeypatch.setattr(dedupe, "_manifest", UploadManifest(None))
+
+
+def make_items(count, size=1000):
+    return [(f"doc{i}.pdf", f"/Volumes/c/s/v/doc{i}.pdf", io.BytesIO(bytes([i]) * (size + i))) for i in range(count)]
+
+
+def test_failure_does_not_abort_other_files():
+    files = TrackingFiles(fail_paths={"/Volumes/c/s/v/doc3.pdf"}, latency=0.01, keep_contents=True)
+    items = make_items(8)
+    completed = []
+
+    summary = upload_batch(FakeWorkspaceClient(files=files), items, max_workers=3,
+                           on_complete=lambda result, done, total: completed.append((result.name, done, total)))
+
+    assert [r.name for r in summary.failed] == ["doc3.pdf"]
+    assert "Injected failure" in summary.failed[0].error
+    assert summary.failed[0].size == 0
+    assert sorted(r.name for r in summary.succeeded) == [f"doc{i}.pdf" for i in range(8) if i != 3]
+    for name, file_path, source in items:
+        if name != "doc3.pdf":
+            assert files.contents[file_path] == source.getvalue()
+    assert [done for _, done, _ in completed] == list(range(1, 9))
+    assert {total for _, _, total in completed} == {8}
+
+
+def test_in_flight_uploads_stay_within_limits():
+    files = TrackingFiles(latency=0.02)
+    summary = upload_batch(FakeWorkspaceClient(files=files), make_items(12), max_workers=3, chunk_size=256,
+                           parallelism=2)
+
+    assert len(summary.succeeded) == 12
+    assert files.max_in_flight == 3
+    assert set(files.options) == {(256, True, 2)}
+
+
+def test_summary_counts_and_bytes():
+    files = TrackingFiles(fail_paths={"/Volumes/c/s/v/doc1.pdf"}, latency=0.0)
+    client = FakeWorkspaceClient(files=files)
+    upload_batch(client, make_items(4)[2:3], skip_unchanged=True)
+
+    # doc2 is already stored unchanged, doc1 fails, doc0 and doc3 are uploaded
+    summary = upload_batch(client, make_items(4), max_workers=2, skip_unchanged=True)
+
+    assert len(summary.results) == 4
+    assert [r.name for r in summary.skipped] == ["doc2.pdf"]
+    assert [r.name for r in summary.failed] == ["doc1.pdf"]
+    assert sorted(r.name for r in summary.succeeded) == ["doc0.pdf", "doc2.pdf", "doc3.pdf"]
+    assert summary.total_bytes == 1000 + 1003
+    assert summary.bytes_saved == 1002
+    assert summary.elapsed > 0
+    assert summary.throughput_mb_s == pytest.approx(summary.total_bytes / (1024 * 1024) / summary.elapsed)
+
+
+def test_hash_check_skips_unchanged_files_across_runs(monkeypatch, tmp_path):
+    # Without UPLOAD_MANIFEST_PATH the manifest is kept in upload_manifest.json in the working directory
+    monkeypatch.delenv("UPLOAD_MANIFEST_PATH", raising=False)
+    monkeypatch.chdir(tmp_path)
+    client = FakeWorkspaceClient(files=FakeFiles(latency=0.0))
+
+    def run(items):
+        # Each run starts with a fresh process-wide manifest, as a new ingest.py process would
+        monkeypatch.setattr(dedupe, "_manifest", None)
+        return upload_batch(client, items, max_workers=2, skip_unchanged=True, compare_hash=True)
+
+    assert run(make_items(2)).skipped == []
+    assert len(run(make_items(2)).skipped) == 2
+
+    edited = make_items(2)
+    edited[0] = ("doc0.pdf", "/Volumes/c/s/v/doc0.pdf", io.BytesIO(b"\xff" * 1000))
+    assert [result.file_path for result in run(edited).skipped] == ["/Volumes/c/s/v/doc1.pdf"]
+    assert (tmp_path / "upload_manifest.json").exists()
@@ -0,0 +1,149 @@
+"""watcher.poll against a LocalDirectory: new, changed, retried and removed files and checkpoint resume"""
+import os
+
+import pytest
+
+import watcher
+from jobs import Job
+from watcher import MAX_PARSE_ATTEMPTS, LocalDirectory, WatchCheckpoint, poll
+
+VOLUME = "/Volumes/c/s/v"
+
+
+class FakeSearchIndex:
+    def __init__(self):
+        self.removed = []
+
+    def remove(self, path):
+        self.removed.append(path)
+
+
+class StubParser:
+    """Stands in for the bulk warehouse parse and the search index"""
+
+    def __init__(self):
+        self.failing = set()
+        self.batches = []
+        self.index = FakeSearchIndex()
+
+    def parse(self, job, workspace_client, pending):
+        self.batches.append([record["file"] for record in pending])
+        for record in pending:
+            if record["file_path"] in self.failing:
+                record["parse_error"] = "Injected parse failure"
+            else:
+                record["parsed_by"] = "warehouse"
+                record["elements"] = [record["sha256"]]
+        return pending
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    """Sends every document to a stub bulk parse that fails the paths in parser.failing"""
+    stub = StubParser()
+    monkeypatch.setattr(watcher, "parse_without_warehouse", lambda job, name, source, file_hash: (None, None))
+    monkeypatch.setattr(watcher, "parse_pending_records", stub.parse)
+    monkeypatch.setattr(watcher, "get_search_index", lambda: stub.index)
+    return stub
+
+
+def write(root, relative_path, data, mtime_ns=None):
+    path = root / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def run_poll(directory, checkpoint, **kwargs):
+    return {record["file"]: record for record in poll(Job("watch", "watch", "test"), None, directory, checkpoint,
+                                                      **kwargs)}
+
+
+def test_new_files_are_parsed_once(tmp_path, parser):
+    write(tmp_path, "a.png", b"a" * 10)
+    write(tmp_path, "sub/deep/b.pdf", b"b" * 20)
+    write(tmp_path, "notes.txt", b"not a document")
+    directory = LocalDirectory(str(tmp_path), VOLUME)
+    checkpoint = WatchCheckpoint()
+
+    records = run_poll(directory, checkpoint)
+    assert sorted(records) == ["a.png", "sub/deep/b.pdf"]
+    b = records["sub/deep/b.pdf"]
+    assert b["file_path"] == f"{VOLUME}/sub/deep/b.pdf"
+    assert (b["change"], b["size"], b["parsed_by"], b["parse_error"]) == ("new", 20, "warehouse", None)
+    assert b["sha256"] and b["elements"] == [b["sha256"]]
+    assert len(checkpoint) == 2
+
+    assert run_poll(directory, checkpoint) == {}
+    assert len(parser.batches) == 1
+
+
+def test_size_or_mtime_change_reparses(tmp_path, parser):
+    write(tmp_path, "a.png", b"a" * 10, mtime_ns=1_000_000_000)
+    write(tmp_path, "b.png", b"b" * 10, mtime_ns=1_000_000_000)
+    directory = LocalDirectory(str(tmp_path), VOLUME)
+    checkpoint = WatchCheckpoint()
+    run_poll(directory, checkpoint)
+
+    write(tmp_path, "a.png", b"a" * 12, mtime_ns=1_000_000_000)
+    write(tmp_path, "b.png", b"B" * 10, mtime_ns=2_000_000_000)
+    records = run_poll(directory, checkpoint)
+    assert {name: record["change"] for name, record in records.items()} == {"a.png": "changed", "b.png": "changed"}
+    assert records["a.png"]["size"] == 12
+    assert records["b.png"]["mtime"] == 2_000_000_000
+    assert run_poll(directory, checkpoint) == {}
+
+
+def test_failed_files_are_retried_up_to_the_limit(tmp_path, parser):
+    write(tmp_path, "bad.png", b"x" * 10)
+    write(tmp_path, "good.png", b"y" * 10)
+    directory = LocalDirectory(str(tmp_path), VOLUME)
+    checkpoint = WatchCheckpoint()
+    parser.failing = {f"{VOLUME}/bad.png"}
+
+    changes = [run_poll(directory, checkpoint).get("bad.png", {}).get("change") for _ in range(MAX_PARSE_ATTEMPTS + 1)]
+    assert changes == ["new"] + ["retry"] * (MAX_PARSE_ATTEMPTS - 1) + [None]
+    assert all(batch == ["bad.png"] for batch in parser.batches[1:])
+
+    # A new version gets a fresh set of attempts
+    parser.failing = set()
+    write(tmp_path, "bad.png", b"x" * 11)
+    record = run_poll(directory, checkpoint)["bad.png"]
+    assert (record["change"], record["parse_error"]) == ("changed", None)
+    assert run_poll(directory, checkpoint) == {}
+
+
+def test_removed_files_leave_the_checkpoint_and_index(tmp_path, parser):
+    write(tmp_path, "a.png", b"a" * 10)
+    write(tmp_path, "b.png", b"b" * 10)
+    directory = LocalDirectory(str(tmp_path), VOLUME)
+    checkpoint = WatchCheckpoint()
+    run_poll(directory, checkpoint)
+
+    (tmp_path / "a.png").unlink()
+    assert run_poll(directory, checkpoint) == {}
+    assert len(checkpoint) == 1
+    assert parser.index.removed == [f"{VOLUME}/a.png"]
+
+    write(tmp_path, "a.png", b"a" * 10)
+    assert run_poll(directory, checkpoint)["a.png"]["change"] == "new"
+
+
+def test_interrupted_poll_resumes_from_saved_checkpoint(tmp_path, parser):
+    for name in ("a.png", "b.png", "c.png"):
+        write(tmp_path, name, name.encode() * 10)
+    directory = LocalDirectory(str(tmp_path), VOLUME)
+    checkpoint_path = str(tmp_path.parent / f"{tmp_path.name}-checkpoint.json")
+
+    records = poll(Job("watch", "watch", "test"), None, directory, WatchCheckpoint(checkpoint_path),
+                   parse_batch_size=1)
+    first = next(records)
+    records.close()
+
+    resumed = WatchCheckpoint(checkpoint_path)
+    assert len(resumed) == 1
+    remaining = run_poll(directory, resumed, parse_batch_size=1)
+    assert sorted(remaining) == sorted({"a.png", "b.png", "c.png"} - {first["file"]})
+    assert all(record["change"] == "new" for record in remaining.values())
+    assert run_poll(directory, WatchCheckpoint(checkpoint_path)) == {}
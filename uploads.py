@@ -0,0 +1,308 @@
+"""Streaming upload helpers for Unity Catalog volumes"""
+import inspect
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from config import env_int
+from dedupe import is_unchanged, record_upload
+from telemetry import span, submit_in_context
+from parse_cache import content_hash
+
+# Default multipart part / read size; matches the smallest part size the Files API client picks
+DEFAULT_UPLOAD_CHUNK_SIZE = 10 * 1024 * 1024
+
+# Number of parts the SDK may buffer and send at once (memory ~ parallelism * chunk size)
+DEFAULT_UPLOAD_PARALLELISM = 1
+
+# Default number of files uploaded at the same time in batch mode
+DEFAULT_UPLOAD_CONCURRENCY = 4
+
+
+def get_upload_chunk_size():
+    """Return the upload chunk size in bytes from UPLOAD_CHUNK_SIZE_MB (default 10 MB)"""
+    return env_int("UPLOAD_CHUNK_SIZE_MB", DEFAULT_UPLOAD_CHUNK_SIZE, scale=1024 * 1024)
+
+
+def get_upload_parallelism():
+    """Return how many parts one upload may send concurrently from UPLOAD_PARALLELISM (default 1)"""
+    return env_int("UPLOAD_PARALLELISM", DEFAULT_UPLOAD_PARALLELISM)
+
+
+def get_upload_concurrency():
+    """Return the batch upload pool size from UPLOAD_CONCURRENCY (default 4)"""
+    return env_int("UPLOAD_CONCURRENCY", DEFAULT_UPLOAD_CONCURRENCY)
+
+
+class ChunkedUploadStream(io.RawIOBase):
+    """Read-only, seekable view over an uploaded file that only copies the bytes being read.
+
+    In-memory sources (BytesIO / Streamlit UploadedFile) are exposed through a
+    memoryview of their buffer, so no second copy of the whole file is made;
+    each read() materialises just the requested part. Any other binary file
+    object is read part by part from its current position.
+    """
+
+    def __init__(self, source, chunk_size=None):
+        super().__init__()
+        self._source = source
+        self._chunk_size = chunk_size or get_upload_chunk_size()
+        self._view = None
+        self._start = 0
+
+        if hasattr(source, "getbuffer"):
+            # Zero-copy view over the BytesIO buffer
+            self._view = source.getbuffer()
+            self._size = len(self._view)
+        else:
+            self._start = source.tell()
+            source.seek(0, io.SEEK_END)
+            self._size = source.tell() - self._start
+            source.seek(self._start)
+
+        self._pos = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._pos + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position: {position}")
+        self._pos = position
+        return self._pos
+
+    def readinto(self, buffer):
+        n = min(len(buffer), max(self._size - self._pos, 0))
+        if n == 0:
+            return 0
+
+        if self._view is not None:
+            buffer[:n] = self._view[self._pos:self._pos + n]
+        else:
+            self._source.seek(self._start + self._pos)
+            n = self._source.readinto(memoryview(buffer)[:n])
+
+        self._pos += n
+        return n
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._size - self._pos
+        size = min(size, max(self._size - self._pos, 0))
+        if self._view is not None:
+            data = bytes(self._view[self._pos:self._pos + size])
+            self._pos += len(data)
+            return data
+        buffer = bytearray(size)
+        n = self.readinto(buffer)
+        del buffer[n:]
+        return bytes(buffer)
+
+    def close(self):
+        if self._view is not None:
+            # Release the buffer export so the source BytesIO can be resized/closed again
+            self._view.release()
+            self._view = None
+        super().close()
+
+
+def _supports_part_options(files_api):
+    """Whether this SDK's files.upload accepts part_size / parallelism (databricks-sdk >= 0.72)"""
+    try:
+        parameters = inspect.signature(files_api.upload).parameters
+    except (TypeError, ValueError):
+        return False
+    return "part_size" in parameters and "parallelism" in parameters
+
+
+def upload_to_volume(workspace_client, file_path, source, chunk_size=None, parallelism=None, overwrite=True):
+    """Stream a binary file object to a Unity Catalog volume path and return the bytes sent"""
+    chunk_size = chunk_size or get_upload_chunk_size()
+    parallelism = parallelism or get_upload_parallelism()
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+    with span("files.upload", file_path=file_path, part_size=chunk_size, parallelism=parallelism) as upload_span, \
+            ChunkedUploadStream(source, chunk_size=chunk_size) as stream:
+        upload_span.set(bytes=stream.size)
+        files_api = workspace_client.files
+        if _supports_part_options(files_api):
+            # Bound the SDK's part buffers to chunk_size * parallelism instead of its defaults
+            files_api.upload(
+                file_path=file_path,
+                contents=stream,
+                overwrite=overwrite,
+                part_size=chunk_size,
+                use_parallel=parallelism > 1,
+                parallelism=parallelism if parallelism > 1 else None,
+            )
+        else:
+            files_api.upload(file_path=file_path, contents=stream, overwrite=overwrite)
+        return stream.size
+
+
+@dataclass
+class UploadResult:
+    """Outcome of uploading one file in a batch"""
+    name: str
+    file_path: str
+    size: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    skipped: bool = False
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+@dataclass
+class BatchUploadSummary:
+    """Aggregate outcome of a batch upload"""
+    results: List[UploadResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self):
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def skipped(self):
+        return [r for r in self.results if r.ok and r.skipped]
+
+    @property
+    def total_bytes(self):
+        """Bytes actually transferred"""
+        return sum(r.size for r in self.succeeded if not r.skipped)
+
+    @property
+    def bytes_saved(self):
+        """Bytes not transferred because the remote file was unchanged"""
+        return sum(r.size for r in self.skipped)
+
+    @property
+    def throughput_mb_s(self):
+        """Aggregate throughput of successful uploads in MB/s over the batch wall-clock time"""
+        if self.elapsed <= 0:
+            return 0.0
+        return self.total_bytes / (1024 * 1024) / self.elapsed
+
+
+def upload_if_changed(workspace_client, file_path, source, compare_hash=False, file_hash=None,
+                      chunk_size=None, parallelism=None):
+    """Upload source unless the volume already holds the same file; returns (size, skipped).
+
+    compare_hash additionally requires a matching SHA-256 from the upload
+    manifest (see dedupe.is_unchanged). The upload is recorded in the
+    manifest either way.
+    """
+    source.seek(0, io.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+
+    if compare_hash and file_hash is None:
+        file_hash = content_hash(source)
+    if is_unchanged(workspace_client, file_path, size, file_hash if compare_hash else None):
+        return size, True
+
+    size = upload_to_volume(
+        workspace_client,
+        file_path,
+        source,
+        chunk_size=chunk_size,
+        parallelism=parallelism,
+        overwrite=True
+    )
+    record_upload(workspace_client, file_path, size, file_hash)
+    return size, False
+
+
+def _upload_one(workspace_client, name, file_path, source, chunk_size, parallelism, overwrite,
+                skip_unchanged, compare_hash):
+    """Upload a single batch item, capturing any error instead of raising"""
+    started = time.perf_counter()
+    try:
+        if skip_unchanged:
+            size, skipped = upload_if_changed(
+                workspace_client,
+                file_path,
+                source,
+                compare_hash=compare_hash,
+                chunk_size=chunk_size,
+                parallelism=parallelism
+            )
+            return UploadResult(name, file_path, size, time.perf_counter() - started, skipped=skipped)
+
+        size = upload_to_volume(
+            workspace_client,
+            file_path,
+            source,
+            chunk_size=chunk_size,
+            parallelism=parallelism,
+            overwrite=overwrite
+        )
+        return UploadResult(name, file_path, size, time.perf_counter() - started)
+    except Exception as e:
+        return UploadResult(name, file_path, 0, time.perf_counter() - started, error=str(e))
+
+
+def upload_batch(workspace_client, items, max_workers=None, chunk_size=None, parallelism=None,
+                 overwrite=True, on_complete=None, skip_unchanged=False, compare_hash=False):
+    """Upload many files through a bounded thread pool.
+
+    items is an iterable of (name, file_path, source) tuples. A failure on one
+    file is recorded in its UploadResult and does not stop the others. With
+    skip_unchanged, files already present unchanged are not transferred.
+    on_complete(result, done, total) is called from the calling thread as each
+    file finishes, so it is safe to update Streamlit widgets from it.
+    """
+    items = list(items)
+    max_workers = max_workers or get_upload_concurrency()
+    summary = BatchUploadSummary()
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="volume-upload") as pool:
+        futures = [
+            submit_in_context(
+                pool, _upload_one, workspace_client, name, file_path, source, chunk_size, parallelism, overwrite,
+                skip_unchanged, compare_hash
+            )
+            for name, file_path, source in items
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            summary.results.append(result)
+            if on_complete:
+                on_complete(result, done, len(items))
+
+    summary.elapsed = time.perf_counter() - started
+    return summary
@@ -0,0 +1,94 @@
+"""Watch a Unity Catalog volume and parse documents that arrive by any route, writing JSONL.
+
+Polls the volume directory (or a local directory standing in for it with
+--local-root) and parses only files that are new or changed since the last
+poll, tracked in a checkpoint file that survives restarts.
+
+    python watch.py main.default.raw_files --subfolder inbox --checkpoint watch.json --output parsed.jsonl
+    python watch.py main.default.raw_files --local-root /Volumes/main/default/raw_files --once
+"""
+import argparse
+import logging
+import os
+import sys
+import uuid
+
+from engine import get_volume_directory
+from ingest import record_line
+from jobs import Job, JobCancelled
+from parsing import BULK_PARSE_BATCH_SIZE
+from watcher import LocalDirectory, VolumeDirectory, WatchCheckpoint, get_watch_interval, poll, watch
+from workspace import get_workspace_client
+
+logger = logging.getLogger("watch")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("volume", help="Watched volume as catalog.schema.volume_name")
+    parser.add_argument("--subfolder", default="", help="Only watch this folder inside the volume")
+    parser.add_argument("--local-root", help="Read files from this local directory instead of the Files API")
+    parser.add_argument("--checkpoint", default=os.environ.get("WATCH_CHECKPOINT_PATH") or "watch_checkpoint.json",
+                        help="JSON file of files already parsed (default: WATCH_CHECKPOINT_PATH or watch_checkpoint.json)")
+    parser.add_argument("--interval", type=int, default=get_watch_interval(),
+                        help="Seconds between polls (default: WATCH_INTERVAL_SECONDS)")
+    parser.add_argument("--once", action="store_true", help="Poll once and exit")
+    parser.add_argument("--glob", help="Only parse file names matching this pattern, e.g. '*.pdf'")
+    parser.add_argument("--output", help="Append JSONL here instead of writing to stdout")
+    parser.add_argument("--parse-batch-size", type=int, default=BULK_PARSE_BATCH_SIZE,
+                        help="Files per bulk ai_parse_document statement")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING").upper(), stream=sys.stderr)
+
+    try:
+        volume_directory = get_volume_directory(args.volume, args.subfolder)
+    except ValueError as e:
+        sys.exit(str(e))
+    if args.local_root and not os.path.isdir(args.local_root):
+        sys.exit(f"Not a directory: {args.local_root}")
+
+    workspace_client = get_workspace_client()
+    if args.local_root:
+        directory = LocalDirectory(args.local_root, volume_directory)
+    else:
+        directory = VolumeDirectory(workspace_client, volume_directory)
+    checkpoint = WatchCheckpoint(args.checkpoint)
+
+    job = Job(job_id=uuid.uuid4().hex, kind="watch", label=f"Watch {volume_directory}/")
+    if args.once:
+        records = poll(job, workspace_client, directory, checkpoint, args.parse_batch_size, args.glob)
+    else:
+        records = watch(job, workspace_client, directory, checkpoint, args.interval, args.parse_batch_size, args.glob)
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    counts = {"files": 0, "parse_errors": 0}
+    try:
+        for record in records:
+            counts["files"] += 1
+            if record["parse_error"]:
+                counts["parse_errors"] += 1
+                logger.warning("%s: %s", record["file"], record["parse_error"])
+            out.write(record_line(record))
+            out.flush()
+    except KeyboardInterrupt:
+        # Cancel running statements; the checkpoint keeps everything finished so far
+        job.cancel()
+        records.close()
+        print("Interrupted; in-flight work was cancelled", file=sys.stderr)
+        return 130
+    except JobCancelled:
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Parsed {counts['files']} new or changed files; {counts['parse_errors']} parse errors", file=sys.stderr)
+    return 1 if counts["parse_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
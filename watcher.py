@@ -0,0 +1,298 @@
+"""Incremental watcher that parses documents arriving in a Unity Catalog volume by any route.
+
+Each poll lists the volume directory (or a local directory standing in for
+it) and compares every entry's size and modification time with a JSON
+checkpoint. Listing reads only directory metadata; files whose size and
+modification time match the checkpoint are not downloaded, hashed or
+parsed, so the work per poll is proportional to the new and changed files.
+"""
+import fnmatch
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+from config import env_int
+from engine import indexed_dataframe, is_parsable, parse_pending_records, parse_without_warehouse
+from parsing import BULK_PARSE_BATCH_SIZE
+from parse_cache import content_hash
+from search_index import get_search_index
+from telemetry import span
+from uploads import get_upload_chunk_size
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls of the watched directory
+DEFAULT_WATCH_INTERVAL = 30
+
+# Parse attempts of an unchanged file before the watcher stops retrying it
+MAX_PARSE_ATTEMPTS = 3
+
+# Downloads larger than this spill from memory to a temporary file
+DOWNLOAD_SPOOL_MAX_SIZE = 32 * 1024 * 1024
+
+
+def get_watch_interval():
+    """Return the seconds between polls from WATCH_INTERVAL_SECONDS (default 30)"""
+    return env_int("WATCH_INTERVAL_SECONDS", DEFAULT_WATCH_INTERVAL)
+
+
+@dataclass
+class WatchedFile:
+    """One file seen by a listing: its volume path, size and modification time"""
+    path: str
+    relative_path: str
+    size: int
+    mtime: int
+
+
+class VolumeDirectory:
+    """Lists and reads a volume directory through the Files API"""
+
+    def __init__(self, workspace_client, directory):
+        self.workspace_client = workspace_client
+        self.directory = directory.rstrip("/")
+
+    def list(self):
+        """Yield a WatchedFile for every file under the directory, recursively"""
+        directories = [self.directory]
+        while directories:
+            directory = directories.pop()
+            entries = sorted(self.workspace_client.files.list_directory_contents(directory), key=lambda e: e.path)
+            for entry in reversed(entries):
+                if entry.is_directory:
+                    directories.append(entry.path.rstrip("/"))
+                else:
+                    yield WatchedFile(
+                        entry.path,
+                        entry.path[len(self.directory) + 1:],
+                        entry.file_size or 0,
+                        entry.last_modified or 0
+                    )
+
+    def open(self, watched_file):
+        """Download a file into a seekable spooled buffer"""
+        response = self.workspace_client.files.download(watched_file.path)
+        buffer = tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_MAX_SIZE)
+        with span("files.download", file_path=watched_file.path, bytes=watched_file.size):
+            shutil.copyfileobj(response.contents, buffer, get_upload_chunk_size())
+            response.contents.close()
+        buffer.seek(0)
+        return buffer
+
+
+class LocalDirectory:
+    """A local directory standing in for a volume directory, e.g. a FUSE mount of /Volumes or a test fixture.
+
+    Files are read from root; the warehouse is given their path under
+    volume_directory.
+    """
+
+    def __init__(self, root, volume_directory):
+        self.root = root
+        self.directory = volume_directory.rstrip("/")
+
+    def list(self):
+        """Yield a WatchedFile for every file under root, recursively"""
+        directories = [self.root]
+        while directories:
+            directory = directories.pop()
+            with os.scandir(directory) as scan:
+                entries = sorted(scan, key=lambda e: e.name)
+            for entry in reversed(entries):
+                if entry.is_dir():
+                    directories.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    relative_path = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+                    yield WatchedFile(
+                        f"{self.directory}/{relative_path}",
+                        relative_path,
+                        stat.st_size,
+                        stat.st_mtime_ns
+                    )
+
+    def open(self, watched_file):
+        return open(os.path.join(self.root, watched_file.relative_path), "rb")
+
+
+class WatchCheckpoint:
+    """Files the watcher has handled: {path: {size, mtime, sha256, error, attempts}}, optionally persisted as JSON.
+
+    A file is skipped while its size and modification time still match its
+    entry, unless its last parse failed and it has attempts left.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                logger.warning("Ignoring unreadable watch checkpoint %s", path)
+                self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def change(self, watched_file):
+        """Return "new", "changed", "retry" or None when the file needs no work"""
+        with self._lock:
+            entry = self._entries.get(watched_file.path)
+        if entry is None:
+            return "new"
+        if entry["size"] != watched_file.size or entry["mtime"] != watched_file.mtime:
+            return "changed"
+        if entry["error"] and entry["attempts"] < MAX_PARSE_ATTEMPTS:
+            return "retry"
+        return None
+
+    def record(self, watched_file, sha256=None, error=None):
+        with self._lock:
+            previous = self._entries.get(watched_file.path)
+            same_version = (
+                previous is not None
+                and previous["size"] == watched_file.size
+                and previous["mtime"] == watched_file.mtime
+            )
+            self._entries[watched_file.path] = {
+                "size": watched_file.size,
+                "mtime": watched_file.mtime,
+                "sha256": sha256,
+                "error": error,
+                "attempts": previous["attempts"] + 1 if same_version and error else 1,
+            }
+            self._dirty = True
+
+    def forget_missing(self, seen_paths):
+        """Drop entries of files that are no longer listed; returns their paths"""
+        with self._lock:
+            missing = [path for path in self._entries if path not in seen_paths]
+            for path in missing:
+                del self._entries[path]
+            self._dirty = self._dirty or bool(missing)
+        return missing
+
+    def save(self):
+        """Write the checkpoint atomically if anything changed since the last save"""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+
+def _new_record(watched_file, change):
+    return {
+        "file": watched_file.relative_path,
+        "file_path": watched_file.path,
+        "size": watched_file.size,
+        "mtime": watched_file.mtime,
+        "change": change,
+        "sha256": None,
+        "parsed_by": None,
+        "parse_error": None,
+        "elements": None,
+    }
+
+
+def _prepare(job, directory, watched_file, change):
+    """Hash a changed file and parse it from the cache or locally when possible; returns (record, needs_warehouse)"""
+    record = _new_record(watched_file, change)
+    name = os.path.basename(watched_file.relative_path)
+    try:
+        with directory.open(watched_file) as source:
+            record["sha256"] = content_hash(source)
+            parsed_content, record["parsed_by"] = parse_without_warehouse(job, name, source, record["sha256"])
+    except OSError as e:
+        record["parse_error"] = f"Could not read file: {e}"
+        return record, False
+    if parsed_content is None:
+        return record, True
+    record["elements"] = indexed_dataframe(watched_file.path, name, parsed_content, record["sha256"])
+    return record, False
+
+
+def poll(job, workspace_client, directory, checkpoint, parse_batch_size=BULK_PARSE_BATCH_SIZE, pattern=None):
+    """List the directory once and parse the new and changed documents, yielding one record per file.
+
+    Records carry the same fields as the ingest pipeline's (with "change"
+    set to new, changed or retry). Files the cache or local PDF extraction
+    cannot handle are parsed in bulk statements of parse_batch_size. The
+    checkpoint is updated per file and saved after every bulk statement, so
+    an interrupted poll resumes where it stopped.
+    """
+    changed = []
+    seen = set()
+    with span("watch.list", directory=directory.directory) as list_span:
+        for watched_file in directory.list():
+            seen.add(watched_file.path)
+            name = os.path.basename(watched_file.relative_path)
+            if not is_parsable(name) or (pattern and not fnmatch.fnmatch(name, pattern)):
+                continue
+            change = checkpoint.change(watched_file)
+            if change:
+                changed.append((watched_file, change))
+        removed = checkpoint.forget_missing(seen)
+        for path in removed:
+            get_search_index().remove(path)
+        list_span.set(files=len(seen), changed=len(changed), removed=len(removed))
+
+    job.update(0.0, f"{len(changed)} new or changed documents in {len(seen)} files")
+    files_by_path = {}
+    pending = []
+
+    def finish(records):
+        for record in records:
+            checkpoint.record(files_by_path.pop(record["file_path"]), record["sha256"], record["parse_error"])
+        checkpoint.save()
+        return records
+
+    for done, (watched_file, change) in enumerate(changed, start=1):
+        job.check_cancelled()
+        record, needs_warehouse = _prepare(job, directory, watched_file, change)
+        files_by_path[watched_file.path] = watched_file
+        if needs_warehouse:
+            pending.append(record)
+            if len(pending) >= parse_batch_size:
+                job.update(done / len(changed), f"Parsing {len(pending)} documents with Databricks AI in bulk")
+                yield from finish(parse_pending_records(job, workspace_client, pending))
+                pending = []
+        else:
+            checkpoint.record(watched_file, record["sha256"], record["parse_error"])
+            yield record
+    if pending:
+        job.update(1.0, f"Parsing {len(pending)} documents with Databricks AI in bulk")
+        yield from finish(parse_pending_records(job, workspace_client, pending))
+    checkpoint.save()
+
+
+def watch(job, workspace_client, directory, checkpoint, interval=None, parse_batch_size=BULK_PARSE_BATCH_SIZE,
+          pattern=None):
+    """Poll the directory every interval seconds until the job is cancelled, yielding parsed records"""
+    interval = interval or get_watch_interval()
+    while True:
+        started = time.monotonic()
+        yield from poll(job, workspace_client, directory, checkpoint, parse_batch_size, pattern)
+        job.update(message=f"Watching {directory.directory} ({len(checkpoint)} files seen)")
+        while time.monotonic() - started < interval:
+            job.check_cancelled()
+            time.sleep(min(1.0, interval))
@@ -0,0 +1,57 @@
+"""Process-wide Databricks WorkspaceClient factory"""
+import importlib.util
+import threading
+
+from config import env_int
+
+# Default HTTP connections kept open per host; sized for concurrent sessions and batch uploads
+DEFAULT_MAX_CONNECTIONS = 20
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_max_connections():
+    """Return the HTTP connection pool size from DATABRICKS_MAX_CONNECTIONS (default 20)"""
+    return env_int("DATABRICKS_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)
+
+
+def sdk_available():
+    """Whether databricks-sdk is installed, checked without importing it (the import takes over a second)"""
+    try:
+        return importlib.util.find_spec("databricks.sdk") is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def create_workspace_client(max_connections=None):
+    """Build a new WorkspaceClient whose HTTP session keeps up to max_connections open"""
+    from databricks.sdk import WorkspaceClient
+    from databricks.sdk.core import Config
+
+    max_connections = max_connections or get_max_connections()
+    config = Config(max_connection_pools=max_connections, max_connections_per_pool=max_connections)
+    return WorkspaceClient(config=config)
+
+
+def get_workspace_client():
+    """Return the shared WorkspaceClient, creating it on first use.
+
+    Auth resolution and HTTP session setup happen once per process; the client
+    is thread-safe, so every Streamlit session and upload thread reuses its
+    warm connection pool. A failed creation is not cached, so fixing the
+    credentials and retrying works without a restart.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_workspace_client()
+    return _client
+
+
+def reset_workspace_client():
+    """Drop the shared client so the next call re-resolves config and credentials"""
+    global _client
+    with _client_lock:
+        _client = None